@@ -6,7 +6,7 @@ from sqlalchemy import pool
 from alembic import context
 
 from app.database import Base
-from app.models import patient, patient_note, therapy_session, user
+from app.models import patient, patient_note, therapy_session, user, key_rotation_progress, search_index, idempotency_key, chat_message, clinic_rollup, revoked_token
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,43 @@
+"""add token revocation
+
+Revision ID: 17d1ba76b857
+Revises: e7f3bddde50f
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '17d1ba76b857'
+down_revision: Union[str, None] = 'e7f3bddde50f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('revoked_tokens',
+    sa.Column('jti', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('revoked_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('jti')
+    )
+    op.create_index('ix_revoked_tokens_revoked_at', 'revoked_tokens', ['revoked_at'], unique=False)
+    op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'], unique=False)
+    op.add_column('users', sa.Column('tokens_not_before', sa.DateTime(), nullable=True))
+    op.add_column('users', sa.Column('tokens_revoked_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'tokens_revoked_at')
+    op.drop_column('users', 'tokens_not_before')
+    op.drop_index('ix_revoked_tokens_expires_at', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_revoked_at', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
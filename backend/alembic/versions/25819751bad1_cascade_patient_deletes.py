@@ -0,0 +1,61 @@
+"""cascade patient deletes and soft delete
+
+Revision ID: 25819751bad1
+Revises: c77f5460cd0d
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '25819751bad1'
+down_revision: Union[str, None] = 'c77f5460cd0d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tablas con FK a patients.id
+CHILD_TABLES = ['therapy_sessions', 'patient_notes', 'chat_messages', 'chat_backfills', 'search_documents']
+
+# SQLite no guarda nombres para las FK sin nombre; batch mode las nombra con esta convencion
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _patient_fk_name(table: str, offline_name: str) -> Optional[str]:
+    if op.get_context().as_sql:
+        # Sin conexion no se puede reflejar el nombre
+        return offline_name
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys(table):
+        if fk['constrained_columns'] == ['patient_id'] and fk['referred_table'] == 'patients':
+            return fk['name'] or f'fk_{table}_patient_id_patients'
+    return None
+
+
+def _replace_patient_fk(table: str, ondelete: Optional[str], offline_name: str) -> None:
+    name = _patient_fk_name(table, offline_name)
+    with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+        if name is not None:
+            batch_op.drop_constraint(name, type_='foreignkey')
+        batch_op.create_foreign_key(f'fk_{table}_patient_id_patients', 'patients', ['patient_id'], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in CHILD_TABLES:
+        # Offline se asume el nombre por defecto de Postgres
+        _replace_patient_fk(table, 'CASCADE', f'{table}_patient_id_fkey')
+    op.create_index('ix_search_documents_patient_id', 'search_documents', ['patient_id'], unique=False)
+    op.add_column('patients', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_patients_deleted_at', 'patients', ['deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_patients_deleted_at', table_name='patients')
+    op.drop_column('patients', 'deleted_at')
+    op.drop_index('ix_search_documents_patient_id', table_name='search_documents')
+    for table in CHILD_TABLES:
+        _replace_patient_fk(table, None, f'fk_{table}_patient_id_patients')
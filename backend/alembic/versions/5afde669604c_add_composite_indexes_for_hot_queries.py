@@ -0,0 +1,34 @@
+"""add composite indexes for hot queries
+
+Revision ID: 5afde669604c
+Revises: e7897ab38f2f
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5afde669604c'
+down_revision: Union[str, None] = 'e7897ab38f2f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_therapy_sessions_patient_id_date', 'therapy_sessions', ['patient_id', 'date'], unique=False)
+    op.create_index('ix_patients_user_id_id', 'patients', ['user_id', 'id'], unique=False)
+    op.create_index('ix_patients_user_id_age', 'patients', ['user_id', 'age'], unique=False)
+    op.create_index(op.f('ix_patient_notes_patient_id'), 'patient_notes', ['patient_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_patient_notes_patient_id'), table_name='patient_notes')
+    op.drop_index('ix_patients_user_id_age', table_name='patients')
+    op.drop_index('ix_patients_user_id_id', table_name='patients')
+    op.drop_index('ix_therapy_sessions_patient_id_date', table_name='therapy_sessions')
@@ -0,0 +1,39 @@
+"""track rolled up sessions
+
+Revision ID: a3c5e9b14d07
+Revises: 17d1ba76b857
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c5e9b14d07'
+down_revision: Union[str, None] = '17d1ba76b857'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('therapy_sessions', sa.Column('rolled_up', sa.Boolean(), server_default=sa.false(), nullable=False))
+    # Lo que la marca de agua ya habia sumado queda marcado; el resto lo suma el proximo refresco
+    op.execute(
+        "UPDATE therapy_sessions SET rolled_up = true WHERE id <= "
+        "(SELECT last_id FROM clinic_rollup_progress WHERE name = 'clinic_emotions')"
+    )
+    op.create_index('ix_therapy_sessions_pending_rollup', 'therapy_sessions', ['id'], unique=False,
+                    postgresql_where=sa.text('NOT rolled_up'), sqlite_where=sa.text('NOT rolled_up'))
+    op.drop_column('clinic_rollup_progress', 'last_id')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Sin marca de agua equivalente: queda en 0 y hay que reconstruir (POST /admin/clinic-rollups/rebuild)
+    op.add_column('clinic_rollup_progress', sa.Column('last_id', sa.Integer(), server_default='0', nullable=False))
+    op.drop_index('ix_therapy_sessions_pending_rollup', table_name='therapy_sessions')
+    op.drop_column('therapy_sessions', 'rolled_up')
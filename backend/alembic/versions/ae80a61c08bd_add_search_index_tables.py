@@ -0,0 +1,57 @@
+"""add search index tables
+
+Revision ID: ae80a61c08bd
+Revises: 5afde669604c
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ae80a61c08bd'
+down_revision: Union[str, None] = '5afde669604c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('search_documents',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('doc_type', sa.String(), nullable=False),
+    sa.Column('doc_id', sa.Integer(), nullable=False),
+    sa.Column('length', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('doc_type', 'doc_id', name='uq_search_documents_doc')
+    )
+    op.create_index(op.f('ix_search_documents_id'), 'search_documents', ['id'], unique=False)
+    op.create_index(op.f('ix_search_documents_user_id'), 'search_documents', ['user_id'], unique=False)
+    op.create_table('search_postings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('token', sa.String(length=32), nullable=False),
+    sa.Column('frequency', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['search_documents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_search_postings_document_id'), 'search_postings', ['document_id'], unique=False)
+    op.create_index('ix_search_postings_user_id_token', 'search_postings', ['user_id', 'token'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_search_postings_user_id_token', table_name='search_postings')
+    op.drop_index(op.f('ix_search_postings_document_id'), table_name='search_postings')
+    op.drop_table('search_postings')
+    op.drop_index(op.f('ix_search_documents_user_id'), table_name='search_documents')
+    op.drop_index(op.f('ix_search_documents_id'), table_name='search_documents')
+    op.drop_table('search_documents')
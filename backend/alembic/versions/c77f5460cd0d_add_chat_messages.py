@@ -0,0 +1,51 @@
+"""add chat messages
+
+Revision ID: c77f5460cd0d
+Revises: b0ab8e2c3d01
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c77f5460cd0d'
+down_revision: Union[str, None] = 'b0ab8e2c3d01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('chat_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('role', sa.String(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('session_ids', sa.String(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_chat_messages_id'), 'chat_messages', ['id'], unique=False)
+    op.create_index('ix_chat_messages_patient_id_id', 'chat_messages', ['patient_id', 'id'], unique=False)
+    op.create_table('chat_backfills',
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('messages', sa.Integer(), nullable=False),
+    sa.Column('backfilled_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ),
+    sa.PrimaryKeyConstraint('patient_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('chat_backfills')
+    op.drop_index('ix_chat_messages_patient_id_id', table_name='chat_messages')
+    op.drop_index(op.f('ix_chat_messages_id'), table_name='chat_messages')
+    op.drop_table('chat_messages')
@@ -0,0 +1,39 @@
+"""compress session results
+
+Revision ID: d519e803b420
+Revises: 25819751bad1
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from app.services.results_storage import convert_results
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd519e803b420'
+down_revision: Union[str, None] = '25819751bad1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Solo datos: la columna sigue siendo TEXT. Sin conexion (--sql) no hay nada que generar;
+    # las filas viejas se siguen leyendo y se pueden convertir despues corriendo el upgrade.
+    if op.get_context().as_sql:
+        return
+    # Cada UPDATE se confirma solo: sin una transaccion larga sobre toda la tabla
+    with op.get_context().autocommit_block():
+        convert_results(op.get_bind(), BATCH_SIZE, compress=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_context().as_sql:
+        return
+    with op.get_context().autocommit_block():
+        convert_results(op.get_bind(), BATCH_SIZE, compress=False)
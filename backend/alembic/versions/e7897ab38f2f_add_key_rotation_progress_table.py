@@ -0,0 +1,39 @@
+"""add key_rotation_progress table
+
+Revision ID: e7897ab38f2f
+Revises: 26edc9132ab0
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7897ab38f2f'
+down_revision: Union[str, None] = '26edc9132ab0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('key_rotation_progress',
+    sa.Column('table_name', sa.String(), nullable=False),
+    sa.Column('key_fingerprint', sa.String(), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('rows_processed', sa.Integer(), nullable=False),
+    sa.Column('rows_rotated', sa.Integer(), nullable=False),
+    sa.Column('total_rows', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('key_rotation_progress')
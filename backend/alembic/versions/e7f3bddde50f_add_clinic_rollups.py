@@ -0,0 +1,53 @@
+"""add clinic emotion rollups
+
+Revision ID: e7f3bddde50f
+Revises: d519e803b420
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7f3bddde50f'
+down_revision: Union[str, None] = 'd519e803b420'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Quedan vacias: el refresco periodico (o POST /admin/clinic-rollups/rebuild) las llena
+    op.create_table('clinic_session_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=8), nullable=False),
+    sa.Column('bucket', sa.Date(), nullable=False),
+    sa.Column('sessions', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'period', 'bucket')
+    )
+    op.create_table('clinic_emotion_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=8), nullable=False),
+    sa.Column('bucket', sa.Date(), nullable=False),
+    sa.Column('emotion', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'period', 'bucket', 'emotion')
+    )
+    op.create_table('clinic_rollup_progress',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('clinic_rollup_progress')
+    op.drop_table('clinic_emotion_rollups')
+    op.drop_table('clinic_session_rollups')
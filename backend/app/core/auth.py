@@ -1,19 +1,21 @@
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import time
+import uuid
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from app.core.config import settings
 from app.models.user import User
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.core import tracing
+from app.core.revocation import revocations
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-print("Using SECRET_KEY:", SECRET_KEY)
-
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -29,22 +31,24 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     if "sub" in to_encode and not isinstance(to_encode["sub"], str):
         to_encode["sub"] = str(to_encode["sub"])
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    print("Token created with SECRET_KEY:", SECRET_KEY)
-    return encoded_jwt
+    # jti identifica al token para poder revocarlo; iat con fraccion para compararlo con tokens_not_before
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_access_token(token: str):
     try:
-        print("Attempting to decode token with SECRET_KEY:", SECRET_KEY)
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print("Successfully decoded payload:", payload)
-        return payload
-    except JWTError as e:
-        print("Error decoding token:", str(e))
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
         return None
 
+def _epoch(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    with tracing.span("auth.get_current_user"):
+        return _load_user(token, db)
+
+def _load_user(token: str, db: Session):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -58,6 +62,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     user_id: str = payload.get("sub")
     if user_id is None:
         raise credentials_exception
+
+    jti = payload.get("jti")
+    if jti is not None and revocations.is_revoked(jti):
+        raise credentials_exception
     
     try:
         # Intentar buscar por ID primero
@@ -71,5 +79,19 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     
     if user is None:
         raise credentials_exception
-    
+
+    if user.tokens_not_before is not None and payload.get("iat", 0) < _epoch(user.tokens_not_before):
+        # Emitido antes del ultimo cambio de contraseña
+        raise credentials_exception
+    if jti is not None and user.tokens_revoked_at is not None and (
+        revocations.synced_at is None
+        or user.tokens_revoked_at >= revocations.synced_at - timedelta(seconds=settings.TOKEN_REVOCATION_SYNC_SLACK_SECONDS)
+    ):
+        # Logout en otro worker despues de nuestra ultima sincronizacion: se lee ahora. Con
+        # margen: revoke() marca al usuario antes de su commit, y una sincronizacion en el medio
+        # queda mas nueva que la marca sin haber visto la fila
+        revocations.sync(db)
+        if revocations.is_revoked(jti):
+            raise credentials_exception
+
     return user
\ No newline at end of file
@@ -3,9 +3,122 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     API_MODEL_URL: str
     DATABASE_URL: str
+    # Replicas de solo lectura separadas por coma (opcional)
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_HEALTHCHECK_SECONDS: float = 5
+    REPLICA_MAX_LAG_SECONDS: float = 10
+    # Si ninguna replica esta al dia: "primary" lee del primario, "replica" usa una replica atrasada
+    REPLICA_LAG_FALLBACK: str = "primary"
+    READ_YOUR_WRITES_SECONDS: float = 5
     SECRET_KEY: str
     AGENT_API_URL: str
     ENCRYPTION_KEY: str
+    # Claves anteriores separadas por coma; se aceptan para desencriptar durante una rotacion
+    ENCRYPTION_KEYS_PREVIOUS: str = ""
+    KEY_ROTATION_BATCH_SIZE: int = 500
+    KEY_ROTATION_BATCH_DELAY_SECONDS: float = 0.1
+    # Cache en memoria de valores desencriptados (opcional)
+    DECRYPT_CACHE_ENABLED: bool = False
+    DECRYPT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    DECRYPT_CACHE_TTL_SECONDS: int = 300
+    # Nivel de zlib para los resultados de las sesiones (results_codec)
+    RESULTS_COMPRESSION_LEVEL: int = 6
+    # Clave para los hashes del indice de busqueda; si esta vacia se deriva de ENCRYPTION_KEY
+    SEARCH_INDEX_KEY: str = ""
+
+    # Planificador de llamadas al modelo: concurrencia global, token bucket y peso por clinica
+    MODEL_MAX_CONCURRENCY: int = 8
+    MODEL_TENANT_RATE: float = 1.0  # llamadas por segundo por clinica; 0 sin limite
+    MODEL_TENANT_BURST: float = 10
+    # "user_id:peso" separados por coma, p.ej. "12:2,15:0.5"; el resto pesa 1
+    MODEL_TENANT_WEIGHTS: str = ""
+    MODEL_QUEUE_TIMEOUT_SECONDS: float = 600
+
+    # Revocacion de tokens (logout): cada cuanto se sincroniza cada worker con revoked_tokens,
+    # margen para filas confirmadas tarde y tamaño del filtro de Bloom en memoria
+    TOKEN_REVOCATION_SYNC_SECONDS: float = 5
+    TOKEN_REVOCATION_SYNC_SLACK_SECONDS: float = 5
+    TOKEN_REVOCATION_BLOOM_BITS: int = 1 << 20
+    TOKEN_REVOCATION_BLOOM_HASHES: int = 4
+
+    # Idempotency-Key: cuanto se guarda la respuesta y cuanto espera un duplicado concurrente
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60
+    IDEMPOTENCY_WAIT_SECONDS: float = 300
+    IDEMPOTENCY_POLL_SECONDS: float = 0.25
+    # Una clave "processing" mas vieja que esto se considera abandonada (worker caido)
+    IDEMPOTENCY_STALE_SECONDS: int = 30 * 60
+
+    # Borrado de pacientes: filas por lote del purge en segundo plano y pausa entre lotes.
+    # Con hasta PATIENT_PURGE_BATCH_SIZE filas hijas (sesiones, notas, mensajes...) se borra en el momento.
+    PATIENT_PURGE_BATCH_SIZE: int = 500
+    PATIENT_PURGE_BATCH_DELAY_SECONDS: float = 0.05
+
+    # Totales de emociones por clinica (dia/semana): cada cuanto se suman las sesiones nuevas y cuantas por lote
+    CLINIC_ROLLUP_REFRESH_SECONDS: float = 300
+    CLINIC_ROLLUP_BATCH_SIZE: int = 500
+
+    # Exportacion para investigacion (requiere pyarrow): clave de los seudonimos (si esta vacia
+    # se deriva de ENCRYPTION_KEY), sesiones leidas por vez y filas por row group
+    EXPORT_PSEUDONYM_KEY: str = ""
+    EXPORT_SESSION_BATCH_SIZE: int = 200
+    EXPORT_ROW_GROUP_ROWS: int = 100_000
+
+    # Carga masiva de sesiones: items por pedido, filas por transaccion e hilos para encriptar
+    BULK_SESSIONS_MAX_ITEMS: int = 5000
+    BULK_SESSIONS_BATCH_SIZE: int = 500
+    BULK_SESSIONS_ENCRYPT_WORKERS: int = 4
+
+    # Contexto emocional que se manda al agente: sesiones incluidas, tamaño maximo y cache
+    EMOTION_CONTEXT_MAX_SESSIONS: int = 20
+    EMOTION_CONTEXT_MAX_BYTES: int = 8 * 1024
+    EMOTION_CONTEXT_CACHE_BYTES: int = 4 * 1024 * 1024
+    EMOTION_CONTEXT_CACHE_TTL_SECONDS: int = 600
+
+    # Trazas por pedido (SQL, encriptacion, modelo, agente); "console" o "file" (una linea JSON por span)
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTER: str = "console"
+    TRACING_FILE: str = "./traces.jsonl"
+    TRACING_SAMPLE_RATE: float = 1.0
+    TRACING_MAX_SPANS: int = 2000
+
+    # Preprocesamiento de video antes de enviarlo al modelo (requiere ffmpeg instalado)
+    VIDEO_PREPROCESS_ENABLED: bool = False
+    VIDEO_PREPROCESS_FPS: int = 5
+    VIDEO_PREPROCESS_MAX_HEIGHT: int = 480
+    VIDEO_PREPROCESS_TIMEOUT: int = 120
+    FFMPEG_BINARY: str = "ffmpeg"
+
+    # Analisis por segmentos en paralelo para videos largos (0 desactiva)
+    VIDEO_SEGMENT_SECONDS: int = 300
+    VIDEO_SEGMENT_FANOUT: int = 4
+    VIDEO_SEGMENT_RETRIES: int = 2
+
+    # Subidas reanudables por partes
+    UPLOAD_DIR: str = "./uploads"
+    UPLOAD_TTL_SECONDS: int = 24 * 60 * 60
+    UPLOAD_MAX_CHUNK_BYTES: int = 16 * 1024 * 1024
+    # Subidas de un solo request (/video/analyze, .../analyze): tamaño maximo y presupuesto
+    # del worker para las subidas en curso; por encima se responde 429/503 con Retry-After
+    UPLOAD_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    UPLOAD_MEMORY_BUDGET_BYTES: int = 256 * 1024 * 1024
+    UPLOAD_DISK_BUDGET_BYTES: int = 8 * 1024 * 1024 * 1024
+    UPLOAD_MIN_FREE_DISK_BYTES: int = 1024 * 1024 * 1024
+    UPLOAD_COPY_CHUNK_BYTES: int = 1024 * 1024
+    UPLOAD_RETRY_AFTER_SECONDS: int = 30
+
+    # Eventos en tiempo real (WebSocket/SSE): "memory" para un solo worker, "postgres" (LISTEN/NOTIFY) para varios
+    EVENTS_BACKEND: str = "memory"
+    EVENTS_CHANNEL: str = "emotionai_events"
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_KEEPALIVE_SECONDS: float = 15
+
+    # Analisis en vivo por WebSocket
+    LIVE_BATCH_SECONDS: float = 2
+    LIVE_DEFAULT_FPS: int = 5
+    LIVE_MAX_FPS: int = 30
+    LIVE_CLIP_SECONDS: float = 5
+    LIVE_QUEUE_SIZE: int = 4
+    LIVE_MAX_MESSAGE_BYTES: int = 8 * 1024 * 1024
 
 
 settings = Settings()
\ No newline at end of file
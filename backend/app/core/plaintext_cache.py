@@ -0,0 +1,84 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Costo fijo aproximado por entrada: digest, tupla y nodo del OrderedDict
+_ENTRY_OVERHEAD = 160
+
+class PlaintextCache:
+    """
+    In-memory LRU of decrypted values, keyed by a digest of the ciphertext.
+    Bounded by total bytes and by a TTL per entry. Never persisted.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _key(ciphertext: str) -> bytes:
+        return hashlib.sha256(ciphertext.encode()).digest()
+
+    def get(self, ciphertext: str) -> Optional[str]:
+        key = self._key(ciphertext)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            plaintext, size, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return plaintext
+
+    def put(self, ciphertext: str, plaintext: str):
+        size = sys.getsizeof(plaintext) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        key = self._key(ciphertext)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (plaintext, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
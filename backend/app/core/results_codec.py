@@ -0,0 +1,111 @@
+import json
+import operator
+import struct
+import threading
+import zlib
+from typing import List, Optional, Tuple
+from app.core.config import settings
+
+# Formato de almacenamiento de TherapySession.results, antes de encriptar. El JSON del
+# modelo repite "12": "happy" miles de veces; aca las emociones se guardan como un byte
+# cada una, las claves consecutivas del timeline como un solo numero, y todo se comprime.
+# Los valores viejos (texto JSON sin prefijo) se siguen leyendo igual.
+#
+#   MAGIC + version + zlib(cuerpo)
+#   version 0: cuerpo = el texto original en UTF-8
+#   version 1: cuerpo = largo del header (4 bytes) + header JSON + un byte por entrada del timeline
+
+MAGIC = b"\x00ER"
+VERSION_TEXT = 0
+VERSION_PACKED = 1
+
+def _pack(text: str) -> Optional[Tuple[bytes, bytes]]:
+    """(header, codes) for a model result, or None if it does not have the expected shape"""
+    try:
+        result = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(result, dict) or not isinstance(result.get("timeline"), dict):
+        return None
+    timeline = result["timeline"]
+    if not all(isinstance(emotion, str) for emotion in timeline.values()):
+        return None
+    emotions = list(dict.fromkeys(timeline.values()))
+    if len(emotions) > 256:
+        return None
+    codes = {emotion: i for i, emotion in enumerate(emotions)}
+    header = {
+        "k": list(result),
+        "o": {key: value for key, value in result.items() if key != "timeline"},
+        "e": emotions,
+    }
+    keys = list(timeline)
+    start = keys[0] if keys else "0"
+    if start.isdigit() and keys == [str(int(start) + i) for i in range(len(keys))]:
+        # Un segundo por entrada: alcanza con el primero
+        header["s"] = int(start)
+    else:
+        header["t"] = keys
+    return json.dumps(header, separators=(",", ":")).encode(), bytes(codes[emotion] for emotion in timeline.values())
+
+def encode(text: str) -> bytes:
+    packed = _pack(text)
+    if packed is not None:
+        header, codes = packed
+        body = struct.pack(">I", len(header)) + header + codes
+        data = MAGIC + bytes([VERSION_PACKED]) + zlib.compress(body, settings.RESULTS_COMPRESSION_LEVEL)
+        # El texto que se lee tiene que ser identico al que se guardo (espacios, orden de claves)
+        if decode(data) == text:
+            return data
+    return MAGIC + bytes([VERSION_TEXT]) + zlib.compress(text.encode(), settings.RESULTS_COMPRESSION_LEVEL)
+
+# '"0": ', '"1": ', ... reutilizados entre lecturas; las sesiones duran a lo sumo unas horas.
+# decode corre en varios threads a la vez: la lista nunca se modifica, se reemplaza entera
+# (bajo el lock) por una mas larga, y cada lectura usa la referencia que tomo
+_prefixes: List[str] = []
+_prefixes_lock = threading.Lock()
+_MAX_CACHED_SECOND = 24 * 3600
+
+def _second_prefixes(start: int, count: int) -> List[str]:
+    global _prefixes
+    end = start + count
+    if end > _MAX_CACHED_SECOND:
+        # Fuera de lo esperado: no se agranda el cache
+        return [f'"{i}": ' for i in range(start, end)]
+    prefixes = _prefixes
+    if end > len(prefixes):
+        with _prefixes_lock:
+            prefixes = _prefixes
+            if end > len(prefixes):
+                prefixes = prefixes + [f'"{i}": ' for i in range(len(prefixes), end)]
+                _prefixes = prefixes
+    return prefixes[start:end]
+
+def decode(data: bytes) -> str:
+    if not data.startswith(MAGIC):
+        # Valor guardado antes del codec
+        return data.decode()
+    version = data[len(MAGIC)]
+    body = zlib.decompress(data[len(MAGIC) + 1:])
+    if version == VERSION_TEXT:
+        return body.decode()
+    if version == VERSION_PACKED:
+        (length,) = struct.unpack_from(">I", body)
+        header = json.loads(body[4:4 + length])
+        codes = body[4 + length:]
+        # Se arma el texto directamente, igual al de json.dumps: es el camino caliente de cada lectura
+        emotions = [json.dumps(emotion) for emotion in header["e"]]
+        if "t" in header:
+            entries = [f"{json.dumps(key)}: {emotions[code]}" for key, code in zip(header["t"], codes)]
+        else:
+            entries = map(operator.add, _second_prefixes(header["s"], len(codes)), map(emotions.__getitem__, codes))
+        timeline = "{" + ", ".join(entries) + "}"
+        parts = [
+            f"{json.dumps(key)}: {timeline if key == 'timeline' else json.dumps(header['o'][key])}"
+            for key in header["k"]
+        ]
+        return "{" + ", ".join(parts) + "}"
+    raise ValueError(f"Unknown results codec version: {version}")
+
+def is_encoded(data: bytes) -> bool:
+    return data.startswith(MAGIC)
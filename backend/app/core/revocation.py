@@ -0,0 +1,155 @@
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.revoked_token import RevokedToken
+from app.models.user import User
+
+# Revocacion de access tokens sin consultar la base en cada pedido. Cada worker guarda en
+# memoria los jti revocados que todavia no vencieron, con un filtro de Bloom adelante: para
+# casi todos los tokens (los no revocados) el chequeo es un hash y unos bits, sin tocar el dict.
+# La tabla revoked_tokens es la fuente de verdad:
+#   - revoke() escribe la fila y actualiza la memoria del worker que atendio el logout
+#   - los otros workers se enteran por sync() periodico, o antes: _load_user ve
+#     users.tokens_revoked_at (la fila del usuario ya se lee en cada pedido) mas nuevo que
+#     su ultima sincronizacion (menos TOKEN_REVOCATION_SYNC_SLACK_SECONDS) y sincroniza en
+#     ese momento
+#   - las entradas se van solas cuando el token vence, de la memoria y de la tabla
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; no false negatives"""
+
+    def __init__(self, bits: int, hashes: int):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    @staticmethod
+    def _hashes(value: str):
+        digest = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=16).digest(), "little")
+        # Doble hashing: h1 + i*h2 da las k posiciones con un solo digest
+        return digest & 0xFFFFFFFFFFFFFFFF, (digest >> 64) | 1
+
+    def add(self, value: str):
+        h1, h2 = self._hashes(value)
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % self.bits
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        h1, h2 = self._hashes(value)
+        array = self._array
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % self.bits
+            if not array[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+class RevocationList:
+    def __init__(self, bloom_bits: int, bloom_hashes: int):
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+        self._revoked: Dict[str, datetime] = {}
+        self._bloom = BloomFilter(bloom_bits, bloom_hashes)
+        self._lock = threading.Lock()
+        # revoked_at de la ultima fila leida y momento de la ultima sincronizacion
+        self._watermark: Optional[datetime] = None
+        self.synced_at: Optional[datetime] = None
+        self.checks = 0
+        self.bloom_negatives = 0
+        self.rejected = 0
+
+    def is_revoked(self, jti: str) -> bool:
+        self.checks += 1
+        if jti not in self._bloom:
+            self.bloom_negatives += 1
+            return False
+        expires_at = self._revoked.get(jti)
+        if expires_at is None or expires_at <= datetime.utcnow():
+            return False
+        self.rejected += 1
+        return True
+
+    def _add(self, jti: str, expires_at: datetime):
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._bloom.add(jti)
+
+    def revoke(self, db: Session, jti: str, user_id: int, expires_at: datetime):
+        """Revoke one token until its expiry; effective at once in this worker. Commits."""
+        now = datetime.utcnow()
+        db.add(RevokedToken(jti=jti, user_id=user_id, revoked_at=now, expires_at=expires_at))
+        try:
+            db.flush()
+        except IntegrityError:
+            # Ya estaba revocado
+            db.rollback()
+        db.query(User).filter(User.id == user_id).update({User.tokens_revoked_at: now})
+        db.commit()
+        self._add(jti, expires_at)
+
+    def sync(self, db: Session) -> int:
+        """Load the tokens revoked since the last sync; returns how many were read"""
+        started = datetime.utcnow()
+        query = db.query(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at).filter(RevokedToken.expires_at > started)
+        if self._watermark is not None:
+            # Margen para filas con revoked_at apenas anterior que se confirmaron despues
+            query = query.filter(RevokedToken.revoked_at >= self._watermark - timedelta(seconds=settings.TOKEN_REVOCATION_SYNC_SLACK_SECONDS))
+        rows = query.all()
+        for jti, expires_at, revoked_at in rows:
+            self._add(jti, expires_at)
+            if self._watermark is None or revoked_at > self._watermark:
+                self._watermark = revoked_at
+        if self._watermark is None:
+            self._watermark = started
+        self.synced_at = started
+        return len(rows)
+
+    def prune(self) -> int:
+        """Forget expired tokens; the Bloom filter is rebuilt with the remaining ones"""
+        now = datetime.utcnow()
+        with self._lock:
+            revoked = {jti: expires_at for jti, expires_at in self._revoked.items() if expires_at > now}
+            removed = len(self._revoked) - len(revoked)
+            if removed:
+                bloom = BloomFilter(self.bloom_bits, self.bloom_hashes)
+                for jti in revoked:
+                    bloom.add(jti)
+                # Se reemplazan enteros: is_revoked no toma el lock
+                self._revoked, self._bloom = revoked, bloom
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "revoked": len(self._revoked),
+            "checks": self.checks,
+            "bloom_negatives": self.bloom_negatives,
+            "rejected": self.rejected,
+            "synced_at": self.synced_at,
+        }
+
+revocations = RevocationList(settings.TOKEN_REVOCATION_BLOOM_BITS, settings.TOKEN_REVOCATION_BLOOM_HASHES)
+
+def purge_expired(db: Session) -> int:
+    deleted = db.query(RevokedToken).filter(RevokedToken.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def sync_forever(stop: threading.Event):
+    """Background loop started with the app: sync, prune and delete expired rows"""
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            revocations.sync(db)
+            revocations.prune()
+            purge_expired(db)
+        except Exception as e:
+            db.rollback()
+            print(f"[TokenRevocation] Sync failed: {e}")
+        finally:
+            db.close()
+        stop.wait(settings.TOKEN_REVOCATION_SYNC_SECONDS)
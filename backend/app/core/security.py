@@ -1,22 +1,62 @@
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from app.core.config import settings
+from app.core.plaintext_cache import PlaintextCache
+from app.core import results_codec, tracing
+import hashlib
 
 # This key needs to be a 32-byte URL-safe base64-encoded key
 # We will derive it from the SECRET_KEY in the config
 key = settings.ENCRYPTION_KEY.encode()
-fernet = Fernet(key)
+primary_fernet = Fernet(key)
+# Las claves anteriores solo se usan para desencriptar mientras dura una rotacion
+previous_keys = [k.strip().encode() for k in settings.ENCRYPTION_KEYS_PREVIOUS.split(",") if k.strip()]
+fernet = MultiFernet([primary_fernet] + [Fernet(k) for k in previous_keys])
 
-def encrypt_data(data: str) -> str:
+# Cache opcional de valores desencriptados, solo en memoria
+decrypt_cache = (
+    PlaintextCache(settings.DECRYPT_CACHE_MAX_BYTES, settings.DECRYPT_CACHE_TTL_SECONDS)
+    if settings.DECRYPT_CACHE_ENABLED else None
+)
+
+def primary_key_fingerprint() -> str:
+    return hashlib.sha256(key).hexdigest()[:16]
+
+def is_primary_token(encrypted_data: str) -> bool:
+    """True if the value is already encrypted with the primary key"""
+    try:
+        primary_fernet.decrypt(encrypted_data.encode())
+        return True
+    except InvalidToken:
+        return False
+
+def rotate_token(encrypted_data: str) -> str:
+    """Re-encrypt a value with the primary key (it may be encrypted with any known key)"""
+    return fernet.rotate(encrypted_data.encode()).decode()
+
+def encrypt_data(data: str, cache: bool = True, encode=str.encode) -> str:
+    """cache=False for bulk writes that will not be read right away; encode turns the text into the stored bytes"""
     if not data:
         return data
-    encrypted_data = fernet.encrypt(data.encode())
-    return encrypted_data.decode()
+    plaintext = encode(data)
+    with tracing.span("crypto.encrypt", bytes=len(plaintext)):
+        encrypted_data = fernet.encrypt(plaintext).decode()
+    if cache and decrypt_cache is not None:
+        # El valor recien escrito se suele leer enseguida (refresh, listados)
+        decrypt_cache.put(encrypted_data, data)
+    return encrypted_data
 
-def decrypt_data(encrypted_data: str) -> str:
+def decrypt_data(encrypted_data: str, decode=bytes.decode) -> str:
     if not encrypted_data:
         return encrypted_data
-    decrypted_data = fernet.decrypt(encrypted_data.encode())
-    return decrypted_data.decode()
+    if decrypt_cache is not None:
+        cached = decrypt_cache.get(encrypted_data)
+        if cached is not None:
+            return cached
+    with tracing.span("crypto.decrypt", bytes=len(encrypted_data)):
+        decrypted_data = decode(fernet.decrypt(encrypted_data.encode()))
+    if decrypt_cache is not None:
+        decrypt_cache.put(encrypted_data, decrypted_data)
+    return decrypted_data
 
 from sqlalchemy import TypeDecorator, String, Text
 import json
@@ -63,4 +103,21 @@ class EncryptedText(TypeDecorator):
         """
         if value is not None:
             return decrypt_data(str(value))
-        return value 
\ No newline at end of file
+        return value 
+
+class EncryptedResults(TypeDecorator):
+    """EncryptedText for analysis results: packed with results_codec before encrypting."""
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None:
+            return encrypt_data(str(value), encode=results_codec.encode)
+        return value
+
+    def process_result_value(self, value, dialect):
+        # results_codec.decode tambien lee los valores guardados como texto antes del codec
+        if value is not None:
+            return decrypt_data(str(value), decode=results_codec.decode)
+        return value
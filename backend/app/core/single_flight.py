@@ -0,0 +1,123 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+# Single-flight: pedidos identicos que llegan al mismo tiempo (la misma clinica abriendo un
+# paciente en varios dispositivos) esperan una sola llamada en curso en vez de repetirla.
+# No es un cache: cuando la llamada termina la clave se libera y el proximo pedido vuelve
+# a llamar. Los errores se propagan a todos los que esperaban.
+
+_groups: List["SingleFlight"] = []
+
+class _AsyncCall:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class _SyncCall:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+    run() is for coroutines and run_sync() for blocking functions (sync routes);
+    the two never share in-flight calls even with the same key.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._async_calls: Dict[Hashable, _AsyncCall] = {}
+        self._sync_calls: Dict[Hashable, _SyncCall] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.cancelled = 0
+        _groups.append(self)
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() once for all concurrent callers of key. A caller that is cancelled
+        stops waiting without cancelling the others; the call itself is cancelled only
+        when nobody is waiting for it anymore.
+        """
+        call = self._async_calls.get(key)
+        with self._lock:
+            self.calls += 1
+            if call is None:
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if call is None:
+            call = _AsyncCall(asyncio.ensure_future(fn()))
+            self._async_calls[key] = call
+            call.task.add_done_callback(lambda task: self._async_done(key, call))
+        call.waiters += 1
+        try:
+            # shield: cancelar a un llamador no cancela la tarea compartida
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _async_done(self, key: Hashable, call: _AsyncCall):
+        if self._async_calls.get(key) is call:
+            del self._async_calls[key]
+        with self._lock:
+            if call.task.cancelled():
+                self.cancelled += 1
+            elif call.task.exception() is not None:
+                self.errors += 1
+
+    def run_sync(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Blocking version: the first caller runs fn() and the others wait for its result"""
+        with self._lock:
+            self.calls += 1
+            call = self._sync_calls.get(key)
+            leader = call is None
+            if leader:
+                call = _SyncCall()
+                self._sync_calls[key] = call
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._sync_calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "cancelled": self.cancelled,
+                "in_flight": len(self._async_calls) + len(self._sync_calls),
+            }
+
+def stats() -> Dict[str, dict]:
+    return {group.name: group.stats() for group in _groups}
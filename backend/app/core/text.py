@@ -0,0 +1,8 @@
+import unicodedata
+
+def normalize_name(name: str) -> str:
+    if not name:
+        return ''
+    # Quitar tildes y pasar a minúsculas
+    nfkd = unicodedata.normalize('NFKD', name)
+    return ''.join([c for c in nfkd if not unicodedata.combining(c)]).lower()
@@ -0,0 +1,219 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from app.core.config import settings
+
+# Trazas livianas sin dependencias externas. El middleware HTTP abre un span raiz por
+# pedido; las consultas SQL, la encriptacion y las llamadas al modelo/agente abren spans
+# hijos. Al terminar el span raiz la traza completa se manda al exporter configurado.
+# Fuera de un pedido trazado (tareas de fondo, scripts) span() no hace nada.
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "attributes", "start", "elapsed", "_started")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.elapsed = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.elapsed or 0.0) * 1000
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self._started
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+        }
+
+class Trace:
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.dropped = 0
+
+    def add(self, span: Span) -> bool:
+        if len(self.spans) >= settings.TRACING_MAX_SPANS:
+            self.dropped += 1
+            return False
+        self.spans.append(span)
+        return True
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+class ConsoleExporter:
+    """Print each trace as an indented tree of spans with their durations"""
+
+    def export(self, trace: Trace):
+        children: Dict[Optional[str], List[Span]] = {}
+        for span in trace.spans:
+            children.setdefault(span.parent_id, []).append(span)
+        known = {span.span_id for span in trace.spans}
+        roots = [span for span in trace.spans if span.parent_id not in known]
+        lines = [f"[Trace] {trace.trace_id} ({len(trace.spans)} spans, {trace.dropped} dropped)"]
+
+        def walk(span: Span, depth: int):
+            detail = " ".join(f"{k}={v}" for k, v in span.attributes.items() if k != "db.statement")
+            lines.append(f"[Trace] {'  ' * depth}{span.name} {span.duration_ms:.1f}ms {detail}".rstrip())
+            for child in sorted(children.get(span.span_id, []), key=lambda s: s.start):
+                walk(child, depth + 1)
+
+        for root in roots:
+            walk(root, 0)
+        print("\n".join(lines))
+
+class FileExporter:
+    """Append one JSON line per span, for grepping or loading into a notebook"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace):
+        data = "".join(json.dumps(span.to_dict()) + "\n" for span in trace.spans)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(data)
+
+def _make_exporter():
+    if settings.TRACING_EXPORTER == "file":
+        return FileExporter(settings.TRACING_FILE)
+    if settings.TRACING_EXPORTER == "console":
+        return ConsoleExporter()
+    raise ValueError(f"Unknown TRACING_EXPORTER: {settings.TRACING_EXPORTER}")
+
+exporter = _make_exporter() if settings.TRACING_ENABLED else None
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+@contextmanager
+def _activate(span: Span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.set("error", type(e).__name__)
+        raise
+    finally:
+        span.finish()
+        _current_span.reset(token)
+
+@contextmanager
+def _noop():
+    yield None
+
+def span(name: str, **attributes):
+    """Child span of the current one; a no-op outside a traced request"""
+    parent = _current_span.get()
+    if parent is None:
+        return _noop()
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    if not parent.trace.add(child):
+        return _noop()
+    return _activate(child)
+
+@contextmanager
+def trace_request(name: str, traceparent: Optional[str] = None, **attributes):
+    """
+    Root span of a request. Continues the caller's trace if a valid W3C traceparent
+    is given; otherwise samples TRACING_SAMPLE_RATE of requests.
+    """
+    if exporter is None:
+        yield None
+        return
+    match = _TRACEPARENT_RE.match((traceparent or "").strip().lower())
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        sampled = int(flags, 16) & 1
+    else:
+        trace_id, parent_id = None, None
+        sampled = random.random() < settings.TRACING_SAMPLE_RATE
+    if not sampled:
+        yield None
+        return
+    trace = Trace(trace_id)
+    root = Span(trace, name, parent_id, attributes)
+    trace.add(root)
+    try:
+        with _activate(root):
+            yield root
+    finally:
+        try:
+            exporter.export(trace)
+        except Exception as e:
+            print(f"[Tracing] Could not export trace {trace.trace_id}: {e}")
+
+def inject(headers: Optional[dict] = None) -> dict:
+    """Add the W3C traceparent of the current span to outgoing request headers"""
+    headers = dict(headers or {})
+    current = _current_span.get()
+    if current is not None:
+        headers["traceparent"] = current.traceparent()
+    return headers
+
+# --- SQLAlchemy ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is None or context is None:
+        return
+    # Solo el SQL, nunca los parametros (pueden tener datos de pacientes)
+    child = Span(parent.trace, "db.query", parent.span_id, {
+        "db.system": conn.dialect.name,
+        "db.statement": " ".join(statement.split())[:300],
+    })
+    if parent.trace.add(child):
+        context._trace_span = child
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    child = getattr(context, "_trace_span", None)
+    if child is not None:
+        child.finish()
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            child.set("db.rowcount", cursor.rowcount)
+
+def _handle_error(exception_context):
+    child = getattr(exception_context.execution_context, "_trace_span", None)
+    if child is not None:
+        child.finish()
+        child.set("error", type(exception_context.original_exception).__name__)
+
+def instrument_sqlalchemy():
+    """Per-query spans for every engine (primary, replicas, test engines)"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+if settings.TRACING_ENABLED:
+    instrument_sqlalchemy()
@@ -1,10 +1,28 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.sql.elements import TextClause
 from app.core.config import settings
+import hashlib
+import itertools
+import re
+import threading
+import time
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def enable_foreign_keys(target_engine):
+    """SQLite ignores foreign keys (and ON DELETE CASCADE) unless enabled on every connection"""
+    if target_engine.dialect.name == "sqlite" and not event.contains(target_engine, "connect", _enable_sqlite_foreign_keys):
+        event.listen(target_engine, "connect", _enable_sqlite_foreign_keys)
+
 engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+enable_foreign_keys(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -15,4 +33,152 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# --- Replicas de lectura ---
+
+# En Postgres el lag es 0 si la replica ya aplico todo lo recibido; si no, el tiempo desde la ultima transaccion aplicada
+_POSTGRES_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+class ReplicaPool:
+    """
+    Read replicas with round-robin selection. A background thread checks every replica
+    each REPLICA_HEALTHCHECK_SECONDS; replicas that are down or lag more than
+    REPLICA_MAX_LAG_SECONDS are skipped until they recover.
+    """
+
+    def __init__(self, urls, check_interval: float, max_lag: float, lag_fallback: str):
+        self.engines = [create_engine(url, pool_pre_ping=True) for url in urls]
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.lag_fallback = lag_fallback
+        # "unknown" hasta el primer chequeo; mientras tanto se lee del primario
+        self.status = {id(e): "unknown" for e in self.engines}
+        self.lag = {id(e): None for e in self.engines}
+        self._counter = itertools.count()
+        self._monitor = None
+        self._lock = threading.Lock()
+
+    def _measure_lag(self, replica) -> float:
+        with replica.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                return float(conn.execute(_POSTGRES_LAG_SQL).scalar() or 0)
+            conn.execute(text("SELECT 1"))
+            return 0.0
+
+    def check(self):
+        for replica in self.engines:
+            try:
+                lag = self._measure_lag(replica)
+            except Exception as e:
+                if self.status[id(replica)] != "down":
+                    print(f"[Replicas] {replica.url.render_as_string(hide_password=True)} is down: {e}")
+                self.status[id(replica)] = "down"
+                self.lag[id(replica)] = None
+                continue
+            self.lag[id(replica)] = lag
+            self.status[id(replica)] = "ok" if lag <= self.max_lag else "lagging"
+
+    def _run_monitor(self):
+        while True:
+            self.check()
+            time.sleep(self.check_interval)
+
+    def start(self):
+        with self._lock:
+            if self._monitor is None:
+                self._monitor = threading.Thread(target=self._run_monitor, name="replica-monitor", daemon=True)
+                self._monitor.start()
+
+    def choose(self):
+        """Next healthy replica, or None to read from the primary"""
+        self.start()
+        candidates = [e for e in self.engines if self.status[id(e)] == "ok"]
+        if not candidates and self.lag_fallback == "replica":
+            # Preferir datos algo atrasados antes que cargar al primario
+            candidates = [e for e in self.engines if self.status[id(e)] == "lagging"]
+        if not candidates:
+            return None
+        return candidates[next(self._counter) % len(candidates)]
+
+    def health(self) -> list:
+        return [
+            {
+                "url": e.url.render_as_string(hide_password=True),
+                "status": self.status[id(e)],
+                "lag_seconds": self.lag[id(e)],
+            }
+            for e in self.engines
+        ]
+
+_replica_urls = [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+replicas = (
+    ReplicaPool(_replica_urls, settings.REPLICA_HEALTHCHECK_SECONDS, settings.REPLICA_MAX_LAG_SECONDS, settings.REPLICA_LAG_FALLBACK)
+    if _replica_urls else None
+)
+
+_LOCKING_READ = re.compile(r"\bfor\s+(no\s+key\s+)?(update|share)\b")
+
+def _is_read(clause) -> bool:
+    """Only statements known to be plain reads may go to a replica"""
+    if isinstance(clause, TextClause):
+        # text() no dice si escribe: solo un SELECT sin bloqueo de filas va a la replica
+        sql = clause.text.lstrip().lower()
+        return sql.startswith("select") and not _LOCKING_READ.search(sql)
+    return getattr(clause, "is_select", False) and getattr(clause, "_for_update_arg", None) is None
+
+class RoutingSession(Session):
+    """
+    Session that sends SELECTs to a replica and everything else to the primary.
+    Once it has written anything it stays on the primary, so it reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or not _is_read(clause):
+            self.info["use_primary"] = True
+        if replicas is None or self.info.get("use_primary"):
+            return engine
+        if "replica" not in self.info:
+            # Una sola replica por sesion, para leer de un mismo snapshot
+            self.info["replica"] = replicas.choose() or engine
+        return self.info["replica"]
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession)
+
+# Ultima escritura de cada cliente (digest del header Authorization), para leer del primario
+# durante READ_YOUR_WRITES_SECONDS despues de que el mismo cliente escribio algo
+_recent_writes = {}
+
+def _client_key(authorization: str) -> str:
+    return hashlib.sha256(authorization.encode()).hexdigest()
+
+def note_write(authorization: str):
+    if not authorization:
+        return
+    now = time.monotonic()
+    _recent_writes[_client_key(authorization)] = now
+    if len(_recent_writes) > 10000:
+        cutoff = now - settings.READ_YOUR_WRITES_SECONDS
+        for key, written_at in list(_recent_writes.items()):
+            if written_at < cutoff:
+                _recent_writes.pop(key, None)
+
+def wrote_recently(authorization: str) -> bool:
+    if not authorization:
+        return False
+    written_at = _recent_writes.get(_client_key(authorization))
+    return written_at is not None and time.monotonic() - written_at < settings.READ_YOUR_WRITES_SECONDS
+
+def read_session(authorization: str = None) -> Session:
+    """Session for read-only work: replica if configured, primary right after this client wrote."""
+    if wrote_recently(authorization):
+        db = SessionLocal()
+        # Marca para no compartir resultados con pedidos que pudieron empezar antes de la escritura
+        db.info["read_your_writes"] = True
+        return db
+    if replicas is None:
+        return SessionLocal()
+    return ReadSessionLocal()
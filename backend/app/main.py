@@ -1,25 +1,37 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, Request, UploadFile, File
+from starlette.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
-from app.services.api_client import analyze_video
+from app.services.segmented_analysis import analyze_video_segmented
 from fastapi.middleware.cors import CORSMiddleware
 from app.services.agent_service import agent_service
+from app.services.chunked_upload import purge_expired_uploads
+from app.services.events import broker
+from app.services import clinic_rollup, idempotency, patient_purge, upload_admission
+from app.services.model_scheduler import anonymous_tenant
+from app.core import revocation, tracing
 
 import os
+import threading
 
 from app.schemas.video import VideoAnalysisResponse
 from fastapi.exceptions import HTTPException, RequestValidationError
 
-from app.database import Base, engine
+from app.database import Base, SessionLocal, engine, note_write
 from app.models.user import User
 from app.models.patient import Patient
 from app.models.therapy_session import TherapySession
+from app.models.idempotency_key import IdempotencyKey
 
-from app.routes import user, patient, analytics, therapy_session, agent
+from app.routes import user, patient, analytics, therapy_session, agent, upload, admin, search, events, live
 
 Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="EmotionAI Backend", version="1.0.0")
 
+# Cortan el refresco periodico de los totales por clinica y la sincronizacion de tokens revocados al apagar
+rollup_stop = threading.Event()
+revocation_stop = threading.Event()
+
 # Global Exception handler to log validation errors (422)
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
@@ -31,6 +43,31 @@ async def validation_exception_handler(request, exc):
         content={"detail": exc.errors()}
     )
 
+@app.middleware("http")
+async def trace_requests(request, call_next):
+    """Root span per request when TRACING_ENABLED; the trace id is returned in X-Trace-Id"""
+    with tracing.trace_request(f"{request.method} {request.url.path}", request.headers.get("traceparent"), method=request.method) as root:
+        response = await call_next(request)
+        if root is not None:
+            route = request.scope.get("route")
+            if route is not None:
+                # Nombre por plantilla de ruta para poder agrupar, no por la URL con ids
+                root.name = f"{request.method} {route.path}"
+            root.set("status_code", response.status_code)
+            response.headers["X-Trace-Id"] = root.trace.trace_id
+        return response
+
+@app.middleware("http")
+async def track_client_writes(request, call_next):
+    """Remember clients that just wrote, so their next reads skip the replicas and shared in-flight reads"""
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        note_write(request.headers.get("authorization"))
+    return response
+
+# Admision de subidas: antes de leer el cuerpo y con el tamaño controlado mientras llega
+app.add_middleware(upload_admission.UploadAdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -43,34 +80,59 @@ app.include_router(user.router)
 app.include_router(patient.router)
 app.include_router(analytics.router)
 app.include_router(therapy_session.router)
+app.include_router(therapy_session.bulk_router)
+app.include_router(upload.router)
+app.include_router(live.router)
+app.include_router(admin.router)
+app.include_router(search.router)
+app.include_router(events.router)
 app.include_router(agent.router, prefix="", tags=["agent"])
 
+@app.on_event("startup")
+async def startup_event():
+    """Remove expired uploads and idempotency keys, resume patient purges, start the background refreshers and the event listener"""
+    purge_expired_uploads()
+    db = SessionLocal()
+    try:
+        idempotency.purge_expired(db)
+    except Exception as e:
+        # Una limpieza fallida no debe impedir que arranque el servidor
+        print(f"[Idempotency] Could not purge expired keys: {e}")
+    finally:
+        db.close()
+    # Terminar los purges de pacientes que quedaron a medias, sin demorar el arranque
+    threading.Thread(target=patient_purge.run_purge, name="patient-purge", daemon=True).start()
+    rollup_stop.clear()
+    threading.Thread(target=clinic_rollup.refresh_forever, args=(rollup_stop,), name="clinic-rollup", daemon=True).start()
+    revocation_stop.clear()
+    threading.Thread(target=revocation.sync_forever, args=(revocation_stop,), name="token-revocation", daemon=True).start()
+    broker.start()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup when the application shuts down"""
+    rollup_stop.set()
+    revocation_stop.set()
+    broker.stop()
     await agent_service.close()
 
 @app.post("/video/analyze", response_model=VideoAnalysisResponse)
-async def analyze(file: UploadFile = File(...)):
+async def analyze(request: Request, file: UploadFile = File(...)):
     try:
-        temp_dir = "./temp"
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_file_path = os.path.join(temp_dir, file.filename)
-
-        with open(temp_file_path, "wb") as temp_file:
-            temp_file.write(await file.read())
-
-        if not os.path.exists(temp_file_path):
-            print(f"El archivo {temp_file_path} no existe")
-            raise HTTPException(status_code=500, detail="El archivo temporal no fue creado correctamente")
-
-        if os.path.getsize(temp_file_path) == 0:
-            raise HTTPException(status_code=500, detail="archivo vacio")
-
-        result = analyze_video(temp_file_path)
+        temp_file_path = await upload_admission.save_upload(file, "./temp")
+        try:
+            if os.path.getsize(temp_file_path) == 0:
+                raise HTTPException(status_code=500, detail="archivo vacio")
 
-        os.remove(temp_file_path)
+            # En un thread para no bloquear el loop; sin clinica, cada cliente tiene su propio turno en el planificador
+            tenant = anonymous_tenant(request.client.host if request.client else None)
+            result = await run_in_threadpool(analyze_video_segmented, temp_file_path, tenant=tenant)
+        finally:
+            os.remove(temp_file_path)
 
         return JSONResponse(content=result)
+    except HTTPException:
+        # 429/503 del planificador o de la admision, 413, etc.: con su codigo y headers
+        raise
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
\ No newline at end of file
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
+from app.database import Base
+from datetime import datetime
+from app.core.security import EncryptedText
+
+class ChatMessage(Base):
+    """Local copy of the conversation with the agent about a patient"""
+    __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Lecturas incrementales: mensajes de un paciente con id > cursor
+        Index("ix_chat_messages_patient_id_id", "patient_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    patient_id = Column(Integer, ForeignKey("patients.id", ondelete="CASCADE"), nullable=False)
+    role = Column(String, nullable=False)  # "user" | "agent"
+    content = Column(EncryptedText, nullable=False)
+    # Sesiones seleccionadas al enviar el mensaje, como ",3,7," para poder filtrar con LIKE
+    session_ids = Column(String, nullable=True)
+    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class ChatBackfill(Base):
+    """Patients whose remote agent history was already copied into chat_messages"""
+    __tablename__ = "chat_backfills"
+
+    patient_id = Column(Integer, ForeignKey("patients.id", ondelete="CASCADE"), primary_key=True)
+    messages = Column(Integer, nullable=False, default=0)
+    backfilled_at = Column(DateTime, default=datetime.utcnow)
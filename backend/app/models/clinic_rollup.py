@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey
+from app.database import Base
+from datetime import datetime
+
+# Series por clinica precalculadas desde therapy_sessions (ver services/clinic_rollup.py).
+# period es "day" o "week"; bucket es el dia, o el lunes de la semana.
+
+class ClinicSessionRollup(Base):
+    """Number of sessions of a clinic per day or week"""
+    __tablename__ = "clinic_session_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    period = Column(String(8), primary_key=True)
+    bucket = Column(Date, primary_key=True)
+    sessions = Column(Integer, nullable=False, default=0)
+
+class ClinicEmotionRollup(Base):
+    """Emotion totals of a clinic per day or week"""
+    __tablename__ = "clinic_emotion_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    period = Column(String(8), primary_key=True)
+    bucket = Column(Date, primary_key=True)
+    emotion = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class ClinicRollupProgress(Base):
+    """Lock row and last run of the rollup refresh (counted sessions have rolled_up set)"""
+    __tablename__ = "clinic_rollup_progress"
+
+    name = Column(String, primary_key=True)
+    refreshed_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint
+from app.database import Base
+from datetime import datetime
+from app.core.security import EncryptedText
+
+class IdempotencyKey(Base):
+    """Stored response of a request sent with an Idempotency-Key header, replayed on retries"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(255), nullable=False)
+    # sha256 del metodo, la ruta y el cuerpo; la misma clave con otro cuerpo es un error del cliente
+    fingerprint = Column(String(64), nullable=False)
+    status = Column(String, nullable=False, default="processing")  # processing | completed
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(EncryptedText, nullable=True)  # Puede contener resultados clinicos
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
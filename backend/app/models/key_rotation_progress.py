@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from app.database import Base
+from datetime import datetime
+
+class KeyRotationProgress(Base):
+    """Checkpoint of the background re-encryption job, one row per encrypted table"""
+    __tablename__ = "key_rotation_progress"
+
+    table_name = Column(String, primary_key=True)
+    # Huella de la clave primaria con la que se esta re-encriptando; si cambia, el trabajo empieza de nuevo
+    key_fingerprint = Column(String, nullable=False)
+    last_id = Column(Integer, nullable=False, default=0)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    rows_rotated = Column(Integer, nullable=False, default=0)
+    total_rows = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Index, DateTime
 from sqlalchemy.orm import relationship
 from app.database import Base
 from app.core.security import EncryptedString, EncryptedText
@@ -6,6 +6,13 @@ from .patient_note import PatientNote
 
 class Patient(Base):
     __tablename__ = "patients"
+    __table_args__ = (
+        # Todas las consultas filtran por user_id (la clinica dueña del paciente)
+        Index("ix_patients_user_id_id", "user_id", "id"),
+        Index("ix_patients_user_id_age", "user_id", "age"),
+        # Pacientes borrados que el purge todavia no elimino
+        Index("ix_patients_deleted_at", "deleted_at"),
+    )
 
     #agregar despues diagnostico y observaciones
     id = Column(Integer, primary_key=True, index=True)
@@ -14,6 +21,8 @@ class Patient(Base):
     age = Column(Integer, nullable=False)
     observations = Column(EncryptedText, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"))
+    # Borrado logico: el paciente deja de verse enseguida y sus datos se eliminan en segundo plano
+    deleted_at = Column(DateTime, nullable=True)
 
     # Alias para compatibilidad con el schema
     @property
@@ -21,5 +30,6 @@ class Patient(Base):
         return self.user_id
 
     user = relationship("User", back_populates="patients")
-    therapy_sessions = relationship("TherapySession", back_populates="patient")
-    notes = relationship("PatientNote", back_populates="patient", cascade="all, delete-orphan")
\ No newline at end of file
+    # passive_deletes: las filas hijas las borra la base (ON DELETE CASCADE), sin cargarlas en la sesion
+    therapy_sessions = relationship("TherapySession", back_populates="patient", passive_deletes=True)
+    notes = relationship("PatientNote", back_populates="patient", cascade="all, delete-orphan", passive_deletes=True)
\ No newline at end of file
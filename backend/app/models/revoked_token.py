@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from app.database import Base
+from datetime import datetime
+
+class RevokedToken(Base):
+    """Access token revoked before its expiry (logout); the row can go once the token expires"""
+    __tablename__ = "revoked_tokens"
+    __table_args__ = (
+        # Sincronizacion incremental y limpieza de vencidos
+        Index("ix_revoked_tokens_revoked_at", "revoked_at"),
+        Index("ix_revoked_tokens_expires_at", "expires_at"),
+    )
+
+    jti = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, UniqueConstraint
+from app.database import Base
+
+class SearchDocument(Base):
+    """A note or session observation that is present in the search index"""
+    __tablename__ = "search_documents"
+    __table_args__ = (
+        UniqueConstraint("doc_type", "doc_id", name="uq_search_documents_doc"),
+        # Borrado de los documentos de un paciente
+        Index("ix_search_documents_patient_id", "patient_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    patient_id = Column(Integer, ForeignKey("patients.id", ondelete="CASCADE"), nullable=False)
+    doc_type = Column(String, nullable=False)  # "note" | "session"
+    doc_id = Column(Integer, nullable=False)
+    length = Column(Integer, nullable=False)  # cantidad de tokens, para normalizar el ranking
+
+class SearchPosting(Base):
+    """
+    Inverted index entry: a keyed hash of a normalized token and how often it appears in a document.
+    Only hashes are stored, never the plaintext words.
+    """
+    __tablename__ = "search_postings"
+    __table_args__ = (
+        Index("ix_search_postings_user_id_token", "user_id", "token"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey("search_documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, nullable=False)
+    token = Column(String(32), nullable=False)
+    frequency = Column(Integer, nullable=False)
@@ -1,16 +1,27 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index, Boolean, false, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
-from app.core.security import EncryptedText
+from app.core.security import EncryptedResults, EncryptedText
 
 class TherapySession(Base):
     __tablename__ = "therapy_sessions"
+    __table_args__ = (
+        # Sesiones de un paciente ordenadas por fecha (listados y analytics)
+        Index("ix_therapy_sessions_patient_id_date", "patient_id", "date"),
+        # Sesiones que el refresco de clinic_rollup todavia no sumo (indice parcial, queda chico)
+        Index(
+            "ix_therapy_sessions_pending_rollup", "id",
+            postgresql_where=text("NOT rolled_up"),
+            sqlite_where=text("NOT rolled_up"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime, default=datetime.utcnow)
-    results = Column(EncryptedText, nullable=False)  # JSON string with analysis results
+    results = Column(EncryptedResults, nullable=False)  # JSON string with analysis results
     observations = Column(EncryptedText, nullable=True)  # Clinician's observations for this session
-    patient_id = Column(Integer, ForeignKey("patients.id"))
+    patient_id = Column(Integer, ForeignKey("patients.id", ondelete="CASCADE"))
+    rolled_up = Column(Boolean, nullable=False, default=False, server_default=false())  # Already counted in the clinic rollups
 
     patient = relationship("Patient", back_populates="therapy_sessions")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, DateTime
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -14,6 +14,10 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     role = Column(String, default="clinic")
+    # Tokens emitidos antes de esto no valen (cambio de contraseña)
+    tokens_not_before = Column(DateTime, nullable=True)
+    # Ultimo logout: los workers que sincronizaron antes vuelven a leer revoked_tokens
+    tokens_revoked_at = Column(DateTime, nullable=True)
 
     patients = relationship("Patient", back_populates="user")
 
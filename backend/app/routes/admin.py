@@ -0,0 +1,114 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.models.user import User
+from app.routes.deps import get_db, get_read_db, get_admin_user
+from app.services import clinic_rollup, emotion_context, key_rotation, research_export, search_index, upload_admission
+from app.core.security import decrypt_cache
+from app.core import single_flight
+from app.core.revocation import revocations
+from app.database import replicas
+from app.services.events import broker
+from app.services.model_scheduler import scheduler
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.post("/key-rotation", status_code=202)
+def start_key_rotation(background_tasks: BackgroundTasks, current_user: User = Depends(get_admin_user)):
+    """
+    Re-encrypt all encrypted columns with the current ENCRYPTION_KEY in the background.
+    Deploy the new key as ENCRYPTION_KEY with the old one in ENCRYPTION_KEYS_PREVIOUS first.
+    """
+    if key_rotation.is_running():
+        return {"status": "running"}
+    background_tasks.add_task(key_rotation.run_key_rotation)
+    return {"status": "started"}
+
+@router.get("/key-rotation")
+def get_key_rotation_progress(db: Session = Depends(get_db), current_user: User = Depends(get_admin_user)):
+    return {
+        "running": key_rotation.is_running(),
+        "tables": key_rotation.get_progress(db),
+    }
+
+@router.get("/decrypt-cache")
+def get_decrypt_cache_stats(current_user: User = Depends(get_admin_user)):
+    if decrypt_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **decrypt_cache.stats()}
+
+@router.get("/replicas")
+def get_replica_health(current_user: User = Depends(get_admin_user)):
+    if replicas is None:
+        return {"enabled": False, "replicas": []}
+    return {"enabled": True, "replicas": replicas.health()}
+
+@router.post("/search-index/rebuild")
+def rebuild_search_index(db: Session = Depends(get_db), current_user: User = Depends(get_admin_user)):
+    """Index all notes and session observations again, e.g. after changing SEARCH_INDEX_KEY"""
+    return {"indexed": search_index.rebuild_index(db)}
+
+@router.post("/clinic-rollups/rebuild")
+def rebuild_clinic_rollups(db: Session = Depends(get_db), current_user: User = Depends(get_admin_user)):
+    """Recompute the per-clinic emotion rollups from every session"""
+    return {"sessions": clinic_rollup.rebuild(db)}
+
+@router.get("/token-revocation")
+def get_token_revocation_stats(current_user: User = Depends(get_admin_user)):
+    """Revoked tokens held in memory by this worker and how many checks the Bloom filter answered"""
+    return revocations.stats()
+
+@router.get("/events")
+def get_event_broker_stats(current_user: User = Depends(get_admin_user)):
+    return broker.stats()
+
+@router.get("/model-scheduler")
+def get_model_scheduler_stats(current_user: User = Depends(get_admin_user)):
+    """Queue depth, running calls and wait times per clinic in front of the model API"""
+    return scheduler.stats()
+
+@router.get("/emotion-context")
+def get_emotion_context_cache_stats(current_user: User = Depends(get_admin_user)):
+    return emotion_context.cache_stats()
+
+@router.get("/single-flight")
+def get_single_flight_stats(current_user: User = Depends(get_admin_user)):
+    """Calls coalesced into an identical in-flight call, per group"""
+    return single_flight.stats()
+
+@router.get("/uploads")
+def get_upload_admission_stats(current_user: User = Depends(get_admin_user)):
+    """Upload bytes in flight on this worker against the memory and disk budgets"""
+    return upload_admission.budget.stats()
+
+@router.get("/export/{table}")
+def export_research_data(
+    table: str,
+    format: str = "parquet",
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    De-identified export of every session for offline analysis, streamed as Parquet or an
+    Arrow IPC stream. table is "sessions" (one row per session) or "timeline" (one row per second).
+    """
+    if table not in research_export.TABLES:
+        raise HTTPException(status_code=404, detail="Unknown export table")
+    if format not in research_export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(research_export.FORMATS)}")
+    research_export.require_pyarrow()
+    bind = db.get_bind()
+
+    def stream():
+        # Sesion propia: la del request se cierra antes de que termine la respuesta
+        export_db = Session(bind=bind)
+        try:
+            yield from research_export.stream_export(export_db, table, format)
+        finally:
+            export_db.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=research_export.FORMATS[format][0],
+        headers={"Content-Disposition": f'attachment; filename="{research_export.export_filename(table, format)}"'},
+    )
@@ -1,75 +1,116 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.orm import Session
 from typing import Dict, List, Optional, Any
 from pydantic import BaseModel
 from ..services.agent_service import agent_service
+from ..services import chat_store, emotion_context
 from ..core.auth import get_current_user
+from .deps import get_db
+from ..models.patient import Patient
+from ..models.therapy_session import TherapySession
 from ..models.user import User
+import json
+from datetime import datetime
 
 router = APIRouter()
 
 class AgentMessageRequest(BaseModel):
     message: str
     session_ids: Optional[List[str]] = None
+    # Ignorado: el contexto emocional se arma en el servidor. Se acepta por compatibilidad con clientes viejos
     session_emotions: Optional[Dict[str, Dict]] = None
     patient_id: Optional[int] = None
 
+def _check_patient(db: Session, patient_id: int, current_user: User):
+    # Verificar que el paciente pertenece al usuario actual
+    owned = db.query(Patient.id).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
+    if not owned:
+        raise HTTPException(status_code=403, detail="Patient not found or access denied")
+
 @router.get("/chat/{patient_id}")
 async def get_chat_history(
     patient_id: int,
-    session_ids: Optional[List[int]] = None,
+    session_ids: Optional[List[int]] = Query(None),
+    since_id: Optional[int] = Query(None, ge=0),
+    before_id: Optional[int] = Query(None, ge=1),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get chat history for a patient or specific sessions"""
+    """
+    Chat history for a patient (optionally only messages sent with the given sessions selected),
+    read from the local store. Pass since_id=<last_id> to fetch only newer messages, or
+    before_id=<first id> to page back through older ones.
+    """
     try:
-        # Verificar que el paciente pertenece al usuario actual
-        if not any(patient.id == patient_id for patient in current_user.patients):
-            raise HTTPException(status_code=403, detail="Patient not found or access denied")
-        
-        return await agent_service.get_chat_history(patient_id, session_ids)
+        _check_patient(db, patient_id, current_user)
+        # Solo la primera vez: copiar la historia que ya tenia el agente
+        await chat_store.backfill(db, current_user.id, patient_id)
+        return chat_store.list_messages(db, patient_id, since_id=since_id, before_id=before_id, limit=limit, session_ids=session_ids)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/chat")
 async def send_message(
     request: AgentMessageRequest,
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Send a message to the agent with session emotions data"""
     try:
-        print(f"[Agent Route] Received request data:")
-        print(f"Message: {request.message}")
-        print(f"Session IDs: {request.session_ids}")
-        print(f"Session Emotions: {request.session_emotions}")
-        print(f"Request dict: {request.dict()}")
+        # Sin el contenido: mensaje y emociones son datos del paciente
+        print(f"[Agent Route] Received message ({len(request.message)} chars) for sessions {request.session_ids}")
 
         # Obtener therapist_id
         therapist_id = current_user.id
-        # Obtener patient_id (preferir el campo explícito, si no, usar el primer session_id si está disponible)
+        try:
+            session_ids = [int(id) for id in request.session_ids or []]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="session_ids invalidos")
+        # Obtener patient_id: el campo explicito, o el paciente dueño de las sesiones seleccionadas
         patient_id = request.patient_id
-        if patient_id is None and request.session_ids:
-            try:
-                patient_id = int(request.session_ids[0])
-            except Exception:
+        if patient_id is None and session_ids:
+            owners = (
+                db.query(TherapySession.patient_id)
+                .join(Patient)
+                .filter(TherapySession.id.in_(session_ids), Patient.user_id == current_user.id, Patient.deleted_at.is_(None))
+                .distinct()
+                .all()
+            )
+            if len(owners) != 1:
                 raise HTTPException(status_code=400, detail="No se pudo determinar el patient_id")
+            patient_id = owners[0].patient_id
         if patient_id is None:
             raise HTTPException(status_code=400, detail="Se requiere patient_id")
+        _check_patient(db, patient_id, current_user)
 
-        # Preparar datos emocionales (extraer el primer valor del dict si existe)
-        if request.session_emotions and isinstance(request.session_emotions, dict):
-            # Toma el primer valor del dict (de la sesión seleccionada)
-            emotion_data = next(iter(request.session_emotions.values()))
-        else:
-            emotion_data = {}
+        # Contexto emocional armado en el servidor con los resultados guardados;
+        # session_emotions del cliente ya no se usa
+        try:
+            emotion_data = emotion_context.build_context(db, patient_id, session_ids)
+        except LookupError as e:
+            raise HTTPException(status_code=404, detail=str(e))
 
         # Enviar mensaje al agente
+        sent_at = datetime.utcnow()
         response = await agent_service.send_message(
             message=request.message,
             therapist_id=therapist_id,
             patient_id=patient_id,
             emotion_data=emotion_data
         )
-        print(f"[Agent Route] Agent response: {response}")
+        # Guardar los dos mensajes en el historial local
+        reply = response.get("recommendations") if isinstance(response, dict) else None
+        if reply is None:
+            reply = response
+        chat_store.record_message(db, therapist_id, patient_id, "user", request.message, session_ids, sent_at)
+        chat_store.record_message(db, therapist_id, patient_id, "agent", reply if isinstance(reply, str) else json.dumps(reply), session_ids)
+        db.commit()
         return response
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[Agent Route] Error in send_message: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -78,17 +119,18 @@ async def send_message(
 async def analyze_patient_data(
     patient_id: int,
     data: Dict[str, Any],
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Analyze patient data and get recommendations"""
     try:
-        # Verificar que el paciente pertenece al usuario actual
-        if not any(patient.id == patient_id for patient in current_user.patients):
-            raise HTTPException(status_code=403, detail="Patient not found or access denied")
+        _check_patient(db, patient_id, current_user)
         
         if "emotion_data" not in data:
             raise HTTPException(status_code=400, detail="Emotion data is required")
         
         return await agent_service.analyze_patient_data(patient_id, data["emotion_data"])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
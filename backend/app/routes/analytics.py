@@ -1,47 +1,45 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List, Dict
+from typing import List, Dict, Optional
+from datetime import date, datetime, timedelta
 import json
 from app.database import SessionLocal
 from app.models.therapy_session import TherapySession
 from app.models.patient import Patient
-from app.routes.deps import get_current_user, get_db
+from app.routes.deps import get_current_user, get_read_db
 from app.models.user import User
+from app.core.single_flight import SingleFlight
+from app.services.clinic_rollup import PERIODS, emotions_in_range, parse_emotions_from_results
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
-def parse_emotions_from_results(results_json: str) -> Dict[str, int]:
-    try:
-        # Convert string representation of dict to actual dict
-        if isinstance(results_json, str):
-            results_json = results_json.replace("'", '"')
-        results = json.loads(results_json)
-        
-        # Return the emotion_summary directly if it exists
-        if 'emotion_summary' in results:
-            return results['emotion_summary']
-        
-        # If no emotion_summary, count emotions from timeline
-        emotion_counts = {}
-        if 'timeline' in results:
-            for emotion in results['timeline'].values():
-                emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-        return emotion_counts
-    except (json.JSONDecodeError, AttributeError) as e:
-        print(f"Error parsing results: {e}")
-        return {}
+# Cada pedido desencripta y parsea todas las sesiones del paciente; los pedidos
+# identicos que llegan juntos comparten una sola pasada
+flight = SingleFlight("analytics")
+
+def _coalesced(key, db: Session, fn):
+    # Un cliente que acaba de escribir no se suma a una llamada en curso: pudo empezar antes
+    # de su escritura (o leer de una replica) y no la veria
+    if db.info.get("read_your_writes"):
+        return fn()
+    return flight.run_sync(key, fn)
 
 @router.get("/patient/{patient_id}/emotions/summary")
 def get_patient_emotion_summary(
     patient_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
+    key = ("summary", current_user.id, patient_id)
+    return _coalesced(key, db, lambda: _patient_emotion_summary(db, patient_id, current_user))
+
+def _patient_emotion_summary(db: Session, patient_id: int, current_user: User):
     # Verify patient belongs to clinic
     patient = db.query(Patient).filter(
         Patient.id == patient_id,
-        Patient.user_id == current_user.id
+        Patient.user_id == current_user.id,
+        Patient.deleted_at.is_(None)
     ).first()
     
     if not patient:
@@ -64,13 +62,18 @@ def get_patient_emotion_summary(
 @router.get("/patient/{patient_id}/emotions/by-session")
 def get_patient_emotions_by_session(
     patient_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
+    key = ("by_session", current_user.id, patient_id)
+    return _coalesced(key, db, lambda: _patient_emotions_by_session(db, patient_id, current_user))
+
+def _patient_emotions_by_session(db: Session, patient_id: int, current_user: User):
     # Verify patient belongs to clinic
     patient = db.query(Patient).filter(
         Patient.id == patient_id,
-        Patient.user_id == current_user.id
+        Patient.user_id == current_user.id,
+        Patient.deleted_at.is_(None)
     ).first()
     
     if not patient:
@@ -95,13 +98,18 @@ def get_patient_emotions_by_session(
 @router.get("/patient/{patient_id}/emotions/last-dominant")
 def get_patient_last_dominant_emotion(
     patient_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
+    key = ("last_dominant", current_user.id, patient_id)
+    return _coalesced(key, db, lambda: _patient_last_dominant_emotion(db, patient_id, current_user))
+
+def _patient_last_dominant_emotion(db: Session, patient_id: int, current_user: User):
     # Verificar que el paciente pertenece al usuario
     patient = db.query(Patient).filter(
         Patient.id == patient_id,
-        Patient.user_id == current_user.id
+        Patient.user_id == current_user.id,
+        Patient.deleted_at.is_(None)
     ).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
@@ -120,4 +128,24 @@ def get_patient_last_dominant_emotion(
 
     # Buscar la emoción con mayor cantidad
     dominant_emotion = max(session_emotions.items(), key=lambda x: x[1])[0]
-    return {"dominant_emotion": dominant_emotion} 
\ No newline at end of file
+    return {"dominant_emotion": dominant_emotion}
+
+@router.get("/clinic/emotions")
+def get_clinic_emotion_series(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    period: str = "week",
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Emotion totals and session counts of all the clinic's patients per week (or day),
+    served from the precomputed rollups. Defaults to the last year.
+    """
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(PERIODS)}")
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=365)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return emotions_in_range(db, current_user.id, period, start, end)
@@ -1,9 +1,10 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Header, status
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer
 from app.core.auth import get_current_user
 from app.models.user import User
-from app.database import SessionLocal
+from app.database import SessionLocal, read_session
+from typing import Optional
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -14,6 +15,22 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db(authorization: Optional[str] = Header(None)):
+    """Session for GET endpoints; reads go to a replica when DATABASE_REPLICA_URLS is set"""
+    db = read_session(authorization)
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_user_from_token(db: Session, token: Optional[str], authorization: Optional[str] = None) -> User:
+    """Authenticate WebSocket/SSE connections; browsers cannot set headers there, so ?token= is accepted"""
+    if not token and authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return await get_current_user(token, db)
+
 def get_admin_user(current_user: User = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.core.config import settings
+from app.routes.deps import get_db, get_user_from_token
+from app.services.events import broker
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+async def _authenticate(db: Session, token: Optional[str], authorization: Optional[str] = None) -> int:
+    user_id = (await get_user_from_token(db, token, authorization)).id
+    # No mantener una conexion de la base abierta mientras dure el stream
+    db.close()
+    return user_id
+
+@router.websocket("/ws")
+async def events_websocket(websocket: WebSocket, token: Optional[str] = Query(None), db: Session = Depends(get_db)):
+    """Push the user's events as JSON messages. Messages sent by the client are ignored."""
+    try:
+        user_id = await _authenticate(db, token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscription = broker.subscribe(user_id)
+
+    async def forward():
+        while True:
+            event = await subscription.get()
+            await websocket.send_json(event)
+
+    sender = asyncio.create_task(forward())
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        broker.unsubscribe(subscription)
+
+@router.get("/stream")
+async def events_stream(
+    request: Request,
+    token: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Same events as /events/ws, as Server-Sent Events for clients that cannot use WebSockets"""
+    user_id = await _authenticate(db, token, authorization)
+    subscription = broker.subscribe(user_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+                if event is None:
+                    # Comentario para que proxies no corten la conexion inactiva
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,113 @@
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from app.core.config import settings
+from app.models.patient import Patient
+from app.models.therapy_session import TherapySession
+from app.routes.deps import get_db, get_user_from_token
+from app.routes.therapy_session import publish_session_created
+from app.services.live_analysis import LiveAnalysis
+from app.services.video_preprocessing import ffmpeg_available
+
+router = APIRouter(prefix="/patients/{patient_id}/therapy-sessions", tags=["sessions"])
+
+def _save_session(db: Session, patient_id: int, date: datetime, result: dict) -> TherapySession:
+    db_session = TherapySession(date=date, results=json.dumps(result), patient_id=patient_id)
+    db.add(db_session)
+    db.commit()
+    db.refresh(db_session)
+    return db_session
+
+@router.websocket("/live")
+async def live_session(
+    websocket: WebSocket,
+    patient_id: int,
+    token: Optional[str] = Query(None),
+    kind: str = Query("clip"),
+    fps: Optional[int] = Query(None),
+    clip_seconds: Optional[float] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Live analysis. Binary messages are short video clips (kind=clip) or sampled JPEG frames
+    (kind=frame, at `fps`). A text message {"type": "clip", "offset": s} sets the start of the
+    next clip. The server answers each analyzed batch with an "update" holding the new timeline
+    entries and the running emotion_summary. {"type": "end"} finishes the session: what is
+    pending gets analyzed and the result is saved as a therapy session ("completed" message).
+    """
+    try:
+        user = await get_user_from_token(db, token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == user.id, Patient.deleted_at.is_(None)).first()
+    user_id = user.id
+    # La conexion vuelve al pool; la sesion se reusa al final para guardar el resultado
+    db.close()
+    if not patient:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Patient not found")
+        return
+    if kind not in ("clip", "frame") or (kind == "frame" and not ffmpeg_available()):
+        await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA, reason=f"Unsupported kind: {kind}")
+        return
+
+    await websocket.accept()
+    started_at = datetime.utcnow()
+
+    async def send(message: dict):
+        try:
+            await websocket.send_json(message)
+        except Exception:
+            # El cliente se desconecto; el analisis sigue para poder guardar la sesion
+            pass
+
+    live = LiveAnalysis(
+        send,
+        kind,
+        fps=max(1, min(fps or settings.LIVE_DEFAULT_FPS, settings.LIVE_MAX_FPS)),
+        clip_seconds=clip_seconds or settings.LIVE_CLIP_SECONDS,
+        queue_size=settings.LIVE_QUEUE_SIZE,
+        tenant=user_id,
+    )
+    next_offset = None
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            break
+        data = message.get("bytes")
+        if data is not None:
+            if len(data) > settings.LIVE_MAX_MESSAGE_BYTES:
+                await send({"type": "error", "detail": "Message too large"})
+                continue
+            if kind == "frame":
+                live.add_frame(data)
+            else:
+                live.add_clip(data, next_offset)
+                next_offset = None
+            continue
+        try:
+            command = json.loads(message.get("text") or "")
+        except ValueError:
+            await send({"type": "error", "detail": "Invalid message"})
+            continue
+        if command.get("type") == "end":
+            break
+        if command.get("type") == "clip" and isinstance(command.get("offset"), (int, float)):
+            next_offset = float(command["offset"])
+
+    result = await live.finish()
+    stats = live.stats()
+    print(f"[Live] patient {patient_id}: {stats}")
+    if not result["timeline"]:
+        await send({"type": "completed", "session_id": None, **stats})
+    else:
+        db_session = await run_in_threadpool(_save_session, db, patient_id, started_at, result)
+        publish_session_created(db_session, user_id)
+        await send({"type": "completed", "session_id": db_session.id, "emotion_summary": result["emotion_summary"], **stats})
+    try:
+        await websocket.close()
+    except Exception:
+        pass
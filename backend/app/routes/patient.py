@@ -1,23 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Body, status
 from sqlalchemy.orm import Session
+from datetime import datetime
+from app.core.config import settings
 from app.schemas.patient import PatientCreate, PatientResponse, PatientUpdate
 from app.schemas.therapy_session import TherapySessionResponse
 from app.models.patient import Patient
 from app.models.therapy_session import TherapySession
 from app.models.patient_note import PatientNote
 from app.schemas.patient_note import PatientNoteCreate, PatientNoteResponse
-from app.routes.deps import get_db, get_current_user
-import unicodedata
+from app.routes.deps import get_db, get_read_db, get_current_user
+from app.core.text import normalize_name
+from app.services import clinic_rollup, patient_purge, search_index
+from app.services.events import broker
 
 router = APIRouter(prefix="/patients", tags=["patients"])
 
-def normalize_name(name: str) -> str:
-    if not name:
-        return ''
-    # Quitar tildes y pasar a minúsculas
-    nfkd = unicodedata.normalize('NFKD', name)
-    return ''.join([c for c in nfkd if not unicodedata.combining(c)]).lower()
-
 @router.post("/", response_model=PatientResponse)
 def create_patient(patient: PatientCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
     normalized = normalize_name(patient.name)
@@ -29,12 +26,12 @@ def create_patient(patient: PatientCreate, db: Session = Depends(get_db), curren
 
 @router.get("/", response_model=list[PatientResponse])
 def list_patients(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user=Depends(get_current_user),
     name: str = None,
     age: int = None
 ):
-    query = db.query(Patient).filter(Patient.user_id == current_user.id)
+    query = db.query(Patient).filter(Patient.user_id == current_user.id, Patient.deleted_at.is_(None))
     if name:
         normalized = normalize_name(name)
         for word in normalized.split():
@@ -44,8 +41,8 @@ def list_patients(
     return query.all()
 
 @router.get("/{patient_id}", response_model=PatientResponse)
-def get_patient(patient_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id).first()
+def get_patient(patient_id: int, db: Session = Depends(get_read_db), current_user=Depends(get_current_user)):
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     return patient
@@ -59,7 +56,7 @@ def update_patient(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
-    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id).first()
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     if name is not None:
@@ -74,19 +71,28 @@ def update_patient(
     return patient
 
 @router.delete("/{patient_id}", status_code=204)
-def delete_patient(patient_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id).first()
+def delete_patient(patient_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    db.delete(patient)
+    if patient_purge.count_rows(db, patient.id) <= settings.PATIENT_PURGE_BATCH_SIZE:
+        # Pocas filas: ON DELETE CASCADE las borra en la misma transaccion
+        session_ids = [session_id for (session_id,) in db.query(TherapySession.id).filter(TherapySession.patient_id == patient.id)]
+        clinic_rollup.remove_sessions(db, session_ids)
+        db.delete(patient)
+        db.commit()
+        return None
+    # Muchas filas: se oculta ya y se borra en lotes despues de responder
+    patient.deleted_at = datetime.utcnow()
     db.commit()
+    background_tasks.add_task(patient_purge.run_purge)
     return None
 
 # Therapy Session endpoints
 @router.get("/{patient_id}/therapy-sessions", response_model=list[TherapySessionResponse])
-def get_patient_therapy_sessions(patient_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+def get_patient_therapy_sessions(patient_id: int, db: Session = Depends(get_read_db), current_user=Depends(get_current_user)):
     # Verify patient exists and belongs to user
-    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id).first()
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
@@ -96,9 +102,9 @@ def get_patient_therapy_sessions(patient_id: int, db: Session = Depends(get_db),
     return sessions
 
 @router.get("/{patient_id}/therapy-sessions/{session_id}", response_model=TherapySessionResponse)
-def get_patient_therapy_session(patient_id: int, session_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+def get_patient_therapy_session(patient_id: int, session_id: int, db: Session = Depends(get_read_db), current_user=Depends(get_current_user)):
     # Verify patient exists and belongs to user
-    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id).first()
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
@@ -112,28 +118,32 @@ def get_patient_therapy_session(patient_id: int, session_id: int, db: Session =
     return session
 
 @router.get("/{patient_id}/notes", response_model=list[PatientNoteResponse])
-def list_patient_notes(patient_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id).first()
+def list_patient_notes(patient_id: int, db: Session = Depends(get_read_db), current_user=Depends(get_current_user)):
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     return patient.notes
 
 @router.post("/{patient_id}/notes", response_model=PatientNoteResponse, status_code=status.HTTP_201_CREATED)
 def create_patient_note(patient_id: int, note: PatientNoteCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id).first()
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     db_note = PatientNote(patient_id=patient_id, text=note.text)
     db.add(db_note)
+    db.flush()
+    search_index.index_document(db, current_user.id, patient_id, "note", db_note.id, db_note.text)
     db.commit()
     db.refresh(db_note)
+    broker.publish(current_user.id, "note.added", patient_id=patient_id, note_id=db_note.id)
     return db_note
 
 @router.delete("/{patient_id}/notes/{note_id}", status_code=204)
 def delete_patient_note(patient_id: int, note_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    note = db.query(PatientNote).join(Patient).filter(PatientNote.id == note_id, PatientNote.patient_id == patient_id, Patient.user_id == current_user.id).first()
+    note = db.query(PatientNote).join(Patient).filter(PatientNote.id == note_id, PatientNote.patient_id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
+    search_index.remove_document(db, "note", note.id)
     db.delete(note)
     db.commit()
     return None
\ No newline at end of file
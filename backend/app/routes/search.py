@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app.schemas.search import SearchHit, SearchResponse
+from app.models.patient import Patient
+from app.models.patient_note import PatientNote
+from app.models.therapy_session import TherapySession
+from app.models.user import User
+from app.routes.deps import get_read_db, get_current_user
+from app.services import search_index
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("/", response_model=SearchResponse)
+def search_notes_and_observations(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Search the clinic's patient notes and session observations; every word of q must match"""
+    found = search_index.search(db, current_user.id, q, limit=limit, offset=offset)
+    hits = found["hits"]
+
+    note_ids = [document.doc_id for document, _ in hits if document.doc_type == "note"]
+    session_ids = [document.doc_id for document, _ in hits if document.doc_type == "session"]
+    notes = {
+        note.id: note
+        for note in db.query(PatientNote).join(Patient).filter(PatientNote.id.in_(note_ids), Patient.user_id == current_user.id, Patient.deleted_at.is_(None))
+    } if note_ids else {}
+    sessions = {
+        session.id: session
+        for session in db.query(TherapySession).join(Patient).filter(TherapySession.id.in_(session_ids), Patient.user_id == current_user.id, Patient.deleted_at.is_(None))
+    } if session_ids else {}
+
+    results = []
+    for document, score in hits:
+        if document.doc_type == "note" and document.doc_id in notes:
+            note = notes[document.doc_id]
+            results.append(SearchHit(type="note", id=note.id, patient_id=note.patient_id, score=round(score, 4), text=note.text, date=note.created_at))
+        elif document.doc_type == "session" and document.doc_id in sessions:
+            session = sessions[document.doc_id]
+            results.append(SearchHit(type="session", id=session.id, patient_id=session.patient_id, score=round(score, 4), text=session.observations or "", date=session.date))
+    return SearchResponse(total=found["total"], limit=limit, offset=offset, results=results)
@@ -1,52 +1,113 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Header, UploadFile, File
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from datetime import datetime
-from app.schemas.therapy_session import TherapySessionCreate, TherapySessionResponse, TherapySessionUpdate
+from typing import Optional
+from app.schemas.therapy_session import (
+    TherapySessionBulkCreate,
+    TherapySessionBulkResponse,
+    TherapySessionCreate,
+    TherapySessionResponse,
+    TherapySessionUpdate,
+)
+from app.core.config import settings
 from app.models.therapy_session import TherapySession
 from app.models.patient import Patient
 from app.models.user import User
-from app.routes.deps import get_db, get_current_user
-from app.services.api_client import analyze_video
+from app.routes.deps import get_db, get_read_db, get_current_user
+from app.services.segmented_analysis import analyze_video_segmented
+from app.services import bulk_sessions, idempotency, search_index, upload_admission
+from app.services.events import broker
 import os
 import json
+import uuid
 
 router = APIRouter(prefix="/patients/{patient_id}/therapy-sessions", tags=["sessions"])
+# Operaciones sobre sesiones de varios pacientes a la vez
+bulk_router = APIRouter(prefix="/therapy-sessions", tags=["sessions"])
 
-@router.post("/", response_model=TherapySessionResponse)
-def create_session(patient_id: int, session: TherapySessionCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id).first()
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
-    db_session = TherapySession(date=session.date, results=session.results, patient_id=patient.id)
+def store_video_analysis(db: Session, patient: Patient, file_path: str) -> TherapySession:
+    """Send a video to the model and save the result as a new therapy session"""
+    analysis_id = uuid.uuid4().hex
+    user_id = patient.user_id
+    broker.publish(user_id, "analysis.started", analysis_id=analysis_id, patient_id=patient.id)
+
+    def on_progress(done: int, total: int):
+        broker.publish(user_id, "analysis.progress", analysis_id=analysis_id, patient_id=patient.id, segments_done=done, segments_total=total)
+
+    try:
+        result = analyze_video_segmented(file_path, on_progress=on_progress, tenant=user_id)
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else "Analysis failed"
+        broker.publish(user_id, "analysis.failed", analysis_id=analysis_id, patient_id=patient.id, detail=detail)
+        raise
+    db_session = TherapySession(date=datetime.utcnow(), results=json.dumps(result), patient_id=patient.id)
     db.add(db_session)
     db.commit()
     db.refresh(db_session)
+    broker.publish(user_id, "analysis.completed", analysis_id=analysis_id, patient_id=patient.id, session_id=db_session.id)
+    publish_session_created(db_session, user_id)
     return db_session
 
+def publish_session_created(db_session: TherapySession, user_id: int):
+    broker.publish(user_id, "session.created", patient_id=db_session.patient_id, session_id=db_session.id, date=db_session.date.isoformat())
+
+@router.post("/", response_model=TherapySessionResponse)
+def create_session(
+    patient_id: int,
+    session: TherapySessionCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
+):
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    def create():
+        db_session = TherapySession(date=session.date, results=session.results, patient_id=patient.id)
+        db.add(db_session)
+        db.commit()
+        db.refresh(db_session)
+        publish_session_created(db_session, current_user.id)
+        return TherapySessionResponse.model_validate(db_session)
+
+    if idempotency_key is None:
+        return create()
+    request_fingerprint = idempotency.fingerprint("POST", f"/patients/{patient_id}/therapy-sessions/", session.model_dump_json().encode())
+    return idempotency.run(db, current_user.id, idempotency_key, request_fingerprint, create)
+
 @router.get("/", response_model=list[TherapySessionResponse])
-def list_sessions(patient_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id).first()
+def list_sessions(patient_id: int, db: Session = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     return db.query(TherapySession).filter(TherapySession.patient_id == patient.id).all()
 
 @router.post("/analyze", response_model=TherapySessionResponse)
-async def analyze_and_save(patient_id: int, file: UploadFile = File(...), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id).first()
+async def analyze_and_save(
+    patient_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
+):
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    temp_dir = "./temp"
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_file_path = os.path.join(temp_dir, file.filename)
-    with open(temp_file_path, "wb") as temp_file:
-        temp_file.write(await file.read())
-    result = analyze_video(temp_file_path)
-    os.remove(temp_file_path)
-    db_session = TherapySession(date=datetime.utcnow(), results=json.dumps(result), patient_id=patient.id)
-    db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
-    return db_session
+    # La huella se calcula mientras se copia, sin tener el video entero en memoria
+    digest = idempotency.start_fingerprint("POST", f"/patients/{patient_id}/therapy-sessions/analyze")
+    temp_file_path = await upload_admission.save_upload(file, "./temp", digest)
+    try:
+        def analyze():
+            return TherapySessionResponse.model_validate(store_video_analysis(db, patient, temp_file_path))
+
+        # En un thread: el analisis bloquea y el loop tiene que seguir enviando los eventos de progreso
+        if idempotency_key is None:
+            return await run_in_threadpool(analyze)
+        return await run_in_threadpool(idempotency.run, db, current_user.id, idempotency_key, digest.hexdigest(), analyze)
+    finally:
+        os.remove(temp_file_path)
 
 @router.patch("/{session_id}/observations", response_model=TherapySessionResponse)
 def update_session_observations(
@@ -57,7 +118,7 @@ def update_session_observations(
     current_user: User = Depends(get_current_user)
 ):
     # Verify patient exists and belongs to clinic
-    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id).first()
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
@@ -71,6 +132,20 @@ def update_session_observations(
     
     # Update observations
     session.observations = session_update.observations
+    search_index.index_document(db, current_user.id, patient_id, "session", session.id, session.observations)
     db.commit()
     db.refresh(session)
-    return session
\ No newline at end of file
+    return session
+
+@bulk_router.post("/bulk", response_model=TherapySessionBulkResponse)
+def create_sessions_bulk(
+    payload: TherapySessionBulkCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Create many sessions for any of the caller's patients; returns a status per item, in order"""
+    if len(payload.sessions) > settings.BULK_SESSIONS_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BULK_SESSIONS_MAX_ITEMS} sessions per request")
+    results = bulk_sessions.create_sessions(db, current_user.id, payload.sessions)
+    created = sum(1 for r in results if r.status == "created")
+    return TherapySessionBulkResponse(created=created, failed=len(results) - created, results=results)
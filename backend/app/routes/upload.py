@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.core.config import settings
+from app.schemas.upload import UploadCreate, UploadStatus
+from app.schemas.therapy_session import TherapySessionResponse
+from app.models.patient import Patient
+from app.models.user import User
+from app.routes.deps import get_db, get_current_user
+from app.routes.therapy_session import store_video_analysis
+from app.services import chunked_upload
+import os
+
+router = APIRouter(prefix="/patients/{patient_id}/therapy-sessions/uploads", tags=["sessions"])
+
+def _get_patient(db: Session, patient_id: int, current_user: User) -> Patient:
+    patient = db.query(Patient).filter(Patient.id == patient_id, Patient.user_id == current_user.id, Patient.deleted_at.is_(None)).first()
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return patient
+
+@router.post("/", response_model=UploadStatus, status_code=201)
+def create_upload(patient_id: int, upload: UploadCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    _get_patient(db, patient_id, current_user)
+    return chunked_upload.create_upload(current_user.id, patient_id, upload.filename, upload.size, upload.sha256)
+
+@router.put("/{upload_id}", response_model=UploadStatus)
+async def upload_chunk(
+    patient_id: int,
+    upload_id: str,
+    offset: int,
+    request: Request,
+    response: Response,
+    x_chunk_sha256: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
+    """Write one chunk at the given byte offset. Chunks may arrive in any order and in parallel."""
+    limit = settings.UPLOAD_MAX_CHUNK_BYTES
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise HTTPException(status_code=413, detail="Chunk too large")
+    # Leer el cuerpo por partes y cortar apenas pasa el limite, sin recibir el resto
+    data = bytearray()
+    async for part in request.stream():
+        data += part
+        if len(data) > limit:
+            raise HTTPException(status_code=413, detail="Chunk too large")
+    status = await run_in_threadpool(
+        chunked_upload.write_chunk, upload_id, current_user.id, patient_id, offset, data, x_chunk_sha256
+    )
+    response.headers["Upload-Offset"] = str(status["committed_offset"])
+    return status
+
+@router.get("/{upload_id}", response_model=UploadStatus)
+def get_upload_status(patient_id: int, upload_id: str, response: Response, current_user: User = Depends(get_current_user)):
+    """Return how many contiguous bytes from the start are committed, so the client can resume."""
+    status = chunked_upload.get_status(upload_id, current_user.id, patient_id)
+    response.headers["Upload-Offset"] = str(status["committed_offset"])
+    return status
+
+@router.post("/{upload_id}/complete", response_model=TherapySessionResponse)
+def complete_upload(patient_id: int, upload_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    patient = _get_patient(db, patient_id, current_user)
+    file_path = chunked_upload.finalize_upload(upload_id, current_user.id, patient_id)
+    try:
+        return store_video_analysis(db, patient, file_path)
+    finally:
+        os.remove(file_path)
+
+@router.delete("/{upload_id}", status_code=204)
+def abort_upload(patient_id: int, upload_id: str, current_user: User = Depends(get_current_user)):
+    chunked_upload.get_status(upload_id, current_user.id, patient_id)
+    chunked_upload.discard_upload(upload_id)
+    return None
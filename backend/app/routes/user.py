@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from datetime import datetime
 from app.schemas.user import UserRegister, UserLogin, Token, UserResponse, UserUpdate
 from app.models.user import User
-from app.core.auth import get_password_hash, verify_password, create_access_token
+from app.models.patient import Patient
+from app.core.auth import get_password_hash, verify_password, create_access_token, decode_access_token, oauth2_scheme
+from app.core.revocation import revocations
 from app.database import SessionLocal
 from app.routes.deps import get_db, get_admin_user, get_current_user
 
@@ -39,11 +42,18 @@ def register(request: UserRegister, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/logout")
-def logout(current_user: User = Depends(get_current_user)):
+def logout(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Endpoint para cerrar sesión.
-    En una implementación real, podríamos invalidar el token aquí.
+    El token queda revocado hasta que vence, en todos los workers.
     """
+    payload = decode_access_token(token)
+    if payload.get("jti"):
+        revocations.revoke(db, payload["jti"], current_user.id, datetime.utcfromtimestamp(payload["exp"]))
+    else:
+        # Token emitido antes de que existiera jti: solo se puede invalidar junto con los demas
+        db.query(User).filter(User.id == current_user.id).update({User.tokens_not_before: datetime.utcnow()})
+        db.commit()
     return {"message": "Successfully logged out"}
 
 @router.get("/admin/dashboard")
@@ -54,7 +64,7 @@ def admin_dashboard(current_user: User = Depends(get_admin_user), db: Session =
     """
     # Obtener estadísticas generales
     total_users = db.query(User).filter(User.role == "clinic").count()
-    total_patients = db.query(User).join(User.patients).count()
+    total_patients = db.query(User).join(User.patients).filter(Patient.deleted_at.is_(None)).count()
     
     # Obtener lista de usuarios clínicos
     clinic_users = db.query(User).filter(User.role == "clinic").all()
@@ -83,6 +93,8 @@ def update_me(update: UserUpdate, db: Session = Depends(get_db), current_user: U
         if not update.current_password or not verify_password(update.current_password, user.hashed_password):
             raise HTTPException(status_code=400, detail="Current password is incorrect")
         user.hashed_password = get_password_hash(update.password)
+        # Los tokens emitidos hasta ahora (incluido el de este pedido) dejan de valer
+        user.tokens_not_before = datetime.utcnow()
     db.commit()
     db.refresh(user)
     return user
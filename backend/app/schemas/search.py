@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+class SearchHit(BaseModel):
+    type: str  # "note" | "session"
+    id: int
+    patient_id: int
+    score: float
+    text: str
+    date: Optional[datetime] = None
+
+class SearchResponse(BaseModel):
+    total: int
+    limit: int
+    offset: int
+    results: List[SearchHit]
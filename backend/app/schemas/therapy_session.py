@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import json
 
 class TherapySessionBase(BaseModel):
@@ -10,6 +10,23 @@ class TherapySessionBase(BaseModel):
 class TherapySessionCreate(TherapySessionBase):
     pass
 
+class TherapySessionBulkItem(TherapySessionBase):
+    patient_id: int
+
+class TherapySessionBulkCreate(BaseModel):
+    sessions: List[TherapySessionBulkItem]
+
+class TherapySessionBulkResult(BaseModel):
+    index: int
+    status: str  # "created", "not_found", "invalid" o "failed"
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class TherapySessionBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[TherapySessionBulkResult]
+
 class TherapySessionUpdate(BaseModel):
     observations: Optional[str] = None
 
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class UploadCreate(BaseModel):
+    filename: str
+    size: int
+    sha256: Optional[str] = None
+
+class UploadStatus(BaseModel):
+    upload_id: str
+    size: int
+    committed_offset: int
+    received_bytes: int
+    complete: bool
@@ -8,9 +8,7 @@ class EmotionSummary(BaseModel):
     neutral: int
     sad: int
 
-class Timeline(BaseModel):
-    timeline: Dict[str, str]
-
 class VideoAnalysisResponse(BaseModel):
     emotion_summary: EmotionSummary
-    timeline: Timeline
\ No newline at end of file
+    # Segundo del video -> emocion detectada
+    timeline: Dict[str, str]
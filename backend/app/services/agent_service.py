@@ -1,29 +1,37 @@
+import hashlib
 import httpx
+import json
 from typing import Optional, List, Dict, Any
 from ..core.config import settings
+from ..core import tracing
+from ..core.single_flight import SingleFlight
 from datetime import datetime
 
 class AgentService:
     def __init__(self):
         self.base_url = settings.AGENT_API_URL
         print(f"[AgentService] Initializing with base_url: {self.base_url}")
-        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=120.0)
+        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=120.0, event_hooks={"request": [self._propagate_trace]})
+        # Lecturas y analisis identicos en curso se comparten; send_message nunca (cada mensaje es nuevo)
+        self.flight = SingleFlight("agent")
+
+    async def _propagate_trace(self, request: httpx.Request):
+        request.headers.update(tracing.inject())
 
     async def get_chat_history(self, patient_id: int, session_ids: Optional[List[int]] = None) -> Dict[str, Any]:
         """Get chat history for a patient or specific sessions"""
+        key = ("chat_history", patient_id, tuple(sorted(session_ids or [])))
+        return await self.flight.run(key, lambda: self._get_chat_history(patient_id, session_ids))
+
+    async def _get_chat_history(self, patient_id: int, session_ids: Optional[List[int]]) -> Dict[str, Any]:
         url = f"/chat/{patient_id}"
-        params = []
-        if session_ids:
-            params.extend([("session_ids", str(id)) for id in session_ids])
-        
-        if params:
-            url += "?" + "&".join(f"{k}={v}" for k, v in params)
-        
+        # httpx codifica los parametros; session_ids se repite una vez por id
+        params = [("session_ids", str(id)) for id in session_ids or []]
         print(f"[AgentService] Sending GET request to: {self.base_url}{url}")
         try:
-            response = await self.client.get(url)
-            print(f"[AgentService] Response status: {response.status_code}")
-            print(f"[AgentService] Response content: {response.text}")
+            with tracing.span("agent.get_chat_history", patient_id=patient_id):
+                response = await self.client.get(url, params=params)
+            print(f"[AgentService] Response status: {response.status_code}, {len(response.content)} bytes")
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
@@ -42,12 +50,12 @@ class AgentService:
             "patient_id": str(patient_id),
             "emotion_data": emotion_data
         }
+        # No loguear el mensaje ni las emociones: son datos del paciente
         print(f"[AgentService] Sending request to: {self.base_url}{url}")
-        print(f"[AgentService] Request data: {data}")
         try:
-            response = await self.client.post(url, json=data)
-            print(f"[AgentService] Response status: {response.status_code}")
-            print(f"[AgentService] Response content: {response.text}")
+            with tracing.span("agent.send_message", patient_id=patient_id):
+                response = await self.client.post(url, json=data)
+            print(f"[AgentService] Response status: {response.status_code}, {len(response.content)} bytes")
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
@@ -63,17 +71,21 @@ class AgentService:
 
     async def analyze_patient_data(self, patient_id: int, emotion_data: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze patient data and get recommendations"""
+        digest = hashlib.sha256(json.dumps(emotion_data, sort_keys=True, default=str).encode()).hexdigest()
+        key = ("analyze", patient_id, digest)
+        return await self.flight.run(key, lambda: self._analyze_patient_data(patient_id, emotion_data))
+
+    async def _analyze_patient_data(self, patient_id: int, emotion_data: Dict[str, Any]) -> Dict[str, Any]:
         url = f"/analyze/{patient_id}"
         print(f"[AgentService] Sending analysis request to: {self.base_url}{url}")
-        print(f"[AgentService] Request data: {emotion_data}")
-        
+
         try:
-            response = await self.client.post(
-                url,
-                json={"emotion_data": emotion_data}
-            )
-            print(f"[AgentService] Response status: {response.status_code}")
-            print(f"[AgentService] Response content: {response.text}")
+            with tracing.span("agent.analyze_patient_data", patient_id=patient_id):
+                response = await self.client.post(
+                    url,
+                    json={"emotion_data": emotion_data}
+                )
+            print(f"[AgentService] Response status: {response.status_code}, {len(response.content)} bytes")
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
@@ -1,20 +1,50 @@
 import requests
 from fastapi import HTTPException
 from ..core.config import settings
+from .video_preprocessing import preprocess_video
+from .model_scheduler import scheduler
+from ..core import tracing
 import os
+import time
 
-def analyze_video(file_path: str):
+def analyze_video(file_path: str, tenant=None):
+    """Send a video to the model. tenant (the clinic user_id) decides its turn in the model scheduler."""
     url = f"{settings.API_MODEL_URL}/video/analyze"
-    try:
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=500, detail="El archivo no existe antes de enviarlo al modelo")
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=500, detail="El archivo no existe antes de enviarlo al modelo")
+
+    upload_path = file_path
+    preprocess_seconds = 0.0
+    if settings.VIDEO_PREPROCESS_ENABLED:
+        started = time.perf_counter()
+        with tracing.span("video.preprocess"):
+            upload_path = preprocess_video(file_path)
+        preprocess_seconds = time.perf_counter() - started
 
-        with open(file_path, "rb") as file:
-            files = {"file": ("video.mp4", file, "video/mp4")}  # Asegúrate de usar un nombre genérico
-            response = requests.post(url, files=files, timeout=120)
-            response.raise_for_status()
-            return response.json()
+    try:
+        original_size = os.path.getsize(file_path)
+        upload_size = os.path.getsize(upload_path)
+        started = time.perf_counter()
+        with tracing.span("model.queue", tenant=str(tenant)), scheduler.slot(tenant):
+            queued_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            with tracing.span("model.analyze_video", bytes=upload_size) as span, open(upload_path, "rb") as file:
+                files = {"file": ("video.mp4", file, "video/mp4")}  # Asegúrate de usar un nombre genérico
+                response = requests.post(url, files=files, headers=tracing.inject(), timeout=120)
+                if span is not None:
+                    span.set("status_code", response.status_code)
+                response.raise_for_status()
+                result = response.json()
+        model_seconds = time.perf_counter() - started
+        print(
+            f"[api_client] preprocess={preprocess_seconds:.2f}s queued={queued_seconds:.2f}s "
+            f"upload={upload_size}/{original_size} bytes model={model_seconds:.2f}s"
+        )
+        return result
     except requests.exceptions.Timeout:
         raise HTTPException(status_code=504, detail="The request to the model API timed out.")
     except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error connecting to model API: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error connecting to model API: {e}")
+    finally:
+        if upload_path != file_path and os.path.exists(upload_path):
+            os.remove(upload_path)
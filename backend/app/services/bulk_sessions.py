@@ -0,0 +1,79 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from sqlalchemy import Text, bindparam, insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core import results_codec
+from ..core.security import encrypt_data
+from ..models.patient import Patient
+from ..models.therapy_session import TherapySession
+from ..schemas.therapy_session import TherapySessionBulkItem, TherapySessionBulkResult
+from .events import broker
+
+# Carga masiva de sesiones (migraciones desde el sistema anterior). En vez de una consulta,
+# un commit y un refresh por sesion: la propiedad de los pacientes se valida con una sola
+# consulta, los resultados se encriptan en paralelo y cada lote se inserta con un
+# executemany en una transaccion.
+
+# INSERT sobre la tabla del modelo, con results ligado como Text: el valor ya va encriptado
+# (en paralelo, abajo) y el TypeDecorator no lo vuelve a procesar. El resto de las columnas
+# y sus defaults salen del modelo.
+_sessions = TherapySession.__table__
+_insert_sessions = (
+    insert(_sessions)
+    .values(results=bindparam("encrypted_results", type_=Text))
+    .returning(_sessions.c.id, sort_by_parameter_order=True)
+)
+
+def _owned_patients(db: Session, user_id: int, patient_ids: set) -> set:
+    rows = db.query(Patient.id).filter(Patient.id.in_(patient_ids), Patient.user_id == user_id, Patient.deleted_at.is_(None)).all()
+    return {row.id for row in rows}
+
+def create_sessions(db: Session, user_id: int, items: List[TherapySessionBulkItem]) -> List[TherapySessionBulkResult]:
+    """
+    Insert the valid items in batches of BULK_SESSIONS_BATCH_SIZE, one transaction each.
+    Returns one result per item, in the same order. A batch that fails to insert marks
+    only its own items as failed; the batches already committed stay.
+    """
+    results = [TherapySessionBulkResult(index=i, status="created") for i in range(len(items))]
+    owned = _owned_patients(db, user_id, {item.patient_id for item in items}) if items else set()
+    valid = []
+    for i, item in enumerate(items):
+        if item.patient_id not in owned:
+            results[i].status, results[i].detail = "not_found", "Patient not found"
+            continue
+        try:
+            json.loads(item.results)
+        except ValueError:
+            results[i].status, results[i].detail = "invalid", "results is not valid JSON"
+            continue
+        valid.append(i)
+
+    batch_size = max(1, settings.BULK_SESSIONS_BATCH_SIZE)
+    with ThreadPoolExecutor(max_workers=max(1, settings.BULK_SESSIONS_ENCRYPT_WORKERS)) as executor:
+        for start in range(0, len(valid), batch_size):
+            batch = valid[start:start + batch_size]
+            encrypted = executor.map(lambda i: encrypt_data(items[i].results, cache=False, encode=results_codec.encode), batch)
+            rows = [
+                {"date": items[i].date, "encrypted_results": token, "patient_id": items[i].patient_id}
+                for i, token in zip(batch, encrypted)
+            ]
+            try:
+                # executemany con RETURNING; sort_by_parameter_order garantiza los ids en el orden de las filas.
+                # En PostgreSQL va en un solo INSERT de varias filas; SQLite no puede garantizar el
+                # orden y SQLAlchemy hace un INSERT por fila, igual dentro de la misma transaccion.
+                ids = db.execute(_insert_sessions, rows).scalars().all()
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                print(f"[BulkSessions] Batch of {len(batch)} sessions failed: {e}")
+                for i in batch:
+                    results[i].status, results[i].detail = "failed", "Could not save session"
+                continue
+            for i, session_id in zip(batch, ids):
+                results[i].id = session_id
+            # Un evento por lote y no por sesion, para no llenar la cola de los clientes conectados
+            broker.publish(user_id, "sessions.imported", count=len(ids), patient_ids=sorted({items[i].patient_id for i in batch}))
+    return results
@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..models.chat_message import ChatBackfill, ChatMessage
+from .agent_service import agent_service
+
+# Copia local y encriptada de las conversaciones con el agente. GET /chat lee de aca con
+# cursores en vez de pedirle al agente la conversacion completa cada vez; la historia
+# remota de cada paciente se copia una sola vez (backfill) la primera vez que se abre.
+
+def _encode_session_ids(session_ids: Optional[Iterable]) -> Optional[str]:
+    ids = [str(int(i)) for i in session_ids or [] if str(i).strip().isdigit()]
+    return f",{','.join(ids)}," if ids else None
+
+def _parse_timestamp(value) -> datetime:
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            # Se guarda en UTC sin zona, como el resto de las fechas
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            return parsed
+        except ValueError:
+            pass
+    return datetime.utcnow()
+
+def to_dict(message: ChatMessage) -> Dict:
+    return {
+        "id": message.id,
+        "role": message.role,
+        "content": message.content,
+        "timestamp": message.timestamp.isoformat(),
+    }
+
+def record_message(db: Session, user_id: int, patient_id: int, role: str, content: str, session_ids=None, timestamp: Optional[datetime] = None) -> ChatMessage:
+    message = ChatMessage(
+        user_id=user_id,
+        patient_id=patient_id,
+        role=role,
+        content=content,
+        session_ids=_encode_session_ids(session_ids),
+        timestamp=timestamp or datetime.utcnow(),
+    )
+    db.add(message)
+    return message
+
+def is_backfilled(db: Session, patient_id: int) -> bool:
+    return db.get(ChatBackfill, patient_id) is not None
+
+async def backfill(db: Session, user_id: int, patient_id: int) -> bool:
+    """
+    Copy the agent's history of a patient into the local store, once.
+    Returns False if the agent could not be reached; it is retried on the next read.
+    """
+    if is_backfilled(db, patient_id):
+        return True
+    try:
+        history = await agent_service.get_chat_history(patient_id)
+    except Exception as e:
+        print(f"[ChatStore] Backfill of patient {patient_id} failed, serving local messages: {e}")
+        return False
+    remote = (history.get("messages") or []) if isinstance(history, dict) else []
+    # Los mensajes guardados localmente antes del backfill (enviados con el agente caido, o antes
+    # de abrir el chat) quedan como estan, con su id: un cliente puede tener ya un cursor sobre ellos.
+    # Como el agente tambien los tiene, un mensaje remoto con el mismo contenido es esa misma fila
+    # y no se vuelve a insertar; el resto de la historia se agrega con su fecha original.
+    stored: Dict[str, int] = {}
+    for (content,) in db.query(ChatMessage.content).filter(ChatMessage.patient_id == patient_id):
+        stored[content] = stored.get(content, 0) + 1
+    inserted = 0
+    for item in remote:
+        content = item.get("content")
+        if not content:
+            continue
+        content = str(content)
+        if stored.get(content):
+            stored[content] -= 1
+            continue
+        role = item.get("role") or item.get("sender") or "agent"
+        record_message(db, user_id, patient_id, role, content, item.get("session_ids"), _parse_timestamp(item.get("timestamp")))
+        inserted += 1
+    db.add(ChatBackfill(patient_id=patient_id, messages=len(remote)))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Otro pedido hizo el backfill al mismo tiempo
+        db.rollback()
+        return True
+    print(f"[ChatStore] Backfilled {inserted} of {len(remote)} messages for patient {patient_id}")
+    return True
+
+def list_messages(
+    db: Session,
+    patient_id: int,
+    since_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = 50,
+    session_ids: Optional[List[int]] = None
+) -> Dict:
+    """
+    Messages in id order. since_id returns the next page after a cursor (incremental sync);
+    before_id returns the page just before it (scrolling back); neither returns the latest page.
+    """
+    query = db.query(ChatMessage).filter(ChatMessage.patient_id == patient_id)
+    if session_ids:
+        query = query.filter(or_(*[ChatMessage.session_ids.like(f"%,{int(i)},%") for i in session_ids]))
+    if since_id is not None:
+        rows = query.filter(ChatMessage.id > since_id).order_by(ChatMessage.id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        if before_id is not None:
+            query = query.filter(ChatMessage.id < before_id)
+        rows = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+    return {
+        "messages": [to_dict(m) for m in rows],
+        "has_more": has_more,
+        # Cursor para el proximo GET ?since_id=
+        "last_id": rows[-1].id if rows else since_id,
+    }
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+from ..core.config import settings
+
+# Cada subida vive en UPLOAD_DIR como:
+#   <id>.json    metadatos (usuario, paciente, tamaño, checksum final)
+#   <id>.part    archivo pre-asignado con el tamaño total
+#   <id>.chunks/ un marcador "<offset>-<length>" por cada parte escrita, con su sha256
+# Los marcadores se crean con os.replace despues de escribir la parte, asi que
+# varios PUT en paralelo (incluso desde distintos workers) no necesitan locks.
+
+def _paths(upload_id: str) -> Tuple[str, str, str]:
+    base = os.path.join(settings.UPLOAD_DIR, upload_id)
+    return f"{base}.json", f"{base}.part", f"{base}.chunks"
+
+def _load_meta(upload_id: str, user_id: int, patient_id: int) -> dict:
+    try:
+        uuid.UUID(hex=upload_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    meta_path, _, _ = _paths(upload_id)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if meta["user_id"] != user_id or meta["patient_id"] != patient_id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return meta
+
+def _received_ranges(upload_id: str) -> List[Tuple[int, int]]:
+    _, _, chunks_dir = _paths(upload_id)
+    ranges = []
+    for name in os.listdir(chunks_dir):
+        if name.endswith(".tmp"):
+            continue
+        offset, length = name.split("-")
+        ranges.append((int(offset), int(offset) + int(length)))
+    ranges.sort()
+    merged: List[Tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def _preallocate(fd: int, size: int):
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            # Algunos sistemas de archivos no soportan fallocate
+            pass
+    os.ftruncate(fd, size)
+
+def purge_expired_uploads() -> int:
+    """
+    Remove uploads that have not received data within UPLOAD_TTL_SECONDS, and finalized
+    files left behind (e.g. by a worker that died during the analysis) for as long.
+    """
+    if not os.path.isdir(settings.UPLOAD_DIR):
+        return 0
+    cutoff = time.time() - settings.UPLOAD_TTL_SECONDS
+    purged = 0
+    for name in os.listdir(settings.UPLOAD_DIR):
+        if name.endswith(".mp4"):
+            ready_path = os.path.join(settings.UPLOAD_DIR, name)
+            try:
+                if os.path.getmtime(ready_path) < cutoff:
+                    os.remove(ready_path)
+                    purged += 1
+            except FileNotFoundError:
+                pass
+            continue
+        if not name.endswith(".json"):
+            continue
+        upload_id = name[:-len(".json")]
+        meta_path, _, _ = _paths(upload_id)
+        try:
+            if os.path.getmtime(meta_path) >= cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        discard_upload(upload_id)
+        purged += 1
+    if purged:
+        print(f"[ChunkedUpload] Purged {purged} abandoned uploads")
+    return purged
+
+def discard_upload(upload_id: str):
+    meta_path, part_path, chunks_dir = _paths(upload_id)
+    if os.path.isdir(chunks_dir):
+        for name in os.listdir(chunks_dir):
+            try:
+                os.remove(os.path.join(chunks_dir, name))
+            except FileNotFoundError:
+                pass
+        try:
+            os.rmdir(chunks_dir)
+        except OSError:
+            pass
+    for path in (part_path, meta_path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def create_upload(user_id: int, patient_id: int, filename: str, size: int, sha256: Optional[str] = None) -> dict:
+    if size <= 0:
+        raise HTTPException(status_code=400, detail="Upload size must be greater than zero")
+    if size > settings.UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload too large, the limit is {settings.UPLOAD_MAX_BYTES} bytes")
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    purge_expired_uploads()
+
+    upload_id = uuid.uuid4().hex
+    meta_path, part_path, chunks_dir = _paths(upload_id)
+    os.makedirs(chunks_dir)
+    fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        _preallocate(fd, size)
+    except OSError:
+        os.close(fd)
+        discard_upload(upload_id)
+        raise HTTPException(status_code=507, detail="Not enough storage for this upload")
+    os.close(fd)
+
+    meta = {
+        "upload_id": upload_id,
+        "user_id": user_id,
+        "patient_id": patient_id,
+        "filename": filename,
+        "size": size,
+        "sha256": sha256.lower() if sha256 else None,
+        "created_at": time.time(),
+    }
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return get_status(upload_id, user_id, patient_id)
+
+def write_chunk(upload_id: str, user_id: int, patient_id: int, offset: int, data: bytes, sha256: Optional[str] = None) -> dict:
+    meta = _load_meta(upload_id, user_id, patient_id)
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty chunk")
+    if len(data) > settings.UPLOAD_MAX_CHUNK_BYTES:
+        raise HTTPException(status_code=413, detail="Chunk too large")
+    if offset < 0 or offset + len(data) > meta["size"]:
+        raise HTTPException(status_code=416, detail="Chunk outside of upload range")
+
+    digest = hashlib.sha256(data).hexdigest()
+    if sha256 and sha256.lower() != digest:
+        raise HTTPException(status_code=422, detail="Chunk checksum mismatch")
+
+    meta_path, part_path, chunks_dir = _paths(upload_id)
+    try:
+        fd = os.open(part_path, os.O_WRONLY)
+    except FileNotFoundError:
+        raise HTTPException(status_code=409, detail="Upload is already being finalized")
+    try:
+        if hasattr(os, "pwrite"):
+            written = 0
+            while written < len(data):
+                written += os.pwrite(fd, data[written:], offset + written)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            os.write(fd, data)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    marker = os.path.join(chunks_dir, f"{offset}-{len(data)}")
+    with open(marker + ".tmp", "w") as f:
+        f.write(digest)
+    os.replace(marker + ".tmp", marker)
+    # Renovar el TTL de la subida
+    os.utime(meta_path)
+    return get_status(upload_id, user_id, patient_id)
+
+def get_status(upload_id: str, user_id: int, patient_id: int) -> dict:
+    meta = _load_meta(upload_id, user_id, patient_id)
+    ranges = _received_ranges(upload_id)
+    committed = ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+    return {
+        "upload_id": upload_id,
+        "size": meta["size"],
+        "committed_offset": committed,
+        "received_bytes": sum(end - start for start, end in ranges),
+        "complete": committed == meta["size"],
+    }
+
+def finalize_upload(upload_id: str, user_id: int, patient_id: int) -> str:
+    """
+    Verify that every byte was received (and the whole-file checksum, if given)
+    and move the data out of the upload area. Returns the path of the complete file.
+    """
+    meta = _load_meta(upload_id, user_id, patient_id)
+    status = get_status(upload_id, user_id, patient_id)
+    if not status["complete"]:
+        raise HTTPException(status_code=409, detail=f"Upload incomplete, committed offset {status['committed_offset']}")
+
+    _, part_path, _ = _paths(upload_id)
+    ready_path = os.path.join(settings.UPLOAD_DIR, f"{upload_id}.mp4")
+    try:
+        # El rename es atomico: un segundo finalize concurrente falla aca
+        os.rename(part_path, ready_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=409, detail="Upload is already being finalized")
+    # El TTL del archivo listo cuenta desde aca, no desde la ultima parte recibida
+    os.utime(ready_path)
+
+    if meta["sha256"]:
+        digest = hashlib.sha256()
+        with open(ready_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        if digest.hexdigest() != meta["sha256"]:
+            os.rename(ready_path, part_path)
+            raise HTTPException(status_code=422, detail="Upload checksum mismatch")
+
+    discard_upload(upload_id)
+    return ready_path
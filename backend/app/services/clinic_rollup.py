@@ -0,0 +1,210 @@
+import json
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..database import SessionLocal
+from ..models.clinic_rollup import ClinicEmotionRollup, ClinicRollupProgress, ClinicSessionRollup
+from ..models.patient import Patient
+from ..models.therapy_session import TherapySession
+
+# Totales de emociones y cantidad de sesiones por clinica, por dia y por semana, para los
+# tableros de largo plazo: leer un año de semanas son ~50 filas en vez de desencriptar y
+# parsear todas las sesiones de todos los pacientes.
+#
+# refresh() suma en lotes las sesiones con rolled_up en falso y las marca en la misma
+# transaccion. No usa una marca de agua por id: en Postgres los ids se asignan al insertar
+# pero las filas se ven al hacer commit, asi que un id menor puede aparecer despues de que
+# el refresco ya paso por ids mayores. La fila de progreso se bloquea (FOR UPDATE) durante
+# el lote, asi varios workers no cuentan dos veces la misma sesion y los borrados de
+# pacientes (remove_sessions) restan exactamente lo que ya se habia sumado.
+
+PERIODS = ("day", "week")
+PROGRESS_NAME = "clinic_emotions"
+
+_run_lock = threading.Lock()
+
+def parse_emotions_from_results(results_json: str) -> Dict[str, int]:
+    try:
+        # Convert string representation of dict to actual dict
+        if isinstance(results_json, str):
+            results_json = results_json.replace("'", '"')
+        results = json.loads(results_json)
+
+        # Return the emotion_summary directly if it exists
+        if 'emotion_summary' in results:
+            return results['emotion_summary']
+
+        # If no emotion_summary, count emotions from timeline
+        emotion_counts = {}
+        if 'timeline' in results:
+            for emotion in results['timeline'].values():
+                emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
+        return emotion_counts
+    except (json.JSONDecodeError, AttributeError) as e:
+        print(f"Error parsing results: {e}")
+        return {}
+
+def bucket_start(day: date, period: str) -> date:
+    """The day itself, or the Monday of its week"""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+def _lock_progress(db: Session) -> Optional[ClinicRollupProgress]:
+    return db.query(ClinicRollupProgress).filter(ClinicRollupProgress.name == PROGRESS_NAME).with_for_update().first()
+
+def _totals(rows: Iterable[Tuple[int, Optional[datetime], str, int]]):
+    """Session and emotion totals per bucket for (session id, date, results, clinic) rows"""
+    sessions: Dict[Tuple[int, str, date], int] = defaultdict(int)
+    emotions: Dict[Tuple[int, str, date, str], int] = defaultdict(int)
+    for _, session_date, results, user_id in rows:
+        if session_date is None or user_id is None:
+            continue
+        counts = parse_emotions_from_results(results)
+        for period in PERIODS:
+            bucket = bucket_start(session_date.date(), period)
+            sessions[(user_id, period, bucket)] += 1
+            for emotion, count in counts.items():
+                if isinstance(count, (int, float)) and count:
+                    emotions[(user_id, period, bucket, emotion)] += int(count)
+    return sessions, emotions
+
+def _apply(db: Session, sessions: Dict, emotions: Dict, sign: int):
+    # Pocas filas por lote (una por clinica, dia/semana y emocion): UPDATE y si no existe INSERT.
+    # Con la marca de agua bloqueada nadie mas inserta las mismas claves a la vez.
+    table = ClinicSessionRollup.__table__
+    for (user_id, period, bucket), delta in sessions.items():
+        key = (table.c.user_id == user_id) & (table.c.period == period) & (table.c.bucket == bucket)
+        if not db.execute(update(table).where(key).values(sessions=table.c.sessions + sign * delta)).rowcount and sign > 0:
+            db.execute(table.insert().values(user_id=user_id, period=period, bucket=bucket, sessions=delta))
+    table = ClinicEmotionRollup.__table__
+    for (user_id, period, bucket, emotion), delta in emotions.items():
+        key = (table.c.user_id == user_id) & (table.c.period == period) & (table.c.bucket == bucket) & (table.c.emotion == emotion)
+        if not db.execute(update(table).where(key).values(count=table.c.count + sign * delta)).rowcount and sign > 0:
+            db.execute(table.insert().values(user_id=user_id, period=period, bucket=bucket, emotion=emotion, count=delta))
+    if sign < 0:
+        db.query(ClinicSessionRollup).filter(ClinicSessionRollup.sessions <= 0).delete(synchronize_session=False)
+        db.query(ClinicEmotionRollup).filter(ClinicEmotionRollup.count <= 0).delete(synchronize_session=False)
+
+def _session_rows(db: Session, *conditions, limit: Optional[int] = None) -> List[Tuple[int, Optional[datetime], str, int]]:
+    query = (
+        select(TherapySession.id, TherapySession.date, TherapySession.results, Patient.user_id)
+        .join(Patient, Patient.id == TherapySession.patient_id)
+        .where(*conditions)
+        .order_by(TherapySession.id)
+        .limit(limit)
+    )
+    return db.execute(query).all()
+
+def refresh(db: Session, batch_size: Optional[int] = None) -> int:
+    """Add the sessions created since the last refresh to the rollups; returns how many were added"""
+    batch_size = batch_size or settings.CLINIC_ROLLUP_BATCH_SIZE
+    added = 0
+    while True:
+        progress = _lock_progress(db)
+        if progress is None:
+            try:
+                db.add(ClinicRollupProgress(name=PROGRESS_NAME))
+                db.commit()
+            except IntegrityError:
+                # Otro worker la creo al mismo tiempo
+                db.rollback()
+            continue
+        rows = _session_rows(db, TherapySession.rolled_up.is_(False), limit=batch_size)
+        if not rows:
+            progress.refreshed_at = datetime.utcnow()
+            db.commit()
+            return added
+        sessions, emotions = _totals(rows)
+        _apply(db, sessions, emotions, 1)
+        db.execute(
+            update(TherapySession.__table__)
+            .where(TherapySession.__table__.c.id.in_([row[0] for row in rows]))
+            .values(rolled_up=True)
+        )
+        progress.refreshed_at = datetime.utcnow()
+        db.commit()
+        added += len(rows)
+
+def remove_sessions(db: Session, session_ids: List[int]):
+    """
+    Subtract sessions that are about to be deleted from the rollups. Call it in the
+    transaction that deletes them; sessions not counted yet are left alone.
+    """
+    if not session_ids:
+        return
+    if _lock_progress(db) is None:
+        return
+    rows = _session_rows(db, TherapySession.id.in_(session_ids), TherapySession.rolled_up.is_(True))
+    sessions, emotions = _totals(rows)
+    _apply(db, sessions, emotions, -1)
+
+def rebuild(db: Session) -> int:
+    """Recompute every rollup from therapy_sessions; returns the sessions counted"""
+    _lock_progress(db)
+    db.execute(update(TherapySession.__table__).where(TherapySession.__table__.c.rolled_up.is_(True)).values(rolled_up=False))
+    db.query(ClinicSessionRollup).delete(synchronize_session=False)
+    db.query(ClinicEmotionRollup).delete(synchronize_session=False)
+    db.commit()
+    return refresh(db)
+
+def emotions_in_range(db: Session, user_id: int, period: str, start: date, end: date) -> dict:
+    """Sessions and emotion totals of a clinic per bucket between start and end (inclusive)"""
+    first = bucket_start(start, period)
+    sessions = db.query(ClinicSessionRollup.bucket, ClinicSessionRollup.sessions).filter(
+        ClinicSessionRollup.user_id == user_id,
+        ClinicSessionRollup.period == period,
+        ClinicSessionRollup.bucket >= first,
+        ClinicSessionRollup.bucket <= end,
+    ).order_by(ClinicSessionRollup.bucket).all()
+    emotions = db.query(ClinicEmotionRollup.bucket, ClinicEmotionRollup.emotion, ClinicEmotionRollup.count).filter(
+        ClinicEmotionRollup.user_id == user_id,
+        ClinicEmotionRollup.period == period,
+        ClinicEmotionRollup.bucket >= first,
+        ClinicEmotionRollup.bucket <= end,
+    ).order_by(ClinicEmotionRollup.bucket, ClinicEmotionRollup.emotion).all()
+    buckets = {bucket: {"bucket": bucket.isoformat(), "sessions": count, "emotions": []} for bucket, count in sessions}
+    totals: Dict[str, int] = defaultdict(int)
+    for bucket, emotion, count in emotions:
+        if bucket in buckets:
+            buckets[bucket]["emotions"].append({"emotion": emotion, "count": count})
+        totals[emotion] += count
+    progress = db.query(ClinicRollupProgress).filter(ClinicRollupProgress.name == PROGRESS_NAME).first()
+    return {
+        "period": period,
+        "start": first.isoformat(),
+        "end": end.isoformat(),
+        "sessions": sum(count for _, count in sessions),
+        "emotions": [{"emotion": emotion, "count": count} for emotion, count in sorted(totals.items())],
+        "series": list(buckets.values()),
+        "refreshed_at": progress.refreshed_at if progress else None,
+    }
+
+def run_refresh() -> int:
+    """refresh() with its own session; errors are logged and retried on the next run"""
+    if not _run_lock.acquire(blocking=False):
+        return 0
+    db = SessionLocal()
+    try:
+        added = refresh(db)
+        if added:
+            print(f"[ClinicRollup] Added {added} sessions")
+        return added
+    except Exception as e:
+        db.rollback()
+        print(f"[ClinicRollup] Refresh failed: {e}")
+        return 0
+    finally:
+        db.close()
+        _run_lock.release()
+
+def refresh_forever(stop: threading.Event):
+    """Background loop started with the app; refreshes every CLINIC_ROLLUP_REFRESH_SECONDS"""
+    while not stop.is_set():
+        run_refresh()
+        stop.wait(settings.CLINIC_ROLLUP_REFRESH_SECONDS)
@@ -0,0 +1,152 @@
+import json
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.plaintext_cache import PlaintextCache
+from ..models.therapy_session import TherapySession
+
+# Contexto emocional compacto para el agente, armado en el servidor con los resultados
+# guardados: en lugar de timelines completos (miles de entradas por sesion) se mandan
+# proporciones, emocion dominante, cambios dentro de cada sesion y tendencias entre
+# sesiones. Se cachea por conjunto de sesiones; los resultados no cambian despues de guardarse.
+
+_cache = PlaintextCache(settings.EMOTION_CONTEXT_CACHE_BYTES, settings.EMOTION_CONTEXT_CACHE_TTL_SECONDS)
+
+def _proportions(counts: Dict[str, int]) -> Dict[str, float]:
+    total = sum(counts.values())
+    if not total:
+        return {}
+    return {emotion: round(count / total, 3) for emotion, count in sorted(counts.items()) if count}
+
+def _dominant(counts: Dict[str, int]) -> Optional[str]:
+    counts = {emotion: count for emotion, count in counts.items() if count}
+    return max(sorted(counts), key=counts.get) if counts else None
+
+def _ordered_timeline(timeline: Dict[str, str]) -> List[str]:
+    entries = []
+    for key, emotion in timeline.items():
+        try:
+            entries.append((float(key), emotion))
+        except ValueError:
+            continue
+    return [emotion for _, emotion in sorted(entries)]
+
+def summarize_session(session_id: int, date, results: Dict[str, Any]) -> Dict[str, Any]:
+    timeline = _ordered_timeline(results.get("timeline") or {})
+    counts = dict(results.get("emotion_summary") or {})
+    if not counts:
+        for emotion in timeline:
+            counts[emotion] = counts.get(emotion, 0) + 1
+    seconds = len(timeline) or sum(counts.values())
+    summary = {
+        "id": session_id,
+        "date": date.date().isoformat() if date else None,
+        "seconds": seconds,
+        "dominant": _dominant(counts),
+        "proportions": _proportions(counts),
+    }
+    if timeline:
+        # Cuantas veces cambia la emocion por minuto: estabilidad emocional dentro de la sesion
+        switches = sum(1 for previous, current in zip(timeline, timeline[1:]) if previous != current)
+        summary["changes_per_minute"] = round(switches * 60 / len(timeline), 2)
+        # Emocion dominante al principio, en el medio y al final
+        third = max(1, len(timeline) // 3)
+        phases = []
+        for part in (timeline[:third], timeline[third:2 * third], timeline[2 * third:]):
+            part_counts: Dict[str, int] = {}
+            for emotion in part:
+                part_counts[emotion] = part_counts.get(emotion, 0) + 1
+            phases.append(_dominant(part_counts))
+        summary["phases"] = phases
+    return summary
+
+def _trend(values: List[float]) -> float:
+    """Least-squares slope per session"""
+    n = len(values)
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    denominator = sum((x - mean_x) ** 2 for x in range(n))
+    return round(sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values)) / denominator, 4)
+
+def _combine(sessions: List[Dict[str, Any]], scope: str, total_sessions: int) -> Dict[str, Any]:
+    overall: Dict[str, float] = {}
+    total_seconds = sum(s["seconds"] for s in sessions)
+    for s in sessions:
+        for emotion, proportion in s["proportions"].items():
+            overall[emotion] = overall.get(emotion, 0) + proportion * s["seconds"]
+    context = {
+        "scope": scope,
+        "sessions_total": total_sessions,
+        "sessions_included": len(sessions),
+        "total_seconds": total_seconds,
+        "overall": {
+            "dominant": _dominant(overall),
+            "proportions": {e: round(v / total_seconds, 3) for e, v in sorted(overall.items())} if total_seconds else {},
+        },
+    }
+    if len(sessions) >= 2:
+        emotions = sorted({e for s in sessions for e in s["proportions"]})
+        context["trends"] = {
+            emotion: _trend([s["proportions"].get(emotion, 0.0) for s in sessions]) for emotion in emotions
+        }
+        context["dominant_changes"] = [
+            {"session_id": current["id"], "date": current["date"], "from": previous["dominant"], "to": current["dominant"]}
+            for previous, current in zip(sessions, sessions[1:])
+            if previous["dominant"] != current["dominant"]
+        ]
+    context["sessions"] = sessions
+    return context
+
+def _fit(context: Dict[str, Any], max_bytes: int) -> Dict[str, Any]:
+    """Trim detail until the serialized context fits: phases first, then the oldest sessions"""
+    def size():
+        return len(json.dumps(context, separators=(",", ":")))
+
+    if size() <= max_bytes:
+        return context
+    for s in context["sessions"]:
+        s.pop("phases", None)
+    while size() > max_bytes and context["sessions"]:
+        context["sessions"].pop(0)
+    if size() > max_bytes:
+        context.pop("dominant_changes", None)
+    return context
+
+def build_context(db: Session, patient_id: int, session_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Context for the selected sessions of a patient, or for the patient's most recent
+    EMOTION_CONTEXT_MAX_SESSIONS sessions if none are selected. Sessions are in date order.
+    Raises LookupError if a selected session does not belong to the patient.
+    """
+    query = db.query(TherapySession.id).filter(TherapySession.patient_id == patient_id)
+    if session_ids:
+        ids = [row.id for row in query.filter(TherapySession.id.in_(session_ids)).order_by(TherapySession.date, TherapySession.id)]
+        missing = set(session_ids) - set(ids)
+        if missing:
+            raise LookupError(f"Sessions not found: {sorted(missing)}")
+        scope = "sessions"
+    else:
+        ids = [row.id for row in query.order_by(TherapySession.date, TherapySession.id)]
+        scope = "historical"
+    total_sessions = len(ids)
+    ids = ids[-settings.EMOTION_CONTEXT_MAX_SESSIONS:]
+
+    cache_key = f"{patient_id}:{scope}:{total_sessions}:{','.join(map(str, ids))}"
+    cached = _cache.get(cache_key)
+    if cached is not None:
+        return json.loads(cached)
+
+    sessions = db.query(TherapySession).filter(TherapySession.id.in_(ids)).order_by(TherapySession.date, TherapySession.id).all() if ids else []
+    summaries = []
+    for session in sessions:
+        try:
+            results = json.loads(session.results)
+        except (TypeError, ValueError):
+            continue
+        summaries.append(summarize_session(session.id, session.date, results))
+    context = _fit(_combine(summaries, scope, total_sessions), settings.EMOTION_CONTEXT_MAX_BYTES)
+    _cache.put(cache_key, json.dumps(context))
+    return context
+
+def cache_stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import select
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Set
+from sqlalchemy import text
+from ..core.config import settings
+from ..database import engine
+
+# Eventos que se envian a los clientes de cada usuario:
+#   analysis.started / analysis.progress / analysis.completed / analysis.failed
+#   session.created / note.added
+# Solo llevan ids, nunca datos clinicos; el cliente pide el recurso si lo necesita.
+
+class Subscription:
+    """Events of one user for one connected client, consumed from its own event loop"""
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop, max_size: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.dropped = 0
+
+    def _put(self, event: dict):
+        # Un cliente lento pierde los eventos mas viejos en vez de frenar a los demas
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    def deliver(self, event: dict):
+        """Thread-safe: may be called from request threads or the listener thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # El loop del cliente ya se cerro
+            pass
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class MemoryBackend:
+    """Single process: publishing delivers straight to the local subscribers"""
+
+    def __init__(self, broker: "EventBroker"):
+        self.broker = broker
+
+    def publish(self, event: dict):
+        self.broker.dispatch(event)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+class PostgresBackend:
+    """
+    Several workers: events go through Postgres NOTIFY and every worker LISTENs on
+    the same channel, delivering to its own subscribers (including the publisher's).
+    """
+
+    def __init__(self, broker: "EventBroker", channel: str):
+        self.broker = broker
+        self.channel = channel
+        self._listener = None
+        self._stopping = threading.Event()
+
+    def publish(self, event: dict):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": json.dumps(event)})
+            conn.commit()
+
+    def _listen(self):
+        while not self._stopping.is_set():
+            raw = None
+            try:
+                raw = engine.raw_connection()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                print(f"[Events] Listening on {self.channel}")
+                while not self._stopping.is_set():
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            self.broker.dispatch(json.loads(notify.payload))
+                        except ValueError:
+                            print(f"[Events] Ignoring malformed payload on {self.channel}")
+            except Exception as e:
+                print(f"[Events] Listener error, reconnecting: {e}")
+                time.sleep(1)
+            finally:
+                if raw is not None:
+                    try:
+                        raw.invalidate()
+                    except Exception:
+                        pass
+
+    def start(self):
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, name="events-listener", daemon=True)
+            self._listener.start()
+
+    def stop(self):
+        self._stopping.set()
+
+class EventBroker:
+    """In-process fan-out of per-user events to WebSocket/SSE clients"""
+
+    def __init__(self, backend: str = "memory", channel: str = "emotionai_events", queue_size: int = 100):
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.queue_size = queue_size
+        if backend == "postgres":
+            self.backend = PostgresBackend(self, channel)
+        elif backend == "memory":
+            self.backend = MemoryBackend(self)
+        else:
+            raise ValueError(f"Unknown EVENTS_BACKEND: {backend}")
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Call from the event loop that will consume the subscription"""
+        subscription = Subscription(user_id, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def dispatch(self, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event.get("user_id"), ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def publish(self, user_id: int, event_type: str, **data):
+        """Send an event to every connected client of a user. Never raises: events are best-effort."""
+        event = {
+            "type": event_type,
+            "user_id": user_id,
+            "data": data,
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+        try:
+            self.backend.publish(event)
+        except Exception as e:
+            print(f"[Events] Could not publish {event_type}: {e}")
+
+    def start(self):
+        self.backend.start()
+
+    def stop(self):
+        self.backend.stop()
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscriptions = [s for subscribers in self._subscribers.values() for s in subscribers]
+        return {
+            "backend": type(self.backend).__name__,
+            "users": len({s.user_id for s in subscriptions}),
+            "subscriptions": len(subscriptions),
+            "dropped_events": sum(s.dropped for s in subscriptions),
+        }
+
+broker = EventBroker(settings.EVENTS_BACKEND, settings.EVENTS_CHANNEL, settings.EVENTS_QUEUE_SIZE)
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Tuple
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.idempotency_key import IdempotencyKey
+
+# Un reintento con la misma Idempotency-Key devuelve la respuesta guardada en vez de volver a
+# analizar el video. La fila se crea en estado "processing" antes de hacer el trabajo: la
+# restriccion unica (user_id, key) hace que solo un pedido la gane, incluso entre workers, y
+# los duplicados concurrentes esperan a que pase a "completed".
+
+def start_fingerprint(method: str, path: str):
+    """Hash object for fingerprinting a body that arrives in pieces; finish with hexdigest()"""
+    return hashlib.sha256(f"{method} {path}\n".encode())
+
+def fingerprint(method: str, path: str, *parts: bytes) -> str:
+    digest = start_fingerprint(method, path)
+    for part in parts:
+        digest.update(part)
+    return digest.hexdigest()
+
+def _claim(db: Session, user_id: int, key: str, request_fingerprint: str) -> Tuple[IdempotencyKey, bool]:
+    """Return (record, True) if this request must do the work, or (completed record, False) to replay"""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        now = datetime.utcnow()
+        record = IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            fingerprint=request_fingerprint,
+            status="processing",
+            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+        )
+        db.add(record)
+        try:
+            db.commit()
+            return record, True
+        except IntegrityError as e:
+            db.rollback()
+            error = e
+
+        existing = db.query(IdempotencyKey).filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key).first()
+        if existing is None:
+            # No choco con otra clave: es otra restriccion (p.ej. el usuario no existe), reintentar no sirve
+            raise error
+        stale = existing.status == "processing" and existing.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_STALE_SECONDS)
+        if existing.expires_at < now or stale:
+            # Vencida, o el worker que la tomo murio a mitad del trabajo: se puede volver a usar
+            db.query(IdempotencyKey).filter(IdempotencyKey.id == existing.id, IdempotencyKey.created_at == existing.created_at).delete()
+            db.commit()
+            if time.monotonic() < deadline:
+                continue
+        else:
+            if existing.fingerprint != request_fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            if existing.status == "completed":
+                return existing, False
+            # Terminar la transaccion para ver el estado nuevo en la proxima lectura
+            db.rollback()
+        # Cada vuelta (la clave sigue en proceso, o otro pedido la volvio a tomar) cuenta para la espera
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still being processed",
+                headers={"Retry-After": "5"},
+            )
+        time.sleep(settings.IDEMPOTENCY_POLL_SECONDS)
+
+def _replay(record: IdempotencyKey) -> JSONResponse:
+    return JSONResponse(
+        content=json.loads(record.response_body),
+        status_code=record.response_status,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+def run(db: Session, user_id: int, key: str, request_fingerprint: str, handler: Callable[[], Any], status_code: int = 200) -> JSONResponse:
+    """
+    Run handler once per (user, Idempotency-Key) and store its response for IDEMPOTENCY_TTL_SECONDS.
+    Blocking: call from a sync route or through run_in_threadpool.
+    If handler fails nothing is stored, so the client can retry with the same key.
+    """
+    if not key or len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be 1 to 255 characters")
+    record, is_new = _claim(db, user_id, key, request_fingerprint)
+    if not is_new:
+        return _replay(record)
+
+    record_id = record.id
+    try:
+        body = jsonable_encoder(handler())
+    except BaseException:
+        db.rollback()
+        db.query(IdempotencyKey).filter(IdempotencyKey.id == record_id).delete()
+        db.commit()
+        raise
+    db.query(IdempotencyKey).filter(IdempotencyKey.id == record_id).update({
+        IdempotencyKey.status: "completed",
+        IdempotencyKey.response_status: status_code,
+        IdempotencyKey.response_body: json.dumps(body),
+    })
+    db.commit()
+    return JSONResponse(content=body, status_code=status_code)
+
+def purge_expired(db: Session) -> int:
+    deleted = db.query(IdempotencyKey).filter(IdempotencyKey.expires_at < datetime.utcnow()).delete()
+    db.commit()
+    return deleted
@@ -0,0 +1,127 @@
+import importlib
+import pkgutil
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import column, func, select, table, update
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.security import EncryptedResults, EncryptedString, EncryptedText, is_primary_token, primary_key_fingerprint, rotate_token
+from ..database import Base, SessionLocal
+from .. import models
+from ..models.key_rotation_progress import KeyRotationProgress
+
+# Registrar todos los modelos en Base.metadata antes de buscar columnas encriptadas: se importa
+# cada modulo de app.models, asi una tabla nueva con columnas encriptadas no queda afuera
+for _module in pkgutil.iter_modules(models.__path__):
+    importlib.import_module(f"{models.__name__}.{_module.name}")
+
+_run_lock = threading.Lock()
+
+def encrypted_columns() -> Dict[str, List[str]]:
+    """Map every table with an id primary key to its encrypted columns"""
+    found = {}
+    for table_obj in Base.metadata.sorted_tables:
+        names = [c.name for c in table_obj.columns if isinstance(c.type, (EncryptedResults, EncryptedString, EncryptedText))]
+        if names and "id" in table_obj.c:
+            found[table_obj.name] = names
+    return found
+
+def _get_progress(db: Session, table_name: str, total_rows: int) -> KeyRotationProgress:
+    fingerprint = primary_key_fingerprint()
+    progress = db.get(KeyRotationProgress, table_name)
+    if progress is None:
+        progress = KeyRotationProgress(table_name=table_name, key_fingerprint=fingerprint)
+        db.add(progress)
+    if progress.key_fingerprint != fingerprint or progress.last_id is None:
+        # Nueva clave primaria: empezar otra vez desde el principio
+        progress.key_fingerprint = fingerprint
+        progress.last_id = 0
+        progress.rows_processed = 0
+        progress.rows_rotated = 0
+        progress.started_at = datetime.utcnow()
+        progress.finished_at = None
+    progress.total_rows = total_rows
+    progress.updated_at = datetime.utcnow()
+    db.commit()
+    return progress
+
+def rotate_table(db: Session, table_name: str, columns: List[str], batch_size: int, delay_seconds: float):
+    """
+    Re-encrypt one table with the primary key in id-ordered batches, committing
+    the checkpoint with each batch so an interrupted run resumes where it stopped.
+    """
+    # Tabla "cruda", sin los TypeDecorator, para leer y escribir los tokens tal cual
+    raw = table(table_name, column("id"), *[column(name) for name in columns])
+    total_rows = db.execute(select(func.count()).select_from(raw)).scalar()
+    progress = _get_progress(db, table_name, total_rows)
+    if progress.finished_at is not None:
+        return
+
+    while True:
+        rows = db.execute(
+            select(raw).where(raw.c.id > progress.last_id).order_by(raw.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        rotated = 0
+        for row in rows:
+            for name in columns:
+                token = row._mapping[name]
+                if not token or is_primary_token(token):
+                    continue
+                # Solo escribir si el valor no cambio desde la lectura, para no pisar una escritura concurrente
+                result = db.execute(
+                    update(raw).where(raw.c.id == row.id, raw.c[name] == token).values({name: rotate_token(token)})
+                )
+                rotated += result.rowcount
+        progress.last_id = rows[-1].id
+        progress.rows_processed += len(rows)
+        progress.rows_rotated += rotated
+        progress.updated_at = datetime.utcnow()
+        db.commit()
+        print(f"[KeyRotation] {table_name}: {progress.rows_processed}/{total_rows} rows, {progress.rows_rotated} re-encrypted")
+        if delay_seconds:
+            time.sleep(delay_seconds)
+
+    progress.finished_at = datetime.utcnow()
+    db.commit()
+
+def run_key_rotation(batch_size: int = None, delay_seconds: float = None) -> bool:
+    """
+    Re-encrypt every encrypted column with the current primary key.
+    Returns False without doing anything if a rotation is already running in this process.
+    """
+    if not _run_lock.acquire(blocking=False):
+        return False
+    batch_size = batch_size or settings.KEY_ROTATION_BATCH_SIZE
+    delay_seconds = settings.KEY_ROTATION_BATCH_DELAY_SECONDS if delay_seconds is None else delay_seconds
+    db = SessionLocal()
+    try:
+        for table_name, columns in encrypted_columns().items():
+            rotate_table(db, table_name, columns, batch_size, delay_seconds)
+        print("[KeyRotation] Finished")
+        return True
+    finally:
+        db.close()
+        _run_lock.release()
+
+def is_running() -> bool:
+    return _run_lock.locked()
+
+def get_progress(db: Session) -> List[dict]:
+    fingerprint = primary_key_fingerprint()
+    progress = []
+    for table_name in encrypted_columns():
+        row = db.get(KeyRotationProgress, table_name)
+        current = row is not None and row.key_fingerprint == fingerprint
+        progress.append({
+            "table": table_name,
+            "rows_processed": row.rows_processed if current else 0,
+            "rows_rotated": row.rows_rotated if current else 0,
+            "total_rows": row.total_rows if current else None,
+            "finished": bool(current and row.finished_at),
+            "updated_at": row.updated_at if current else None,
+        })
+    return progress
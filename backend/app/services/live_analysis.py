@@ -0,0 +1,179 @@
+import asyncio
+import os
+import subprocess
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from ..core.config import settings
+from .api_client import analyze_video
+from .segmented_analysis import merge_results
+
+# Analisis en vivo: el cliente manda clips cortos (kind=clip) o frames JPEG muestreados
+# (kind=frame) por WebSocket. Los frames se juntan en micro-lotes de LIVE_BATCH_SECONDS
+# que se codifican como un clip con ffmpeg; cada lote se manda al modelo y su resultado
+# se suma al timeline acumulado, que se devuelve al cliente en cuanto esta listo.
+
+class LiveTimeline:
+    """Rolling emotion_summary/timeline of a live session, updated one batch at a time"""
+
+    def __init__(self):
+        self.summary: Dict[str, int] = {}
+        self.timeline: Dict[str, str] = {}
+        self.extra: Dict[str, Any] = {}
+
+    def add(self, offset: float, result: Dict[str, Any]) -> Dict[str, str]:
+        """Add the model result of a batch starting at offset; returns its shifted timeline"""
+        part = merge_results([(offset, result)])
+        for emotion, count in part.pop("emotion_summary").items():
+            self.summary[emotion] = self.summary.get(emotion, 0) + count
+        entries = part.pop("timeline")
+        self.timeline.update(entries)
+        for key, value in part.items():
+            self.extra.setdefault(key, value)
+        return entries
+
+    def result(self) -> Dict[str, Any]:
+        return {**self.extra, "emotion_summary": dict(self.summary), "timeline": dict(self.timeline)}
+
+class _Batch:
+    def __init__(self, offset: float, clip: Optional[bytes] = None, frames: Optional[List[bytes]] = None):
+        self.offset = offset
+        self.clip = clip
+        self.frames = frames
+
+    @property
+    def units(self) -> int:
+        return len(self.frames) if self.frames is not None else 1
+
+def encode_frames(frames: List[bytes], fps: int, output_path: str):
+    """Encode JPEG/PNG frames into a short mp4 clip at the given frame rate"""
+    command = [
+        settings.FFMPEG_BINARY,
+        "-y",
+        "-loglevel", "error",
+        "-f", "image2pipe",
+        "-framerate", str(fps),
+        "-i", "-",
+        "-c:v", "libx264",
+        "-preset", "veryfast",
+        "-pix_fmt", "yuv420p",
+        output_path,
+    ]
+    subprocess.run(command, input=b"".join(frames), check=True, capture_output=True, timeout=settings.VIDEO_PREPROCESS_TIMEOUT)
+
+def _analyze_batch(batch: _Batch, fps: int, tenant) -> Dict[str, Any]:
+    fd, path = tempfile.mkstemp(prefix="live_", suffix=".mp4")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if batch.clip is not None:
+                f.write(batch.clip)
+        if batch.frames is not None:
+            try:
+                encode_frames(batch.frames, fps, path)
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+                raise HTTPException(status_code=422, detail=f"Could not encode frames: {e}")
+        return analyze_video(path, tenant)
+    finally:
+        os.remove(path)
+
+class LiveAnalysis:
+    """
+    Queue of batches of one live session, analyzed in order by a single worker task.
+    The queue holds at most LIVE_QUEUE_SIZE batches; when the model falls behind the
+    oldest pending batch is dropped, so latency and memory stay bounded.
+    """
+
+    def __init__(self, send: Callable[[dict], Awaitable[None]], kind: str, fps: int, clip_seconds: float, queue_size: int, tenant=None):
+        self.send = send
+        self.kind = kind
+        self.fps = fps
+        self.clip_seconds = clip_seconds
+        self.tenant = tenant
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.timeline = LiveTimeline()
+        self.frames: List[bytes] = []
+        self.frame_count = 0
+        self.next_offset = 0.0
+        self.received = 0
+        self.dropped = 0
+        self.analyzed_batches = 0
+        self.failed_batches = 0
+        self._worker = asyncio.create_task(self._run())
+
+    @property
+    def frames_per_batch(self) -> int:
+        return max(1, round(self.fps * settings.LIVE_BATCH_SECONDS))
+
+    def _enqueue(self, batch: _Batch):
+        if self.queue.full():
+            oldest = self.queue.get_nowait()
+            self.dropped += oldest.units
+        self.queue.put_nowait(batch)
+
+    def add_frame(self, data: bytes):
+        self.received += 1
+        self.frames.append(data)
+        self.frame_count += 1
+        if len(self.frames) >= self.frames_per_batch:
+            self._flush_frames()
+
+    def _flush_frames(self):
+        if self.frames:
+            first_frame = self.frame_count - len(self.frames)
+            self._enqueue(_Batch(first_frame / self.fps, frames=self.frames))
+            self.frames = []
+
+    def add_clip(self, data: bytes, offset: Optional[float] = None):
+        """offset defaults to the end of the previous clip, assuming clips of clip_seconds"""
+        self.received += 1
+        if offset is None:
+            offset = self.next_offset
+        self.next_offset = offset + self.clip_seconds
+        self._enqueue(_Batch(offset, clip=data))
+
+    async def _run(self):
+        while True:
+            batch = await self.queue.get()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            try:
+                result = await run_in_threadpool(_analyze_batch, batch, self.fps, self.tenant)
+                entries = self.timeline.add(batch.offset, result)
+            except Exception as e:
+                # Un lote fallido no corta la sesion: lo ya analizado se guarda igual al final
+                self.failed_batches += 1
+                if isinstance(e, HTTPException):
+                    detail = e.detail
+                else:
+                    print(f"[Live] Batch at {batch.offset}s failed: {e}")
+                    detail = "Analysis failed"
+                await self.send({"type": "error", "offset": batch.offset, "detail": detail})
+                continue
+            self.analyzed_batches += 1
+            await self.send({
+                "type": "update",
+                "offset": batch.offset,
+                "timeline": entries,
+                "emotion_summary": dict(self.timeline.summary),
+                "latency_ms": round((time.perf_counter() - started) * 1000),
+                "received": self.received,
+                "dropped": self.dropped,
+            })
+
+    async def finish(self) -> Dict[str, Any]:
+        """Analyze what is still pending and return the final result"""
+        self._flush_frames()
+        await self.queue.put(None)
+        await self._worker
+        return self.timeline.result()
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "analyzed_batches": self.analyzed_batches,
+            "failed_batches": self.failed_batches,
+        }
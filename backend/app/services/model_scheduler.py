@@ -0,0 +1,215 @@
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional
+from fastapi import HTTPException
+from ..core.config import settings
+
+# Planificador de llamadas al modelo, compartido por todos los threads del proceso:
+#   - a lo sumo MODEL_MAX_CONCURRENCY llamadas en curso
+#   - token bucket por clinica (MODEL_TENANT_RATE por segundo, rafagas de MODEL_TENANT_BURST)
+#   - entre clinicas con pedidos en espera, weighted fair queuing: cada pedido recibe una
+#     etiqueta de fin virtual y se atiende primero la menor, asi una clinica con cientos
+#     de videos en cola no deja sin turno a las demas
+
+ANONYMOUS = "anonymous"
+# Con clientes anonimos (una clave por IP) se olvidan las colas inactivas pasado este numero
+_MAX_IDLE_TENANTS = 1000
+
+def anonymous_tenant(client_host: Optional[str]) -> str:
+    """Scheduler key for a caller without a clinic: one bucket per client address"""
+    return f"{ANONYMOUS}:{client_host}" if client_host else ANONYMOUS
+
+class _Ticket:
+    __slots__ = ("tenant", "finish_tag", "enqueued_at", "granted", "seq")
+
+    def __init__(self, tenant: str, finish_tag: float, seq: int):
+        self.tenant = tenant
+        self.finish_tag = finish_tag
+        self.enqueued_at = time.monotonic()
+        self.granted = threading.Event()
+        self.seq = seq
+
+class _Tenant:
+    def __init__(self, weight: float, rate: float, burst: float):
+        self.weight = weight
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.refilled_at = time.monotonic()
+        self.last_finish = 0.0
+        self.queue: Deque[_Ticket] = deque()
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent_waits: Deque[float] = deque(maxlen=1000)
+
+    def refill(self, now: float):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def has_token(self) -> bool:
+        return self.rate <= 0 or self.tokens >= 1
+
+    def seconds_to_token(self) -> float:
+        if self.has_token():
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class ModelScheduler:
+    def __init__(self, max_concurrency: int, rate: float, burst: float, weights: Dict[str, float], max_wait: float):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.weights = weights
+        self.max_wait = max_wait
+        self.running = 0
+        self.virtual_time = 0.0
+        self.tenants: Dict[str, _Tenant] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _tenant(self, key: str) -> _Tenant:
+        tenant = self.tenants.get(key)
+        if tenant is None:
+            tenant = _Tenant(self.weights.get(key, 1.0), self.rate, self.burst)
+            self.tenants[key] = tenant
+        return tenant
+
+    def _dispatch(self):
+        """Grant waiting tickets while there is capacity. Call with the lock held."""
+        now = time.monotonic()
+        while self.running < self.max_concurrency:
+            best = None
+            for tenant in self.tenants.values():
+                if not tenant.queue:
+                    continue
+                tenant.refill(now)
+                if not tenant.has_token():
+                    continue
+                head = tenant.queue[0]
+                if best is None or (head.finish_tag, head.seq) < (best.finish_tag, best.seq):
+                    best = head
+            if best is None:
+                return
+            tenant = self.tenants[best.tenant]
+            tenant.queue.popleft()
+            if tenant.rate > 0:
+                tenant.tokens -= 1
+            tenant.running += 1
+            self.running += 1
+            self.virtual_time = max(self.virtual_time, best.finish_tag - 1.0 / tenant.weight)
+            waited = now - best.enqueued_at
+            tenant.total_wait += waited
+            tenant.max_wait = max(tenant.max_wait, waited)
+            tenant.recent_waits.append(waited)
+            best.granted.set()
+
+    def _next_token_in(self) -> Optional[float]:
+        waits = [t.seconds_to_token() for t in self.tenants.values() if t.queue and not t.has_token()]
+        return min(waits) if waits else None
+
+    def acquire(self, tenant_key: str) -> _Ticket:
+        with self._lock:
+            tenant = self._tenant(tenant_key)
+            start = max(self.virtual_time, tenant.last_finish)
+            tenant.last_finish = start + 1.0 / tenant.weight
+            ticket = _Ticket(tenant_key, tenant.last_finish, next(self._seq))
+            tenant.queue.append(ticket)
+            self._dispatch()
+        deadline = ticket.enqueued_at + self.max_wait
+        while not ticket.granted.is_set():
+            with self._lock:
+                # Los tokens se recargan con el tiempo: alguien tiene que volver a despachar
+                self._dispatch()
+                next_token = self._next_token_in()
+            remaining = deadline - time.monotonic()
+            if ticket.granted.is_set():
+                break
+            if remaining <= 0:
+                with self._lock:
+                    if ticket.granted.is_set():
+                        break
+                    tenant.queue.remove(ticket)
+                    tenant.rejected += 1
+                    retry_after = max(1, math.ceil(next_token or 1))
+                raise HTTPException(
+                    status_code=429,
+                    detail="The model is busy, try again later",
+                    headers={"Retry-After": str(retry_after)},
+                )
+            ticket.granted.wait(min(remaining, next_token if next_token else remaining, 1.0))
+        return ticket
+
+    def release(self, ticket: _Ticket):
+        with self._lock:
+            tenant = self.tenants[ticket.tenant]
+            tenant.running -= 1
+            tenant.completed += 1
+            self.running -= 1
+            self._dispatch()
+            if len(self.tenants) > _MAX_IDLE_TENANTS:
+                self._forget_idle()
+
+    def _forget_idle(self):
+        """Drop tenants with nothing queued or running and a full bucket. Call with the lock held."""
+        now = time.monotonic()
+        for key, tenant in list(self.tenants.items()):
+            tenant.refill(now)
+            if not tenant.queue and not tenant.running and (tenant.rate <= 0 or tenant.tokens >= tenant.burst):
+                del self.tenants[key]
+
+    @contextmanager
+    def slot(self, tenant):
+        """Hold one model call slot for the tenant (a clinic user_id, or None for anonymous calls)"""
+        ticket = self.acquire(str(tenant) if tenant is not None else ANONYMOUS)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        with self._lock:
+            tenants = {}
+            for key, tenant in self.tenants.items():
+                waits = sorted(tenant.recent_waits)
+                granted = tenant.running + tenant.completed
+                tenants[key] = {
+                    "weight": tenant.weight,
+                    "queued": len(tenant.queue),
+                    "running": tenant.running,
+                    "completed": tenant.completed,
+                    "rejected": tenant.rejected,
+                    "tokens": round(tenant.tokens, 2) if tenant.rate > 0 else None,
+                    "avg_wait_ms": round(tenant.total_wait / granted * 1000, 1) if granted else 0.0,
+                    "p95_wait_ms": round(waits[max(0, math.ceil(0.95 * len(waits)) - 1)] * 1000, 1) if waits else 0.0,
+                    "max_wait_ms": round(tenant.max_wait * 1000, 1),
+                }
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self.running,
+                "queued": sum(len(t.queue) for t in self.tenants.values()),
+                "tenants": tenants,
+            }
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    weights = {}
+    for item in value.split(","):
+        if ":" in item:
+            tenant, weight = item.split(":", 1)
+            weights[tenant.strip()] = max(0.01, float(weight))
+    return weights
+
+scheduler = ModelScheduler(
+    max_concurrency=max(1, settings.MODEL_MAX_CONCURRENCY),
+    rate=settings.MODEL_TENANT_RATE,
+    burst=settings.MODEL_TENANT_BURST,
+    weights=_parse_weights(settings.MODEL_TENANT_WEIGHTS),
+    max_wait=settings.MODEL_QUEUE_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,98 @@
+import threading
+import time
+from typing import Optional
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from . import clinic_rollup
+from ..database import SessionLocal
+from ..models.chat_message import ChatBackfill, ChatMessage
+from ..models.patient import Patient
+from ..models.patient_note import PatientNote
+from ..models.search_index import SearchDocument
+from ..models.therapy_session import TherapySession
+
+# Los pacientes con muchas sesiones se borran en dos pasos: DELETE /patients/{id} solo marca
+# deleted_at (el paciente deja de verse enseguida) y este purge borra sus filas en lotes de
+# PATIENT_PURGE_BATCH_SIZE, un commit por lote, para no mantener locks largos. Si el proceso
+# se corta, el purge siguiente retoma los pacientes que siguen marcados.
+
+# Tablas hijas con id propio; chat_backfills (una fila por paciente) se va con la cascada final
+_CHILD_TABLES = [TherapySession.__table__, PatientNote.__table__, ChatMessage.__table__, SearchDocument.__table__]
+
+_run_lock = threading.Lock()
+# Se marca en cada llamado; el purge en curso lo revisa despues de soltar el lock para no
+# perder un paciente borrado entre su ultima consulta y el release
+_pending = threading.Event()
+
+def count_rows(db: Session, patient_id: int) -> int:
+    """Rows that deleting the patient would remove, across every child table"""
+    return sum(
+        db.execute(select(func.count()).select_from(child).where(child.c.patient_id == patient_id)).scalar()
+        for child in _CHILD_TABLES
+    )
+
+def purge_patient(db: Session, patient_id: int, batch_size: int, delay_seconds: float) -> int:
+    """Delete a soft-deleted patient and everything that references it; returns the rows deleted"""
+    deleted = 0
+    for child in _CHILD_TABLES:
+        while True:
+            ids = db.execute(select(child.c.id).where(child.c.patient_id == patient_id).limit(batch_size)).scalars().all()
+            if child is TherapySession.__table__:
+                # Se descuentan de los totales por clinica en la misma transaccion
+                clinic_rollup.remove_sessions(db, ids)
+            rowcount = db.execute(delete(child).where(child.c.id.in_(ids))).rowcount if ids else 0
+            db.commit()
+            deleted += rowcount
+            if rowcount < batch_size:
+                break
+            if delay_seconds:
+                time.sleep(delay_seconds)
+    db.execute(delete(ChatBackfill.__table__).where(ChatBackfill.patient_id == patient_id))
+    # Solo si sigue marcado como borrado
+    deleted += db.execute(
+        delete(Patient.__table__).where(Patient.id == patient_id, Patient.deleted_at.isnot(None))
+    ).rowcount
+    db.commit()
+    return deleted
+
+def _purge_all(batch_size: int, delay_seconds: float) -> int:
+    db = SessionLocal()
+    purged = 0
+    try:
+        while True:
+            patient_id = db.execute(
+                select(Patient.id).where(Patient.deleted_at.isnot(None)).order_by(Patient.deleted_at).limit(1)
+            ).scalar()
+            if patient_id is None:
+                return purged
+            rows = purge_patient(db, patient_id, batch_size, delay_seconds)
+            purged += 1
+            print(f"[PatientPurge] Purged patient {patient_id} ({rows} rows)")
+    except Exception as e:
+        # Se reintenta en el proximo borrado o al reiniciar
+        db.rollback()
+        print(f"[PatientPurge] Purge stopped: {e}")
+        return purged
+    finally:
+        db.close()
+
+def run_purge(batch_size: Optional[int] = None, delay_seconds: Optional[float] = None) -> int:
+    """
+    Purge every soft-deleted patient, including those deleted while it runs.
+    Returns the number of patients purged by this call; if a purge is already running
+    in this process it returns 0 and the running purge picks up the new patients.
+    """
+    batch_size = batch_size or settings.PATIENT_PURGE_BATCH_SIZE
+    delay_seconds = settings.PATIENT_PURGE_BATCH_DELAY_SECONDS if delay_seconds is None else delay_seconds
+    _pending.set()
+    purged = 0
+    while _pending.is_set():
+        if not _run_lock.acquire(blocking=False):
+            return purged
+        try:
+            _pending.clear()
+            purged += _purge_all(batch_size, delay_seconds)
+        finally:
+            _run_lock.release()
+    return purged
@@ -0,0 +1,189 @@
+import hashlib
+import hmac
+import json
+from datetime import date
+from typing import Dict, Iterator, List, Optional
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.patient import Patient
+from ..models.therapy_session import TherapySession
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # Esta en requirements.txt; si falta en un despliegue solo se pierde la exportacion (501)
+    pa = pq = None
+
+# Exportacion para investigacion, en formato columnar (Parquet o Arrow IPC):
+#   sessions: una fila por sesion con sus agregados (segundos por emocion, dominante, cambios)
+#   timeline: una fila por segundo analizado (session, offset, emotion code)
+# Sin nombres, observaciones ni ids reales: clinica, paciente y sesion van como seudonimos
+# HMAC estables (las dos tablas se pueden unir por session) y la fecha solo con el dia.
+# Las sesiones se leen con un cursor del lado del servidor y se escriben en row groups de
+# EXPORT_ROW_GROUP_ROWS filas a medida que se envian, asi la memoria no depende del total.
+
+TABLES = ("sessions", "timeline")
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+# Codigo de cada emocion (su posicion); cualquier otra se exporta como OTHER_CODE.
+# La lista va en los metadatos de cada archivo.
+EMOTIONS = ["angry", "disgust", "fear", "happy", "neutral", "sad", "surprise"]
+OTHER_CODE = -1
+_CODES = {emotion: i for i, emotion in enumerate(EMOTIONS)}
+
+_pseudonym_key = hashlib.sha256(
+    b"research-export:" + (settings.EXPORT_PSEUDONYM_KEY or settings.ENCRYPTION_KEY).encode()
+).digest()
+
+def pseudonym(kind: str, value: int) -> str:
+    return hmac.new(_pseudonym_key, f"{kind}:{value}".encode(), hashlib.sha256).hexdigest()[:16]
+
+def require_pyarrow():
+    if pa is None:
+        raise HTTPException(status_code=501, detail="Export requires pyarrow, which is not installed")
+
+def _timeline(results: str) -> List[tuple]:
+    try:
+        timeline = json.loads(results).get("timeline") or {}
+    except (ValueError, AttributeError):
+        return []
+    entries = []
+    for key, emotion in timeline.items():
+        try:
+            entries.append((float(key), emotion))
+        except (TypeError, ValueError):
+            continue
+    entries.sort()
+    return entries
+
+class _Columns:
+    """Column-oriented buffer of rows, flushed as one record batch"""
+
+    def __init__(self, names: List[str]):
+        self.names = names
+        self.clear()
+
+    def clear(self):
+        self.data: Dict[str, list] = {name: [] for name in self.names}
+        self.rows = 0
+
+def _session_batches(db: Session) -> Iterator[list]:
+    query = (
+        select(TherapySession.id, TherapySession.date, TherapySession.results, TherapySession.patient_id, Patient.user_id)
+        .join(Patient, Patient.id == TherapySession.patient_id)
+        .where(Patient.deleted_at.is_(None))
+        .order_by(TherapySession.id)
+        # yield_per usa un cursor del lado del servidor donde el driver lo soporta (psycopg2)
+        .execution_options(yield_per=settings.EXPORT_SESSION_BATCH_SIZE)
+    )
+    yield from db.execute(query).partitions()
+
+SESSION_COLUMNS = ["clinic", "patient", "session", "date", "seconds", "dominant", "changes"] + [f"seconds_{e}" for e in EMOTIONS] + ["seconds_other"]
+TIMELINE_COLUMNS = ["session", "offset", "emotion"]
+
+def _add_session(columns: _Columns, row):
+    session_id, session_date, results, patient_id, user_id = row
+    entries = _timeline(results)
+    counts: Dict[str, int] = {}
+    for _, emotion in entries:
+        counts[emotion] = counts.get(emotion, 0) + 1
+    data = columns.data
+    data["clinic"].append(pseudonym("clinic", user_id))
+    data["patient"].append(pseudonym("patient", patient_id))
+    data["session"].append(pseudonym("session", session_id))
+    data["date"].append(session_date.date() if session_date else None)
+    data["seconds"].append(len(entries))
+    data["dominant"].append(_CODES.get(max(sorted(counts), key=counts.get), OTHER_CODE) if counts else None)
+    data["changes"].append(sum(1 for a, b in zip(entries, entries[1:]) if a[1] != b[1]))
+    for emotion in EMOTIONS:
+        data[f"seconds_{emotion}"].append(counts.get(emotion, 0))
+    data["seconds_other"].append(sum(count for emotion, count in counts.items() if emotion not in EMOTIONS))
+    columns.rows += 1
+
+def _add_timeline(columns: _Columns, row):
+    session_id, results = row[0], row[2]
+    entries = _timeline(results)
+    session = pseudonym("session", session_id)
+    data = columns.data
+    data["session"].extend([session] * len(entries))
+    data["offset"].extend(offset for offset, _ in entries)
+    data["emotion"].extend(_CODES.get(emotion, OTHER_CODE) for _, emotion in entries)
+    columns.rows += len(entries)
+
+def iter_column_batches(db: Session, table: str, row_group_rows: Optional[int] = None) -> Iterator[Dict[str, list]]:
+    """Rows of the export table as column lists of about row_group_rows rows each"""
+    row_group_rows = row_group_rows or settings.EXPORT_ROW_GROUP_ROWS
+    columns = _Columns(SESSION_COLUMNS if table == "sessions" else TIMELINE_COLUMNS)
+    add = _add_session if table == "sessions" else _add_timeline
+    for batch in _session_batches(db):
+        for row in batch:
+            add(columns, row)
+            if columns.rows >= row_group_rows:
+                yield columns.data
+                columns.clear()
+    if columns.rows or table == "sessions":
+        yield columns.data
+
+def _schema(table: str):
+    if table == "sessions":
+        fields = [
+            ("clinic", pa.string()), ("patient", pa.string()), ("session", pa.string()), ("date", pa.date32()),
+            ("seconds", pa.int32()), ("dominant", pa.int16()), ("changes", pa.int32()),
+        ] + [(f"seconds_{e}", pa.int32()) for e in EMOTIONS] + [("seconds_other", pa.int32())]
+    else:
+        fields = [("session", pa.string()), ("offset", pa.float32()), ("emotion", pa.int16())]
+    # Los codigos de emocion quedan en los metadatos del archivo
+    return pa.schema(fields, metadata={"emotions": json.dumps(EMOTIONS), "other_code": str(OTHER_CODE)})
+
+class _Sink:
+    """Write target that hands the written bytes to the response as they are produced"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def stream_export(db: Session, table: str, fmt: str) -> Iterator[bytes]:
+    """Encode the export table as Parquet or an Arrow IPC stream, yielding bytes per row group"""
+    schema = _schema(table)
+    sink = _Sink()
+    output = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(output, schema, compression="zstd")
+        write = writer.write_table
+    else:
+        writer = pa.ipc.new_stream(output, schema)
+        write = writer.write_batch
+    try:
+        for data in iter_column_batches(db, table):
+            batch = pa.RecordBatch.from_pydict(data, schema=schema)
+            write(pa.Table.from_batches([batch]) if fmt == "parquet" else batch)
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.take()
+
+def export_filename(table: str, fmt: str) -> str:
+    return f"emotionai-{table}-{date.today().isoformat()}.{FORMATS[fmt][1]}"
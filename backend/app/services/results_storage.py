@@ -0,0 +1,40 @@
+from sqlalchemy import column, select, table, update
+from sqlalchemy.engine import Connection
+from ..core import results_codec
+from ..core.security import fernet
+
+# Conversion de las filas guardadas antes de results_codec (texto JSON encriptado) al formato
+# comprimido, y al reves para el downgrade. Cada fila se convierte sola y con un UPDATE
+# condicionado al token leido: se puede cortar y volver a correr, y no pisa escrituras nuevas.
+
+_sessions = table("therapy_sessions", column("id"), column("results"))
+
+def convert_results(connection: Connection, batch_size: int = 500, compress: bool = True) -> int:
+    """Re-encode every therapy_sessions.results in id-ordered batches; returns the rows converted"""
+    last_id = 0
+    converted = 0
+    while True:
+        rows = connection.execute(
+            select(_sessions).where(_sessions.c.id > last_id).order_by(_sessions.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            if not row.results:
+                continue
+            plaintext = fernet.decrypt(row.results.encode())
+            if results_codec.is_encoded(plaintext) == compress:
+                continue
+            if compress:
+                plaintext = results_codec.encode(plaintext.decode())
+            else:
+                plaintext = results_codec.decode(plaintext).encode()
+            result = connection.execute(
+                update(_sessions)
+                .where(_sessions.c.id == row.id, _sessions.c.results == row.results)
+                .values(results=fernet.encrypt(plaintext).decode())
+            )
+            converted += result.rowcount
+        last_id = rows[-1].id
+        print(f"[ResultsStorage] Converted {converted} rows up to id {last_id}")
+    return converted
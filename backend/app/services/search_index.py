@@ -0,0 +1,138 @@
+import hashlib
+import hmac
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.text import normalize_name
+from ..models.patient import Patient
+from ..models.patient_note import PatientNote
+from ..models.search_index import SearchDocument, SearchPosting
+from ..models.therapy_session import TherapySession
+
+# Los tokens se guardan como HMAC: sin la clave no se puede saber que palabras contiene una observacion
+_index_key = hashlib.sha256(
+    b"search-index:" + (settings.SEARCH_INDEX_KEY or settings.ENCRYPTION_KEY).encode()
+).digest()
+
+_WORD_RE = re.compile(r"\w+")
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los", "por", "que", "se", "su", "un", "una", "y",
+    "an", "and", "at", "in", "is", "of", "on", "or", "the", "to",
+}
+
+# Parametros de BM25
+_K1 = 1.2
+_B = 0.75
+
+def tokenize(text: str) -> List[str]:
+    return [
+        word for word in _WORD_RE.findall(normalize_name(text or ""))
+        if len(word) > 1 and word not in STOPWORDS
+    ]
+
+def hash_token(token: str) -> str:
+    return hmac.new(_index_key, token.encode(), hashlib.sha256).hexdigest()[:32]
+
+def remove_document(db: Session, doc_type: str, doc_id: int):
+    document_id = db.execute(
+        select(SearchDocument.id).where(SearchDocument.doc_type == doc_type, SearchDocument.doc_id == doc_id)
+    ).scalar()
+    if document_id is not None:
+        db.execute(delete(SearchPosting).where(SearchPosting.document_id == document_id))
+        db.execute(delete(SearchDocument).where(SearchDocument.id == document_id))
+
+def remove_patient_documents(db: Session, patient_id: int):
+    document_ids = select(SearchDocument.id).where(SearchDocument.patient_id == patient_id)
+    db.execute(delete(SearchPosting).where(SearchPosting.document_id.in_(document_ids)))
+    db.execute(delete(SearchDocument).where(SearchDocument.patient_id == patient_id))
+
+def index_document(db: Session, user_id: int, patient_id: int, doc_type: str, doc_id: int, text: Optional[str]):
+    """Replace the index entries of one document. Call inside the same transaction as the write."""
+    remove_document(db, doc_type, doc_id)
+    tokens = tokenize(text)
+    if not tokens:
+        return
+    document = SearchDocument(user_id=user_id, patient_id=patient_id, doc_type=doc_type, doc_id=doc_id, length=len(tokens))
+    db.add(document)
+    db.flush()
+    db.add_all([
+        SearchPosting(document_id=document.id, user_id=user_id, token=hash_token(token), frequency=count)
+        for token, count in Counter(tokens).items()
+    ])
+
+def rebuild_index(db: Session, user_id: Optional[int] = None) -> int:
+    """Index every note and session observation again (e.g. after changing SEARCH_INDEX_KEY)"""
+    patients = db.query(Patient.id, Patient.user_id).filter(Patient.deleted_at.is_(None))
+    if user_id is not None:
+        patients = patients.filter(Patient.user_id == user_id)
+    indexed = 0
+    # Un commit por paciente para no mantener una transaccion larga
+    for patient_id, owner_id in patients.all():
+        for note in db.query(PatientNote).filter(PatientNote.patient_id == patient_id):
+            index_document(db, owner_id, patient_id, "note", note.id, note.text)
+            indexed += 1
+        for session in db.query(TherapySession).filter(TherapySession.patient_id == patient_id, TherapySession.observations.isnot(None)):
+            index_document(db, owner_id, patient_id, "session", session.id, session.observations)
+            indexed += 1
+        db.commit()
+    return indexed
+
+def search(db: Session, user_id: int, query: str, limit: int = 20, offset: int = 0) -> Dict:
+    """
+    Documents of this user's live patients containing every query term, ranked with BM25.
+    Returns {"total": n, "hits": [(document, score), ...]} for the requested page.
+    Matching, scoring and paging run in the database; only the page is loaded.
+    """
+    terms = {hash_token(token) for token in tokenize(query)}
+    if not terms:
+        return {"total": 0, "hits": []}
+
+    # Estadisticas del corpus de la clinica: frecuencia de documento de cada termino, cantidad y largo medio
+    document_frequency = dict(db.execute(
+        select(SearchPosting.token, func.count())
+        .where(SearchPosting.user_id == user_id, SearchPosting.token.in_(terms))
+        .group_by(SearchPosting.token)
+    ).all())
+    if len(document_frequency) < len(terms):
+        return {"total": 0, "hits": []}
+    total_documents, average_length = db.execute(
+        select(func.count(SearchDocument.id), func.avg(SearchDocument.length)).where(SearchDocument.user_id == user_id)
+    ).one()
+    average_length = float(average_length or 1)
+    idf = {
+        token: math.log(1 + (total_documents - frequency + 0.5) / (frequency + 0.5))
+        for token, frequency in document_frequency.items()
+    }
+
+    frequency = SearchPosting.frequency
+    norm = frequency + _K1 * (1 - _B + _B * SearchDocument.length / average_length)
+    score = func.sum(case(idf, value=SearchPosting.token, else_=0.0) * frequency * (_K1 + 1) / norm).label("score")
+    # Interseccion: un documento coincide si tiene todos los terminos. La ventana cuenta
+    # las coincidencias antes de LIMIT, asi total y pagina salen de la misma consulta
+    matches = (
+        select(SearchDocument, score, func.count().over().label("total"))
+        .join(SearchPosting, SearchPosting.document_id == SearchDocument.id)
+        .join(Patient, Patient.id == SearchDocument.patient_id)
+        .where(
+            SearchPosting.user_id == user_id,
+            SearchPosting.token.in_(terms),
+            SearchDocument.user_id == user_id,
+            Patient.user_id == user_id,
+            Patient.deleted_at.is_(None),
+        )
+        .group_by(SearchDocument.id)
+        .having(func.count(func.distinct(SearchPosting.token)) == len(terms))
+    )
+    rows = db.execute(matches.order_by(score.desc(), SearchDocument.doc_id.desc()).limit(limit).offset(offset)).all()
+    if rows:
+        total = rows[0].total
+    elif offset:
+        # Pagina despues de la ultima: el total se cuenta aparte
+        total = db.execute(select(func.count()).select_from(matches.subquery())).scalar()
+    else:
+        total = 0
+    return {"total": total, "hits": [(document, float(score)) for document, score, _ in rows]}
@@ -0,0 +1,156 @@
+import contextvars
+import csv
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from ..core.config import settings
+from ..core import tracing
+from .api_client import analyze_video
+from .video_preprocessing import ffmpeg_available
+
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+def probe_duration(file_path: str) -> Optional[float]:
+    """Read the container duration from ffmpeg's banner. Returns None if unknown."""
+    try:
+        proc = subprocess.run(
+            [settings.FFMPEG_BINARY, "-hide_banner", "-i", file_path],
+            capture_output=True, timeout=30
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    match = _DURATION_RE.search(proc.stderr.decode(errors="ignore"))
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def split_video(file_path: str, segment_seconds: int, output_dir: str) -> List[Tuple[str, float]]:
+    """
+    Split a video into ~segment_seconds pieces without re-encoding.
+    Cuts land on keyframes, so the real start offset of each piece is read back
+    from ffmpeg's segment list instead of assuming i * segment_seconds.
+    """
+    list_path = os.path.join(output_dir, "segments.csv")
+    command = [
+        settings.FFMPEG_BINARY,
+        "-y",
+        "-loglevel", "error",
+        "-i", file_path,
+        "-map", "0:v",
+        "-c", "copy",
+        "-f", "segment",
+        "-segment_time", str(segment_seconds),
+        "-reset_timestamps", "1",
+        "-segment_list", list_path,
+        "-segment_list_type", "csv",
+        os.path.join(output_dir, "segment_%04d.mp4"),
+    ]
+    subprocess.run(command, check=True, capture_output=True, timeout=settings.VIDEO_PREPROCESS_TIMEOUT)
+    segments = []
+    with open(list_path, newline="") as f:
+        for row in csv.reader(f):
+            if row:
+                segments.append((os.path.join(output_dir, row[0]), float(row[1])))
+    return segments
+
+def _shift_timestamp(key: str, offset: float) -> str:
+    try:
+        value = round(float(key) + offset, 3)
+    except ValueError:
+        return key
+    # El modelo devuelve segundos enteros; conservar ese formato cuando el resultado es entero.
+    # Los cortes caen en keyframes (offsets como 59.96): esa fraccion se conserva, porque
+    # redondear haria chocar la primera clave de un segmento con la ultima del anterior
+    if value.is_integer():
+        return str(int(value))
+    return f"{value:.3f}".rstrip("0")
+
+def merge_results(parts: List[Tuple[float, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Merge model results of consecutive pieces of one recording.
+    Each part is (start offset in seconds, result); timeline keys are shifted by the offset
+    and emotion_summary counts are added up.
+    """
+    merged: Dict[str, Any] = {}
+    summary: Dict[str, int] = {}
+    timeline: Dict[str, str] = {}
+    for offset, result in sorted(parts, key=lambda part: part[0]):
+        for key, value in result.items():
+            if key not in ("emotion_summary", "timeline"):
+                merged.setdefault(key, value)
+        for emotion, count in (result.get("emotion_summary") or {}).items():
+            summary[emotion] = summary.get(emotion, 0) + count
+        for key, emotion in (result.get("timeline") or {}).items():
+            timeline[_shift_timestamp(key, offset)] = emotion
+    merged["emotion_summary"] = summary
+    merged["timeline"] = timeline
+    return merged
+
+def _analyze_segment(path: str, tenant=None) -> Dict[str, Any]:
+    attempts = settings.VIDEO_SEGMENT_RETRIES + 1
+    for attempt in range(1, attempts + 1):
+        try:
+            return analyze_video(path, tenant)
+        except HTTPException as e:
+            # Solo reintentar errores del modelo/red, no errores del cliente
+            if e.status_code < 500 or attempt == attempts:
+                raise
+            print(f"[Segments] {os.path.basename(path)} failed ({e.detail}), retry {attempt}/{attempts - 1}")
+            time.sleep(attempt)
+
+def analyze_video_segmented(
+    file_path: str,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    tenant=None
+) -> Dict[str, Any]:
+    """
+    Analyze a video, splitting long recordings into VIDEO_SEGMENT_SECONDS pieces that are
+    sent to the model concurrently (up to VIDEO_SEGMENT_FANOUT at a time) and merged back
+    into a single result. Short videos, or setups without ffmpeg, use a single model call.
+    on_progress(done, total) is called as each segment finishes; tenant is passed to the model scheduler.
+    """
+    segment_seconds = settings.VIDEO_SEGMENT_SECONDS
+    if segment_seconds <= 0 or not ffmpeg_available():
+        return analyze_video(file_path, tenant)
+    duration = probe_duration(file_path)
+    if duration is None or duration <= segment_seconds * 1.5:
+        return analyze_video(file_path, tenant)
+
+    output_dir = tempfile.mkdtemp(prefix="segments_", dir=os.path.dirname(os.path.abspath(file_path)))
+    try:
+        try:
+            with tracing.span("video.split"):
+                segments = split_video(file_path, segment_seconds, output_dir)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+            print(f"[Segments] Could not split video, analyzing it whole: {e}")
+            return analyze_video(file_path, tenant)
+        if len(segments) <= 1:
+            return analyze_video(file_path, tenant)
+
+        started = time.perf_counter()
+        fanout = max(1, settings.VIDEO_SEGMENT_FANOUT)
+        results: List[Dict[str, Any]] = [None] * len(segments)
+        with ThreadPoolExecutor(max_workers=fanout) as executor:
+            # Copiar el contexto para que las llamadas de cada thread queden en la traza del pedido
+            futures = {
+                executor.submit(contextvars.copy_context().run, _analyze_segment, path, tenant): i
+                for i, (path, _) in enumerate(segments)
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                results[futures[future]] = future.result()
+                if on_progress:
+                    on_progress(done, len(segments))
+        print(
+            f"[Segments] {len(segments)} segments of {duration:.0f}s video analyzed "
+            f"in {time.perf_counter() - started:.2f}s with fan-out {fanout}"
+        )
+        return merge_results([(offset, result) for (_, offset), result in zip(segments, results)])
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
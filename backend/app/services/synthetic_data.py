@@ -0,0 +1,165 @@
+from sqlalchemy.orm import Session
+from ..models.user import User
+from ..models.patient import Patient
+from ..models.therapy_session import TherapySession
+from ..core.auth import get_password_hash
+from ..core.text import normalize_name
+from . import search_index
+import json
+import random
+from datetime import datetime, timedelta
+
+# Datos sinteticos para los tests, los benchmarks y scripts/seed_data.py
+
+EMOTIONS = ["neutral", "happy", "sad", "fear", "disgust"]
+# Peso relativo de cada emocion; en sesiones reales domina "neutral"
+EMOTION_WEIGHTS = [0.5, 0.2, 0.15, 0.1, 0.05]
+
+FIRST_NAMES = ["Juan", "María", "Lucía", "Martín", "Sofía", "Mateo", "Valentina", "José", "Camila", "Tomás"]
+LAST_NAMES = ["Pérez", "García", "López", "Martínez", "Rodríguez", "Gómez", "Fernández", "Díaz", "Álvarez", "Romero"]
+OBSERVATIONS = [
+    None,
+    "Sesión tranquila",
+    "Paciente ansioso al inicio",
+    "Refiere un ataque de pánico durante la semana",
+    "Habla de problemas para dormir y ansiedad",
+]
+
+def generate_session_results(rng: random.Random, seconds: int) -> dict:
+    """Build a model-shaped result: a second-by-second timeline with emotions in runs, plus its summary"""
+    timeline = {}
+    emotion = rng.choices(EMOTIONS, EMOTION_WEIGHTS)[0]
+    for second in range(seconds):
+        if rng.random() < 0.1:
+            emotion = rng.choices(EMOTIONS, EMOTION_WEIGHTS)[0]
+        timeline[str(second)] = emotion
+    summary = {emotion: 0 for emotion in EMOTIONS}
+    for emotion in timeline.values():
+        summary[emotion] += 1
+    return {"emotion_summary": summary, "timeline": timeline}
+
+def generate_synthetic_data(
+    db: Session,
+    clinics: int = 2,
+    patients_per_clinic: int = 20,
+    sessions_per_patient: int = 10,
+    session_seconds: int = 600,
+    seed: int = 0,
+    password: str = "testpassword123",
+):
+    """
+    Create clinics x patients x sessions with realistic results.
+    Everything goes through the ORM, so names, observations and results are
+    encrypted by the real EncryptedString/EncryptedText columns.
+    Returns the created clinic users.
+    """
+    rng = random.Random(seed)
+    hashed_password = get_password_hash(password)
+    now = datetime.utcnow()
+    users = []
+    for c in range(clinics):
+        user = User(
+            name=f"Clinic {seed}-{c}",
+            email=f"clinic{seed}-{c}@example.com",
+            hashed_password=hashed_password,
+            role="clinic"
+        )
+        db.add(user)
+        db.flush()
+        users.append(user)
+
+        for p in range(patients_per_clinic):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {p}"
+            patient = Patient(
+                name=name,
+                name_search=normalize_name(name),
+                age=rng.randint(18, 80),
+                observations=f"Paciente de prueba {p}",
+                user_id=user.id
+            )
+            db.add(patient)
+            db.flush()
+            sessions = []
+            for s in range(sessions_per_patient):
+                results = generate_session_results(rng, session_seconds)
+                sessions.append(TherapySession(
+                    patient_id=patient.id,
+                    date=now - timedelta(days=7 * (sessions_per_patient - s), minutes=rng.randint(0, 600)),
+                    results=json.dumps(results),
+                    observations=rng.choice(OBSERVATIONS)
+                ))
+            db.add_all(sessions)
+            db.flush()
+            for session in sessions:
+                if session.observations:
+                    search_index.index_document(db, user.id, patient.id, "session", session.id, session.observations)
+        # Un commit por clinica mantiene acotada la sesion de SQLAlchemy
+        db.commit()
+    return users
+
+def create_test_data(db: Session):
+    # Create a test clinic
+    clinic = User(
+        name="Test Clinic",
+        email="test@clinic.com",
+        hashed_password=get_password_hash("testpassword123"),
+        role="clinic"
+    )
+    db.add(clinic)
+    db.commit()
+    db.refresh(clinic)
+
+    # Create test patients
+    patients = [
+        Patient(
+            name="Juan Pérez",
+            name_search=normalize_name("Juan Pérez"),
+            age=25,
+            user_id=clinic.id
+        ),
+        Patient(
+            name="María García",
+            name_search=normalize_name("María García"),
+            age=30,
+            user_id=clinic.id
+        )
+    ]
+    for patient in patients:
+        db.add(patient)
+    db.commit()
+    for patient in patients:
+        db.refresh(patient)
+
+    # Create test therapy sessions with emotion data
+    # We'll create 3 sessions for each patient
+    for patient in patients:
+        for i in range(3):
+            # Different emotion patterns for each session
+            if i == 0:
+                emotions = ["happy", "happy", "neutral", "neutral"] * 2
+            elif i == 1:
+                emotions = ["sad", "fear", "disgust", "neutral"] * 2
+            else:
+                emotions = ["happy", "sad", "happy", "neutral"] * 2
+
+            timeline = {str(second): emotion for second, emotion in enumerate(emotions)}
+            summary = {}
+            for emotion in emotions:
+                summary[emotion] = summary.get(emotion, 0) + 1
+
+            session = TherapySession(
+                patient_id=patient.id,
+                date=datetime.utcnow() - timedelta(days=i*7),  # Sessions 1 week apart
+                results=json.dumps({
+                    "emotion_summary": summary,
+                    "timeline": timeline
+                })
+            )
+            db.add(session)
+
+    db.commit()
+
+    return {
+        "clinic": clinic,
+        "patients": patients
+    }
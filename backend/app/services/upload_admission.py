@@ -0,0 +1,205 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+from typing import Optional, Tuple
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+from ..core.config import settings
+
+# Control de admision para las subidas de video de un solo request (/video/analyze y
+# /patients/{id}/therapy-sessions/analyze). Cada subida reserva, antes de leer el cuerpo:
+#   - memoria: lo que el parser multipart guarda en RAM antes de pasar a disco, mas el buffer de copia
+#   - disco: el archivo temporal del parser y la copia en ./temp que se manda al modelo
+# Si la reserva no entra en el presupuesto del worker se rechaza con 429 y Retry-After;
+# si el disco tiene poco espacio libre, con 503. El tamaño maximo se controla mientras
+# llega el cuerpo, sin esperar a tenerlo completo.
+
+ADMITTED_PATHS = [
+    re.compile(r"^/video/analyze$"),
+    re.compile(r"^/patients/[^/]+/therapy-sessions/analyze$"),
+]
+
+# Lo que starlette guarda en memoria por archivo antes de pasarlo a disco
+MULTIPART_SPOOL_BYTES = 1024 * 1024
+
+class UploadBudget:
+    """In-flight upload bytes of this worker, checked against the memory and disk budgets"""
+
+    def __init__(self, memory_budget: int, disk_budget: int, min_free_disk: int, temp_dir: str):
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.min_free_disk = min_free_disk
+        self.temp_dir = temp_dir
+        self.memory_in_flight = 0
+        self.disk_in_flight = 0
+        self.uploads = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.too_large = 0
+        self._lock = threading.Lock()
+
+    def cost(self, size: int) -> Tuple[int, int]:
+        """(memory, disk) bytes reserved for an upload of size bytes"""
+        memory = min(size, MULTIPART_SPOOL_BYTES) + settings.UPLOAD_COPY_CHUNK_BYTES
+        disk = max(0, size - MULTIPART_SPOOL_BYTES) + size
+        return memory, disk
+
+    def _free_disk(self) -> Optional[int]:
+        try:
+            os.makedirs(self.temp_dir, exist_ok=True)
+            return shutil.disk_usage(self.temp_dir).free
+        except OSError:
+            return None
+
+    def acquire(self, size: int) -> Tuple[int, int]:
+        """Reserve the budget for an upload, or raise 429/503 with Retry-After"""
+        memory, disk = self.cost(size)
+        free_disk = self._free_disk()
+        with self._lock:
+            if free_disk is not None and free_disk - self.disk_in_flight - disk < self.min_free_disk:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Not enough disk space for the upload, try again later",
+                    headers={"Retry-After": str(settings.UPLOAD_RETRY_AFTER_SECONDS)},
+                )
+            # Una subida sola siempre entra, aunque supere el presupuesto: si no, nunca se aceptaria
+            if self.uploads and (
+                self.memory_in_flight + memory > self.memory_budget or self.disk_in_flight + disk > self.disk_budget
+            ):
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many uploads in progress, try again later",
+                    headers={"Retry-After": str(settings.UPLOAD_RETRY_AFTER_SECONDS)},
+                )
+            self.memory_in_flight += memory
+            self.disk_in_flight += disk
+            self.uploads += 1
+            self.admitted += 1
+        return memory, disk
+
+    def release(self, reservation: Tuple[int, int]):
+        memory, disk = reservation
+        with self._lock:
+            self.memory_in_flight -= memory
+            self.disk_in_flight -= disk
+            self.uploads -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "uploads_in_flight": self.uploads,
+                "memory_in_flight": self.memory_in_flight,
+                "memory_budget": self.memory_budget,
+                "disk_in_flight": self.disk_in_flight,
+                "disk_budget": self.disk_budget,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "too_large": self.too_large,
+            }
+
+budget = UploadBudget(
+    memory_budget=settings.UPLOAD_MEMORY_BUDGET_BYTES,
+    disk_budget=settings.UPLOAD_DISK_BUDGET_BYTES,
+    min_free_disk=settings.UPLOAD_MIN_FREE_DISK_BYTES,
+    temp_dir="./temp",
+)
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Upload larger than {settings.UPLOAD_MAX_BYTES} bytes")
+
+class UploadAdmissionMiddleware:
+    """
+    ASGI middleware for the ADMITTED_PATHS: admits the request against the upload budget
+    before its body is read and stops reading once it passes UPLOAD_MAX_BYTES.
+    """
+
+    def __init__(self, app, upload_budget: Optional[UploadBudget] = None):
+        self.app = app
+        self.budget = upload_budget or budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not any(p.match(scope["path"]) for p in ADMITTED_PATHS):
+            await self.app(scope, receive, send)
+            return
+        max_bytes = settings.UPLOAD_MAX_BYTES
+        content_length = None
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    pass
+        try:
+            if content_length is not None and content_length > max_bytes:
+                self.budget.too_large += 1
+                raise _too_large()
+            # Sin Content-Length (chunked) se reserva el maximo
+            reservation = self.budget.acquire(content_length if content_length is not None else max_bytes)
+        except HTTPException as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+        too_large = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            if too_large:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    too_large = True
+                    self.budget.too_large += 1
+                    # Para la app es como si el cliente se hubiera ido: deja de leer y de escribir a disco
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if too_large:
+                # La respuesta es el 413
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not too_large:
+                raise
+        finally:
+            self.budget.release(reservation)
+        if too_large and not started:
+            error = _too_large()
+            await JSONResponse({"detail": error.detail}, status_code=error.status_code)(scope, receive, send)
+
+async def save_upload(file: UploadFile, temp_dir: str, digest=None) -> str:
+    """
+    Copy an upload to a new unique file in temp_dir in UPLOAD_COPY_CHUNK_BYTES pieces and
+    return its path. digest (a hashlib object), if given, is updated with the content.
+    """
+    os.makedirs(temp_dir, exist_ok=True)
+    # Nombre unico: dos subidas del mismo archivo no pueden pisarse el temporal
+    fd, path = tempfile.mkstemp(dir=temp_dir, suffix=os.path.splitext(file.filename or "")[1])
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            while True:
+                chunk = await file.read(settings.UPLOAD_COPY_CHUNK_BYTES)
+                if not chunk:
+                    break
+                if digest is not None:
+                    digest.update(chunk)
+                temp_file.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
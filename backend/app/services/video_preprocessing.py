@@ -0,0 +1,55 @@
+import os
+import shutil
+import subprocess
+import uuid
+from ..core.config import settings
+
+def ffmpeg_available() -> bool:
+    return shutil.which(settings.FFMPEG_BINARY) is not None
+
+def preprocess_video(file_path: str) -> str:
+    """
+    Resample a video to the configured fps and max height before sending it to the model.
+    Returns the path of the new file, or the original path if ffmpeg is missing or fails.
+    The caller is responsible for removing the new file.
+    """
+    if not ffmpeg_available():
+        print(f"[Preprocess] {settings.FFMPEG_BINARY} not found, sending original video")
+        return file_path
+
+    base, _ = os.path.splitext(file_path)
+    output_path = f"{base}.{uuid.uuid4().hex[:8]}.small.mp4"
+    command = [
+        settings.FFMPEG_BINARY,
+        "-y",
+        "-loglevel", "error",
+        "-i", file_path,
+        # Bajar fps y resolucion; nunca escalar hacia arriba
+        "-vf", f"fps={settings.VIDEO_PREPROCESS_FPS},scale=-2:'min({settings.VIDEO_PREPROCESS_MAX_HEIGHT},ih)'",
+        "-an",
+        "-c:v", "libx264",
+        "-preset", "veryfast",
+        "-crf", "28",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True, timeout=settings.VIDEO_PREPROCESS_TIMEOUT)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        # OSError: el binario existe pero no se puede ejecutar (permisos, formato, etc.)
+        stderr = getattr(e, "stderr", None) or b""
+        print(f"[Preprocess] ffmpeg failed, sending original video: {stderr.decode(errors='ignore').strip() or e}")
+        _discard(output_path)
+        return file_path
+
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        print("[Preprocess] ffmpeg produced no output, sending original video")
+        _discard(output_path)
+        return file_path
+    return output_path
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,99 @@
+import os
+
+# Settings se instancia al importar app.core.config; valores por defecto para correr los tests sin .env
+os.environ.setdefault("API_MODEL_URL", "http://localhost:8002")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("AGENT_API_URL", "http://localhost:8003")
+os.environ.setdefault("ENCRYPTION_KEY", "ZmDfcTF7_60GrrY167zsiPd67pEvs0aGOv2oasOM1Pg=")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.database import Base, enable_foreign_keys, get_db as database_get_db
+from app.routes.deps import get_db, get_read_db
+from app.core.auth import create_access_token
+from app.services.synthetic_data import generate_synthetic_data
+
+def _memory_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    enable_foreign_keys(engine)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+def _override_db(session_factory):
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[database_get_db] = override_get_db
+
+def _auth_headers(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+
+@pytest.fixture(scope="session")
+def engine():
+    return _memory_engine()
+
+@pytest.fixture(scope="session")
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="session")
+def seeded_clinics(session_factory):
+    """2 clinics x 20 patients x 10 sessions of 10 minutes each"""
+    db = session_factory()
+    try:
+        users = generate_synthetic_data(db, clinics=2, patients_per_clinic=20, sessions_per_patient=10)
+        return [(user.id, [patient.id for patient in user.patients]) for user in users]
+    finally:
+        db.close()
+
+@pytest.fixture(scope="session")
+def client(session_factory):
+    _override_db(session_factory)
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.clear()
+
+@pytest.fixture(scope="session")
+def clinic(seeded_clinics):
+    """(auth headers, patient ids) of the first seeded clinic"""
+    user_id, patient_ids = seeded_clinics[0]
+    return _auth_headers(user_id), patient_ids
+
+@pytest.fixture
+def scratch_db(client, session_factory):
+    """
+    (engine, session factory, clinics) of a fresh database with 2 clinics x 3 patients x 2 sessions
+    that the client uses for one test. For tests that write: the seeded data stays as generated.
+    """
+    engine = _memory_engine()
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    try:
+        users = generate_synthetic_data(db, clinics=2, patients_per_clinic=3, sessions_per_patient=2, session_seconds=60)
+        clinics = [(user.id, [patient.id for patient in user.patients]) for user in users]
+    finally:
+        db.close()
+    _override_db(factory)
+    try:
+        yield engine, factory, clinics
+    finally:
+        _override_db(session_factory)
+        engine.dispose()
+
+@pytest.fixture
+def scratch_clinic(scratch_db):
+    """(auth headers, patient ids) of the first clinic of scratch_db"""
+    user_id, patient_ids = scratch_db[2][0]
+    return _auth_headers(user_id), patient_ids
@@ -0,0 +1,61 @@
+import json
+import pytest
+from sqlalchemy import text
+from app.core import results_codec
+from app.core.security import decrypt_data
+
+pytest.importorskip("pytest_benchmark")
+
+def test_patient_emotion_summary(benchmark, client, clinic):
+    headers, patient_ids = clinic
+    response = benchmark(client.get, f"/analytics/patient/{patient_ids[0]}/emotions/summary", headers=headers)
+    assert response.status_code == 200
+    assert sum(item["count"] for item in response.json()) == 10 * 600
+
+def test_patient_emotions_by_session(benchmark, client, clinic):
+    headers, patient_ids = clinic
+    response = benchmark(client.get, f"/analytics/patient/{patient_ids[0]}/emotions/by-session", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 10
+
+def test_patient_last_dominant_emotion(benchmark, client, clinic):
+    headers, patient_ids = clinic
+    response = benchmark(client.get, f"/analytics/patient/{patient_ids[0]}/emotions/last-dominant", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["dominant_emotion"] is not None
+
+def test_decrypt_session_results(benchmark, client, clinic, session_factory):
+    headers, patient_ids = clinic
+    db = session_factory()
+    try:
+        token = db.execute(text("SELECT results FROM therapy_sessions WHERE patient_id = :p LIMIT 1"), {"p": patient_ids[0]}).scalar()
+    finally:
+        db.close()
+    results = benchmark(decrypt_data, token, decode=results_codec.decode)
+    assert len(json.loads(results)["timeline"]) == 600
+
+def test_list_patients(benchmark, client, clinic):
+    headers, patient_ids = clinic
+    response = benchmark(client.get, "/patients/", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == len(patient_ids)
+
+def test_search_patients_by_name(benchmark, client, clinic):
+    headers, _ = clinic
+    last_name = client.get("/patients/", headers=headers).json()[0]["name"].split()[1]
+    response = benchmark(client.get, "/patients/", params={"name": last_name}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()
+    assert all(last_name in patient["name"] for patient in response.json())
+
+def test_list_therapy_sessions(benchmark, client, clinic):
+    headers, patient_ids = clinic
+    response = benchmark(client.get, f"/patients/{patient_ids[0]}/therapy-sessions/", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 10
+
+def test_search_notes_and_observations(benchmark, client, clinic):
+    headers, _ = clinic
+    response = benchmark(client.get, "/search/", params={"q": "ataque de panico"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["total"] > 0
@@ -0,0 +1,54 @@
+import json
+from datetime import datetime
+from sqlalchemy import event
+from app.core.config import settings
+from app.models.therapy_session import TherapySession
+
+def test_bulk_create_reports_status_per_item(client, scratch_db, scratch_clinic, monkeypatch):
+    engine, session_factory, clinics = scratch_db
+    headers, patient_ids = scratch_clinic
+    other_patient = clinics[1][1][0]
+    results = json.dumps({"emotion_summary": {"happy": 3}, "timeline": {"0": "happy", "1": "happy", "2": "happy"}})
+    sessions = [
+        {"patient_id": patient_ids[i % 3], "date": f"2025-0{1 + i % 9}-01T10:00:00", "results": results} for i in range(7)
+    ]
+    sessions.insert(2, {"patient_id": other_patient, "date": "2025-01-01T10:00:00", "results": results})
+    sessions.insert(4, {"patient_id": patient_ids[0], "date": "2025-01-01T10:00:00", "results": "not json"})
+    monkeypatch.setattr(settings, "BULK_SESSIONS_BATCH_SIZE", 3)
+
+    commits = []
+    def count(conn):
+        commits.append(1)
+    event.listen(engine, "commit", count)
+    try:
+        response = client.post("/therapy-sessions/bulk", json={"sessions": sessions}, headers=headers)
+    finally:
+        event.remove(engine, "commit", count)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (7, 2)
+    statuses = [r["status"] for r in body["results"]]
+    assert statuses[2] == "not_found" and statuses[4] == "invalid"
+    assert [r["index"] for r in body["results"]] == list(range(9))
+    # 7 sesiones en lotes de 3: una transaccion por lote, no por sesion
+    assert len(commits) == 3
+
+    db = session_factory()
+    try:
+        for item, result in zip(sessions, body["results"]):
+            if result["status"] != "created":
+                continue
+            stored = db.get(TherapySession, result["id"])
+            assert stored.patient_id == item["patient_id"]
+            assert stored.results == results
+            assert stored.date == datetime.fromisoformat(item["date"])
+    finally:
+        db.close()
+
+def test_bulk_create_rejects_oversized_requests(client, clinic, monkeypatch):
+    headers, patient_ids = clinic
+    monkeypatch.setattr(settings, "BULK_SESSIONS_MAX_ITEMS", 2)
+    item = {"patient_id": patient_ids[0], "date": "2025-01-01T10:00:00", "results": "{}"}
+    response = client.post("/therapy-sessions/bulk", json={"sessions": [item] * 3}, headers=headers)
+    assert response.status_code == 413
@@ -0,0 +1,80 @@
+from app.services.agent_service import agent_service
+
+def test_chat_history_is_backfilled_once_then_read_incrementally(client, clinic, monkeypatch):
+    headers, patient_ids = clinic
+    patient_id = patient_ids[3]
+    remote_calls = []
+
+    async def fake_history(patient_id, session_ids=None):
+        remote_calls.append(patient_id)
+        return {"messages": [
+            {"role": "user", "content": f"Pregunta {i}", "timestamp": f"2026-01-01T10:0{i}:00Z"} for i in range(5)
+        ]}
+
+    async def fake_send(message, therapist_id, patient_id, emotion_data):
+        return {"recommendations": f"Respuesta a {message}"}
+
+    monkeypatch.setattr(agent_service, "get_chat_history", fake_history)
+    monkeypatch.setattr(agent_service, "send_message", fake_send)
+
+    latest = client.get(f"/chat/{patient_id}?limit=3", headers=headers).json()
+    assert [m["content"] for m in latest["messages"]] == ["Pregunta 2", "Pregunta 3", "Pregunta 4"]
+    assert latest["has_more"] is True
+
+    older = client.get(f"/chat/{patient_id}?before_id={latest['messages'][0]['id']}", headers=headers).json()
+    assert [m["content"] for m in older["messages"]] == ["Pregunta 0", "Pregunta 1"]
+
+    session_id = client.get(f"/patients/{patient_id}/therapy-sessions/", headers=headers).json()[0]["id"]
+    response = client.post("/chat", json={"message": "Hola", "patient_id": patient_id, "session_ids": [str(session_id)]}, headers=headers)
+    assert response.json() == {"recommendations": "Respuesta a Hola"}
+
+    newer = client.get(f"/chat/{patient_id}?since_id={latest['last_id']}", headers=headers).json()
+    assert [(m["role"], m["content"]) for m in newer["messages"]] == [("user", "Hola"), ("agent", "Respuesta a Hola")]
+    assert client.get(f"/chat/{patient_id}?since_id={newer['last_id']}", headers=headers).json()["messages"] == []
+
+    by_session = client.get(f"/chat/{patient_id}?session_ids={session_id}", headers=headers).json()
+    assert len(by_session["messages"]) == 2
+    assert remote_calls == [patient_id]
+
+def test_chat_rejects_other_clinics_patient(client, clinic, seeded_clinics):
+    headers, _ = clinic
+    other_patient = seeded_clinics[1][1][0]
+    assert client.get(f"/chat/{other_patient}", headers=headers).status_code == 403
+    assert client.post("/chat", json={"message": "Hola", "patient_id": other_patient}, headers=headers).status_code == 403
+
+def test_backfill_keeps_local_message_ids(client, scratch_clinic, monkeypatch):
+    headers, patient_ids = scratch_clinic
+    patient_id = patient_ids[0]
+
+    async def agent_down(patient_id, session_ids=None):
+        raise ConnectionError("agent unreachable")
+
+    async def fake_send(message, therapist_id, patient_id, emotion_data):
+        return {"recommendations": f"Respuesta a {message}"}
+
+    monkeypatch.setattr(agent_service, "get_chat_history", agent_down)
+    monkeypatch.setattr(agent_service, "send_message", fake_send)
+    assert client.post("/chat", json={"message": "Hola", "patient_id": patient_id}, headers=headers).status_code == 200
+    # Con el agente caido se sirven los mensajes locales; el cliente se queda con sus ids
+    local = client.get(f"/chat/{patient_id}", headers=headers).json()
+    assert [m["content"] for m in local["messages"]] == ["Hola", "Respuesta a Hola"]
+
+    async def fake_history(patient_id, session_ids=None):
+        # El agente tiene la historia vieja y tambien los dos mensajes nuevos
+        return {"messages": [
+            {"role": "user", "content": "Pregunta vieja", "timestamp": "2026-01-01T10:00:00Z"},
+            {"role": "agent", "content": "Respuesta vieja", "timestamp": "2026-01-01T10:01:00Z"},
+            {"role": "user", "content": "Hola"},
+            {"role": "agent", "content": "Respuesta a Hola"},
+        ]}
+
+    monkeypatch.setattr(agent_service, "get_chat_history", fake_history)
+    everything = client.get(f"/chat/{patient_id}", headers=headers).json()["messages"]
+    assert sorted(m["content"] for m in everything) == ["Hola", "Pregunta vieja", "Respuesta a Hola", "Respuesta vieja"]
+    local_ids = {m["id"]: m["content"] for m in local["messages"]}
+    assert {m["id"]: m["content"] for m in everything if m["id"] in local_ids} == local_ids
+
+    # El cursor que ya tenia el cliente sigue valiendo: solo llega lo que no tenia
+    newer = client.get(f"/chat/{patient_id}?since_id={local['last_id']}", headers=headers).json()["messages"]
+    assert [m["content"] for m in newer] == ["Pregunta vieja", "Respuesta vieja"]
+
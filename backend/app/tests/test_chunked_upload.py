@@ -0,0 +1,117 @@
+import hashlib
+import os
+import time
+import pytest
+from app.core.config import settings
+from app.routes import therapy_session
+from app.services import chunked_upload
+
+VIDEO = bytes(range(256)) * 40
+
+@pytest.fixture
+def upload_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+def _url(patient_id: int, upload_id: str = "") -> str:
+    return f"/patients/{patient_id}/therapy-sessions/uploads/{upload_id}"
+
+def _create(client, headers, patient_id: int, **body) -> dict:
+    body = {"filename": "clip.mp4", "size": len(VIDEO), "sha256": hashlib.sha256(VIDEO).hexdigest(), **body}
+    response = client.post(_url(patient_id), json=body, headers=headers)
+    assert response.status_code == 201
+    return response.json()
+
+def _put(client, headers, patient_id: int, upload_id: str, start: int, end: int):
+    chunk = VIDEO[start:end]
+    return client.put(
+        _url(patient_id, upload_id), params={"offset": start}, content=chunk,
+        headers={**headers, "X-Chunk-SHA256": hashlib.sha256(chunk).hexdigest()},
+    )
+
+def test_create_checks_the_declared_size(client, clinic, upload_dir, monkeypatch):
+    headers, patient_ids = clinic
+    upload = _create(client, headers, patient_ids[0])
+    assert upload["committed_offset"] == 0 and not upload["complete"]
+    assert os.path.getsize(upload_dir / f"{upload['upload_id']}.part") == len(VIDEO)
+
+    assert client.post(_url(patient_ids[0]), json={"filename": "clip.mp4", "size": 0}, headers=headers).status_code == 400
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", len(VIDEO) - 1)
+    response = client.post(_url(patient_ids[0]), json={"filename": "clip.mp4", "size": len(VIDEO)}, headers=headers)
+    assert response.status_code == 413
+
+def test_chunks_in_any_order_and_resume(client, clinic, upload_dir, monkeypatch):
+    headers, patient_ids = clinic
+    upload_id = _create(client, headers, patient_ids[0])["upload_id"]
+
+    response = _put(client, headers, patient_ids[0], upload_id, 4096, 8192)
+    assert response.status_code == 200
+    assert response.json()["committed_offset"] == 0
+    assert response.json()["received_bytes"] == 4096
+    assert _put(client, headers, patient_ids[0], upload_id, 0, 4096).headers["Upload-Offset"] == "8192"
+
+    # Reanudar: el estado dice desde donde seguir
+    status = client.get(_url(patient_ids[0], upload_id), headers=headers).json()
+    assert status["committed_offset"] == 8192 and not status["complete"]
+
+    bad = client.put(_url(patient_ids[0], upload_id), params={"offset": 8192}, content=VIDEO[8192:], headers={**headers, "X-Chunk-SHA256": "0" * 64})
+    assert bad.status_code == 422
+    outside = client.put(_url(patient_ids[0], upload_id), params={"offset": len(VIDEO)}, content=b"x", headers=headers)
+    assert outside.status_code == 416
+    monkeypatch.setattr(settings, "UPLOAD_MAX_CHUNK_BYTES", 1024)
+    assert _put(client, headers, patient_ids[0], upload_id, 8192, len(VIDEO)).status_code == 413
+
+    def streamed():
+        # Sin Content-Length: el limite se aplica mientras se lee
+        yield VIDEO[8192:9000]
+        yield VIDEO[9000:]
+    response = client.put(_url(patient_ids[0], upload_id), params={"offset": 8192}, content=streamed(), headers=headers)
+    assert response.status_code == 413
+
+    other = client.get(_url(patient_ids[1], upload_id), headers=headers)
+    assert other.status_code == 404
+
+def test_complete_analyzes_and_removes_the_file(client, scratch_clinic, upload_dir, monkeypatch):
+    headers, patient_ids = scratch_clinic
+    sizes = []
+
+    def analyze(path, on_progress=None, tenant=None):
+        sizes.append(os.path.getsize(path))
+        return {"timeline": {"0": "happy"}, "emotion_summary": {"happy": 1}}
+
+    monkeypatch.setattr(therapy_session, "analyze_video_segmented", analyze)
+    upload_id = _create(client, headers, patient_ids[0])["upload_id"]
+    assert _put(client, headers, patient_ids[0], upload_id, 0, 6000).status_code == 200
+    incomplete = client.post(_url(patient_ids[0], upload_id) + "/complete", headers=headers)
+    assert incomplete.status_code == 409
+
+    assert _put(client, headers, patient_ids[0], upload_id, 6000, len(VIDEO)).json()["complete"]
+    response = client.post(_url(patient_ids[0], upload_id) + "/complete", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["patient_id"] == patient_ids[0]
+    assert sizes == [len(VIDEO)]
+    assert list(upload_dir.iterdir()) == []
+
+def test_complete_rejects_a_wrong_checksum(client, clinic, upload_dir):
+    headers, patient_ids = clinic
+    upload_id = _create(client, headers, patient_ids[0], sha256="f" * 64)["upload_id"]
+    assert _put(client, headers, patient_ids[0], upload_id, 0, len(VIDEO)).status_code == 200
+    response = client.post(_url(patient_ids[0], upload_id) + "/complete", headers=headers)
+    assert response.status_code == 422
+    # Los datos quedan para reintentar o abortar
+    assert client.get(_url(patient_ids[0], upload_id), headers=headers).json()["complete"]
+    assert client.delete(_url(patient_ids[0], upload_id), headers=headers).status_code == 204
+    assert list(upload_dir.iterdir()) == []
+
+def test_purge_removes_abandoned_and_orphaned_files(upload_dir, monkeypatch):
+    status = chunked_upload.create_upload(1, 1, "clip.mp4", 100)
+    orphan = upload_dir / f"{'a' * 32}.mp4"
+    orphan.write_bytes(b"video")
+    recent = upload_dir / f"{'b' * 32}.mp4"
+    recent.write_bytes(b"video")
+    old = time.time() - settings.UPLOAD_TTL_SECONDS - 10
+    os.utime(orphan, (old, old))
+    os.utime(upload_dir / f"{status['upload_id']}.json", (old, old))
+
+    assert chunked_upload.purge_expired_uploads() == 2
+    assert [path.name for path in upload_dir.iterdir()] == [recent.name]
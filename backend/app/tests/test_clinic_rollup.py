@@ -0,0 +1,119 @@
+import json
+from collections import Counter
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base, enable_foreign_keys
+from app.models.clinic_rollup import ClinicEmotionRollup, ClinicSessionRollup
+from app.models.patient import Patient
+from app.models.therapy_session import TherapySession
+from app.services import clinic_rollup, patient_purge
+from app.services.synthetic_data import generate_synthetic_data
+
+@pytest.fixture
+def db():
+    # Base propia: estos tests agregan y borran sesiones
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    enable_foreign_keys(engine)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    generate_synthetic_data(session, clinics=2, patients_per_clinic=3, sessions_per_patient=4, session_seconds=60)
+    yield session
+    session.close()
+
+def _expected(db, period: str):
+    """Sessions and emotion totals per (clinic, bucket) computed straight from therapy_sessions"""
+    sessions, emotions = Counter(), Counter()
+    for session in db.query(TherapySession).join(Patient):
+        bucket = clinic_rollup.bucket_start(session.date.date(), period)
+        sessions[(session.patient.user_id, bucket)] += 1
+        for emotion, count in json.loads(session.results)["emotion_summary"].items():
+            if count:
+                emotions[(session.patient.user_id, bucket, emotion)] += count
+    return sessions, emotions
+
+def _stored(db, period: str):
+    sessions = Counter({
+        (r.user_id, r.bucket): r.sessions
+        for r in db.query(ClinicSessionRollup).filter(ClinicSessionRollup.period == period)
+    })
+    emotions = Counter({
+        (r.user_id, r.bucket, r.emotion): r.count
+        for r in db.query(ClinicEmotionRollup).filter(ClinicEmotionRollup.period == period)
+    })
+    return sessions, emotions
+
+def test_refresh_counts_each_session_once(db):
+    assert clinic_rollup.refresh(db, batch_size=5) == 24
+    for period in clinic_rollup.PERIODS:
+        assert _stored(db, period) == _expected(db, period)
+    assert clinic_rollup.refresh(db) == 0
+
+    patient = db.query(Patient).first()
+    results = {"emotion_summary": {"happy": 7}, "timeline": {}}
+    db.add(TherapySession(patient_id=patient.id, date=datetime(2026, 3, 4, 10), results=json.dumps(results)))
+    db.commit()
+    assert clinic_rollup.refresh(db) == 1
+    for period in clinic_rollup.PERIODS:
+        assert _stored(db, period) == _expected(db, period)
+
+def test_purge_subtracts_deleted_sessions(db):
+    clinic_rollup.refresh(db)
+    patient = db.query(Patient).first()
+    patient.deleted_at = datetime.utcnow()
+    db.commit()
+    patient_purge.purge_patient(db, patient.id, batch_size=3, delay_seconds=0)
+    for period in clinic_rollup.PERIODS:
+        assert _stored(db, period) == _expected(db, period)
+    # Reconstruir da lo mismo
+    assert clinic_rollup.rebuild(db) == 20
+    assert _stored(db, "week") == _expected(db, "week")
+
+def test_endpoint_serves_the_clinic_series(client, clinic, seeded_clinics, session_factory):
+    headers, patient_ids = clinic
+    db = session_factory()
+    try:
+        clinic_rollup.refresh(db)
+        user_id = seeded_clinics[0][0]
+        total = db.query(TherapySession).join(Patient).filter(Patient.user_id == user_id).count()
+    finally:
+        db.close()
+
+    response = client.get("/analytics/clinic/emotions", params={"start": "2000-01-01", "period": "week"}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    # Solo las sesiones de esta clinica
+    assert body["sessions"] == total
+    assert sum(bucket["sessions"] for bucket in body["series"]) == total
+    assert [b["bucket"] for b in body["series"]] == sorted(b["bucket"] for b in body["series"])
+    assert all(datetime.fromisoformat(b["bucket"]).weekday() == 0 for b in body["series"])
+    assert sum(e["count"] for e in body["emotions"]) == sum(e["count"] for b in body["series"] for e in b["emotions"])
+
+    assert client.get("/analytics/clinic/emotions", params={"period": "month"}, headers=headers).status_code == 400
+
+def test_refresh_counts_a_lower_id_committed_late(db):
+    # En Postgres el id se asigna al insertar: una transaccion lenta puede hacer commit de un
+    # id menor despues de que el refresco ya sumo uno mayor
+    clinic_rollup.refresh(db)
+    patient = db.query(Patient).first()
+    last_id = db.query(TherapySession.id).order_by(TherapySession.id.desc()).first()[0]
+    results = json.dumps({"emotion_summary": {"sad": 3}, "timeline": {}})
+    db.add(TherapySession(id=last_id + 2, patient_id=patient.id, date=datetime(2026, 3, 4, 10), results=results))
+    db.commit()
+    assert clinic_rollup.refresh(db) == 1
+
+    db.add(TherapySession(id=last_id + 1, patient_id=patient.id, date=datetime(2026, 3, 5, 10), results=results))
+    db.commit()
+    assert clinic_rollup.refresh(db) == 1
+    for period in clinic_rollup.PERIODS:
+        assert _stored(db, period) == _expected(db, period)
+
+    # Y al borrarla se resta
+    session = db.get(TherapySession, last_id + 1)
+    clinic_rollup.remove_sessions(db, [session.id])
+    db.delete(session)
+    db.commit()
+    for period in clinic_rollup.PERIODS:
+        assert _stored(db, period) == _expected(db, period)
@@ -0,0 +1,73 @@
+import json
+from app.core.auth import create_access_token
+from app.core.config import settings
+from app.services import emotion_context
+from app.services.agent_service import agent_service
+
+def _sessions(client, headers, patient_id):
+    return client.get(f"/patients/{patient_id}/therapy-sessions/", headers=headers).json()
+
+def _token(user_id):
+    return f"Bearer {create_access_token({'sub': str(user_id)})}"
+
+def test_context_is_compact_and_cached(client, clinic, session_factory):
+    headers, patient_ids = clinic
+    patient_id = patient_ids[5]
+    session_ids = [s["id"] for s in _sessions(client, headers, patient_id)]
+    db = session_factory()
+    try:
+        hits = emotion_context.cache_stats()["hits"]
+        context = emotion_context.build_context(db, patient_id, session_ids[:4])
+        assert context["scope"] == "sessions"
+        assert context["sessions_included"] == 4
+        assert set(context["trends"]) == set(context["overall"]["proportions"])
+        assert "dominant_changes" in context
+        assert all(len(s["phases"]) == 3 for s in context["sessions"])
+        assert abs(sum(context["overall"]["proportions"].values()) - 1) < 0.01
+        assert len(json.dumps(context, separators=(",", ":"))) <= settings.EMOTION_CONTEXT_MAX_BYTES
+
+        assert emotion_context.build_context(db, patient_id, list(reversed(session_ids[:4]))) == context
+        assert emotion_context.cache_stats()["hits"] == hits + 1
+
+        historical = emotion_context.build_context(db, patient_id)
+        assert historical["scope"] == "historical"
+        assert historical["sessions_total"] == len(session_ids)
+    finally:
+        db.close()
+
+def test_context_is_trimmed_to_max_bytes(client, clinic, session_factory, monkeypatch):
+    headers, patient_ids = clinic
+    patient_id = patient_ids[6]
+    monkeypatch.setattr(settings, "EMOTION_CONTEXT_MAX_BYTES", 1200)
+    db = session_factory()
+    try:
+        context = emotion_context.build_context(db, patient_id)
+    finally:
+        db.close()
+    assert len(json.dumps(context, separators=(",", ":"))) <= 1200
+    assert context["sessions_total"] == 10
+    assert context["sessions"] and all("phases" not in s for s in context["sessions"])
+
+def test_chat_builds_context_from_session_ids(client, clinic, seeded_clinics, monkeypatch):
+    headers, patient_ids = clinic
+    patient_id = patient_ids[7]
+    session_ids = [str(s["id"]) for s in _sessions(client, headers, patient_id)[:2]]
+    sent = []
+
+    async def fake_send(message, therapist_id, patient_id, emotion_data):
+        sent.append((patient_id, emotion_data))
+        return {"recommendations": "ok"}
+
+    monkeypatch.setattr(agent_service, "send_message", fake_send)
+    # Sin patient_id ni emociones: el backend deduce el paciente de las sesiones
+    response = client.post("/chat", json={"message": "Hola", "session_ids": session_ids}, headers=headers)
+    assert response.status_code == 200
+    assert sent[0][0] == patient_id
+    assert sorted(s["id"] for s in sent[0][1]["sessions"]) == sorted(map(int, session_ids))
+
+    other_patient = seeded_clinics[1][1][0]
+    other_session = _sessions(client, {"Authorization": _token(seeded_clinics[1][0])}, other_patient)[0]["id"]
+    response = client.post("/chat", json={"message": "Hola", "session_ids": [str(other_session)]}, headers=headers)
+    assert response.status_code == 400
+    response = client.post("/chat", json={"message": "Hola", "patient_id": patient_id, "session_ids": [str(other_session)]}, headers=headers)
+    assert response.status_code == 404
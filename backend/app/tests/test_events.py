@@ -0,0 +1,33 @@
+import pytest
+from datetime import datetime
+from starlette.websockets import WebSocketDisconnect
+
+def test_websocket_receives_note_and_session_events(client, scratch_clinic):
+    headers, patient_ids = scratch_clinic
+    token = headers["Authorization"].split(" ", 1)[1]
+    patient_id = patient_ids[0]
+    with client.websocket_connect(f"/events/ws?token={token}") as websocket:
+        response = client.post(f"/patients/{patient_id}/notes", json={"text": "Nota de prueba"}, headers=headers)
+        assert response.status_code == 201
+        event = websocket.receive_json()
+        assert event["type"] == "note.added"
+        assert event["data"] == {"patient_id": patient_id, "note_id": response.json()["id"]}
+
+        response = client.post(
+            f"/patients/{patient_id}/therapy-sessions/",
+            json={"date": datetime.utcnow().isoformat(), "results": "{}"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        event = websocket.receive_json()
+        assert event["type"] == "session.created"
+        assert event["data"]["session_id"] == response.json()["id"]
+
+def test_websocket_rejects_invalid_token(client):
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/events/ws?token=invalid") as websocket:
+            websocket.receive_json()
+    assert exc.value.code == 1008
+
+def test_sse_requires_authentication(client):
+    assert client.get("/events/stream").status_code == 401
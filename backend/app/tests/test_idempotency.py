@@ -0,0 +1,94 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.database import Base, enable_foreign_keys
+from app.models.idempotency_key import IdempotencyKey
+from app.models.user import User
+from app.services import idempotency
+
+def test_retry_with_same_key_replays_response(client, scratch_clinic):
+    headers, patient_ids = scratch_clinic
+    url = f"/patients/{patient_ids[2]}/therapy-sessions/"
+    body = {"date": datetime(2026, 1, 5, 10).isoformat(), "results": "{}"}
+    retry_headers = {**headers, "Idempotency-Key": "create-session-1"}
+
+    first = client.post(url, json=body, headers=retry_headers)
+    second = client.post(url, json=body, headers=retry_headers)
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+    sessions = client.get(url, headers=headers).json()
+    assert sum(1 for s in sessions if s["date"].startswith("2026-01-05T10")) == 1
+
+    other = client.post(url, json={**body, "results": '{"x": 1}'}, headers=retry_headers)
+    assert other.status_code == 422
+
+def test_concurrent_duplicates_wait_for_the_first(tmp_path):
+    # Base en archivo: cada thread necesita su propia conexion (la de los otros tests es compartida)
+    engine = create_engine(f"sqlite:///{tmp_path / 'idempotency.db'}", connect_args={"check_same_thread": False, "timeout": 10})
+    enable_foreign_keys(engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = session_factory()
+    db.add(User(id=1, name="Clinic", email="clinic@example.com", hashed_password="x"))
+    db.commit()
+    db.close()
+    calls = []
+    responses = []
+
+    def handler():
+        calls.append(1)
+        time.sleep(0.3)
+        return {"id": 1}
+
+    def request():
+        db = session_factory()
+        try:
+            responses.append(idempotency.run(db, 1, "analyze-1", "same-fingerprint", handler).body)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(responses) == 3 and len(set(responses)) == 1
+
+def test_claim_reraises_unrelated_integrity_errors(tmp_path):
+    # Sin fila en conflicto (aca, el usuario no existe) no tiene sentido reintentar
+    engine = create_engine(f"sqlite:///{tmp_path / 'idempotency.db'}")
+    enable_foreign_keys(engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        with pytest.raises(IntegrityError):
+            idempotency.run(db, 999, "orphan", "fingerprint", lambda: {"id": 1})
+    finally:
+        db.close()
+
+def test_claim_gives_up_after_the_wait(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'idempotency.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0.2)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_POLL_SECONDS", 0.05)
+    try:
+        db.add(User(id=1, name="Clinic", email="clinic@example.com", hashed_password="x"))
+        db.add(IdempotencyKey(user_id=1, key="busy", fingerprint="f", status="processing", expires_at=datetime.utcnow() + timedelta(hours=1)))
+        db.commit()
+        started = time.monotonic()
+        with pytest.raises(HTTPException) as exc:
+            idempotency.run(db, 1, "busy", "f", lambda: {"id": 1})
+        assert exc.value.status_code == 409
+        assert time.monotonic() - started < 2
+    finally:
+        db.close()
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+import pytest
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from sqlalchemy import column, create_engine, select, table
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core import security
+from app.database import Base, enable_foreign_keys
+from app.models.chat_message import ChatMessage
+from app.models.idempotency_key import IdempotencyKey
+from app.models.key_rotation_progress import KeyRotationProgress
+from app.models.patient import Patient
+from app.models.therapy_session import TherapySession
+from app.services import key_rotation
+from app.services.synthetic_data import generate_synthetic_data
+
+OLD_KEY = Fernet.generate_key()
+
+@pytest.fixture
+def factory(monkeypatch):
+    # Base propia con todo encriptado con una clave anterior
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    enable_foreign_keys(engine)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(security, "decrypt_cache", None)
+    monkeypatch.setattr(security, "fernet", MultiFernet([Fernet(OLD_KEY)]))
+    db = factory()
+    try:
+        users = generate_synthetic_data(db, clinics=1, patients_per_clinic=3, sessions_per_patient=2, session_seconds=30)
+        patient = users[0].patients[0]
+        db.add(ChatMessage(user_id=users[0].id, patient_id=patient.id, role="user", content="Como sigue?"))
+        db.add(IdempotencyKey(
+            user_id=users[0].id, key="k", fingerprint="f", status="completed",
+            response_status=200, response_body='{"ok": true}', expires_at=datetime.utcnow() + timedelta(hours=1),
+        ))
+        db.commit()
+    finally:
+        db.close()
+    # Durante la rotacion: la clave nueva es la primaria y la anterior solo desencripta
+    monkeypatch.setattr(security, "fernet", MultiFernet([security.primary_fernet, Fernet(OLD_KEY)]))
+    monkeypatch.setattr(key_rotation, "SessionLocal", factory)
+    return factory
+
+def _tokens(db, table_name, columns):
+    raw = table(table_name, column("id"), *[column(name) for name in columns])
+    return [(row.id, row._mapping[name]) for row in db.execute(select(raw)).all() for name in columns if row._mapping[name]]
+
+def test_every_encrypted_table_is_found():
+    assert {"patients", "therapy_sessions", "chat_messages", "idempotency_keys"} <= set(key_rotation.encrypted_columns())
+
+def test_old_key_data_is_readable_and_fully_rotated(factory, monkeypatch):
+    db = factory()
+    try:
+        # MultiFernet desencripta lo escrito con la clave anterior
+        assert db.query(ChatMessage).one().content == "Como sigue?"
+        assert db.query(IdempotencyKey).one().response_body == '{"ok": true}'
+        before = {name: _tokens(db, name, columns) for name, columns in key_rotation.encrypted_columns().items()}
+    finally:
+        db.close()
+    assert all(tokens for tokens in before.values())
+    assert not any(security.is_primary_token(token) for tokens in before.values() for _, token in tokens)
+
+    assert key_rotation.run_key_rotation(batch_size=4, delay_seconds=0)
+
+    db = factory()
+    try:
+        for table_name, columns in key_rotation.encrypted_columns().items():
+            tokens = _tokens(db, table_name, columns)
+            assert len(tokens) == len(before[table_name])
+            assert all(security.is_primary_token(token) for _, token in tokens), table_name
+            progress = db.get(KeyRotationProgress, table_name)
+            assert progress.finished_at is not None
+            assert progress.rows_rotated == len(tokens)
+        # Sin la clave anterior todo se sigue leyendo
+        monkeypatch.setattr(security, "fernet", MultiFernet([security.primary_fernet]))
+        assert db.query(ChatMessage).one().content == "Como sigue?"
+        assert all(session.results for session in db.query(TherapySession))
+        with pytest.raises(InvalidToken):
+            Fernet(OLD_KEY).decrypt(_tokens(db, "patients", ["name"])[0][1].encode())
+    finally:
+        db.close()
+
+def test_interrupted_rotation_resumes_from_checkpoint(factory, monkeypatch):
+    rotate_token = key_rotation.rotate_token
+    calls = []
+
+    def failing_rotate(token):
+        calls.append(token)
+        if len(calls) > 2:
+            raise RuntimeError("worker stopped")
+        return rotate_token(token)
+
+    db = factory()
+    try:
+        ids = [patient_id for (patient_id,) in db.query(Patient.id).order_by(Patient.id)]
+        monkeypatch.setattr(key_rotation, "rotate_token", failing_rotate)
+        # Dos filas por lote con nombre y observaciones: el segundo lote falla
+        with pytest.raises(RuntimeError):
+            key_rotation.rotate_table(db, "patients", ["name", "observations"], batch_size=1, delay_seconds=0)
+        db.rollback()
+        progress = db.get(KeyRotationProgress, "patients")
+        assert progress.last_id == ids[0]
+        assert progress.finished_at is None
+
+        calls.clear()
+        monkeypatch.setattr(key_rotation, "rotate_token", lambda token: calls.append(token) or rotate_token(token))
+        key_rotation.rotate_table(db, "patients", ["name", "observations"], batch_size=1, delay_seconds=0)
+        db.refresh(progress)
+        assert progress.finished_at is not None
+        assert progress.rows_processed == len(ids)
+        # La fila ya rotada no se vuelve a procesar
+        first = [token for patient_id, token in _tokens(db, "patients", ["name", "observations"]) if patient_id == ids[0]]
+        assert not set(first) & set(calls)
+        assert all(security.is_primary_token(token) for _, token in _tokens(db, "patients", ["name", "observations"]))
+    finally:
+        db.close()
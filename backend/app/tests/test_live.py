@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+from app.services import live_analysis
+from app.services.live_analysis import LiveAnalysis
+
+def fake_result(seconds: int = 3) -> dict:
+    timeline = {str(second): "happy" if second % 2 else "neutral" for second in range(seconds)}
+    return {
+        "emotion_summary": {"neutral": (seconds + 1) // 2, "happy": seconds // 2, "sad": 0, "fear": 0, "disgust": 0},
+        "timeline": timeline,
+    }
+
+def test_live_clips_are_merged_and_saved(client, scratch_clinic, monkeypatch):
+    monkeypatch.setattr(live_analysis, "analyze_video", lambda path, tenant=None: fake_result())
+    headers, patient_ids = scratch_clinic
+    token = headers["Authorization"].split(" ", 1)[1]
+    patient_id = patient_ids[1]
+    with client.websocket_connect(f"/patients/{patient_id}/therapy-sessions/live?token={token}&clip_seconds=3") as websocket:
+        websocket.send_bytes(b"clip-1")
+        first = websocket.receive_json()
+        assert first["type"] == "update"
+        assert first["timeline"] == {"0": "neutral", "1": "happy", "2": "neutral"}
+
+        websocket.send_bytes(b"clip-2")
+        second = websocket.receive_json()
+        assert second["timeline"] == {"3": "neutral", "4": "happy", "5": "neutral"}
+        assert second["emotion_summary"]["neutral"] == 4
+
+        websocket.send_text(json.dumps({"type": "end"}))
+        completed = websocket.receive_json()
+    assert completed["type"] == "completed"
+    assert completed["received"] == 2 and completed["dropped"] == 0
+
+    sessions = client.get(f"/patients/{patient_id}/therapy-sessions/", headers=headers).json()
+    saved = next(s for s in sessions if s["id"] == completed["session_id"])
+    assert len(json.loads(saved["results"])["timeline"]) == 6
+
+def test_live_drops_oldest_batch_when_model_falls_behind(monkeypatch):
+    release = threading.Event()
+    analyzed = []
+
+    def slow_model(path, tenant=None):
+        release.wait(5)
+        return fake_result(1)
+
+    monkeypatch.setattr(live_analysis, "analyze_video", slow_model)
+
+    async def run():
+        async def send(message):
+            if message["type"] == "update":
+                analyzed.append(message["offset"])
+
+        live = LiveAnalysis(send, "clip", fps=5, clip_seconds=1, queue_size=1)
+        live.add_clip(b"0")
+        await asyncio.sleep(0.05)  # el worker toma el primer clip y queda esperando al modelo
+        live.add_clip(b"1")
+        live.add_clip(b"2")
+        release.set()
+        await live.finish()
+        return live.stats()
+
+    stats = asyncio.run(run())
+    assert stats["dropped"] == 1
+    assert analyzed == [0.0, 2.0]
+
+def test_failed_batch_keeps_the_partial_timeline(client, scratch_clinic, monkeypatch):
+    results = iter([fake_result(), RuntimeError("model connection reset"), ValueError("invalid model response"), fake_result()])
+
+    def model(path, tenant=None):
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(live_analysis, "analyze_video", model)
+    headers, patient_ids = scratch_clinic
+    token = headers["Authorization"].split(" ", 1)[1]
+    with client.websocket_connect(f"/patients/{patient_ids[0]}/therapy-sessions/live?token={token}&clip_seconds=3") as websocket:
+        messages = []
+        for clip in (b"clip-1", b"clip-2", b"clip-3", b"clip-4"):
+            websocket.send_bytes(clip)
+            messages.append(websocket.receive_json())
+        websocket.send_text(json.dumps({"type": "end"}))
+        completed = websocket.receive_json()
+
+    assert [m["type"] for m in messages] == ["update", "error", "error", "update"]
+    assert messages[1] == {"type": "error", "offset": 3.0, "detail": "Analysis failed"}
+    assert completed["type"] == "completed"
+    assert (completed["analyzed_batches"], completed["failed_batches"]) == (2, 2)
+
+    sessions = client.get(f"/patients/{patient_ids[0]}/therapy-sessions/", headers=headers).json()
+    saved = next(s for s in sessions if s["id"] == completed["session_id"])
+    assert sorted(json.loads(saved["results"])["timeline"], key=float) == ["0", "1", "2", "9", "10", "11"]
+
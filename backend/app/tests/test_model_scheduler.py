@@ -0,0 +1,81 @@
+import threading
+import time
+import pytest
+from fastapi import HTTPException
+from app import main
+from app.services import model_scheduler
+from app.services.model_scheduler import ModelScheduler, anonymous_tenant
+
+def run_calls(scheduler, tenants, order, hold=0.02):
+    def call(tenant):
+        with scheduler.slot(tenant):
+            order.append(tenant)
+            time.sleep(hold)
+
+    threads = []
+    for tenant in tenants:
+        thread = threading.Thread(target=call, args=(tenant,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.005)  # llegan en este orden
+    return threads
+
+def test_backlog_of_one_clinic_does_not_starve_another():
+    scheduler = ModelScheduler(max_concurrency=1, rate=0, burst=1, weights={}, max_wait=10)
+    order = []
+    threads = run_calls(scheduler, [1] * 6 + [2], order)
+    for thread in threads:
+        thread.join()
+    # La clinica 2 llega ultima pero se atiende antes que el resto del backlog de la clinica 1
+    assert order.index(2) <= 2
+    stats = scheduler.stats()
+    assert stats["tenants"]["1"]["completed"] == 6
+    assert stats["running"] == 0 and stats["queued"] == 0
+
+def test_token_bucket_rejects_after_max_wait():
+    scheduler = ModelScheduler(max_concurrency=4, rate=0.01, burst=1, weights={}, max_wait=0.2)
+    with scheduler.slot(7):
+        pass
+    with pytest.raises(HTTPException) as exc:
+        with scheduler.slot(7):
+            pass
+    assert exc.value.status_code == 429
+    assert "Retry-After" in exc.value.headers
+    assert scheduler.stats()["tenants"]["7"]["rejected"] == 1
+
+def test_anonymous_clients_do_not_share_a_bucket(monkeypatch):
+    scheduler = ModelScheduler(max_concurrency=4, rate=0.01, burst=1, weights={}, max_wait=0.1)
+    with scheduler.slot(anonymous_tenant("10.0.0.1")):
+        pass
+    with pytest.raises(HTTPException) as exc:
+        with scheduler.slot(anonymous_tenant("10.0.0.1")):
+            pass
+    assert exc.value.status_code == 429
+    # Otro cliente anonimo no paga por el primero
+    with scheduler.slot(anonymous_tenant("10.0.0.2")):
+        pass
+
+    monkeypatch.setattr(model_scheduler, "_MAX_IDLE_TENANTS", 1)
+    unlimited = ModelScheduler(max_concurrency=4, rate=0, burst=1, weights={}, max_wait=1)
+    for host in ("10.0.0.3", "10.0.0.4", "10.0.0.5"):
+        with unlimited.slot(anonymous_tenant(host)):
+            pass
+    # Las colas inactivas se olvidan
+    assert len(unlimited.tenants) <= 1
+
+def test_rate_limited_anonymous_caller_gets_429(client, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    scheduler = ModelScheduler(max_concurrency=4, rate=0.01, burst=1, weights={}, max_wait=0.1)
+
+    def analyze(path, tenant=None):
+        with scheduler.slot(tenant):
+            return {"timeline": {"0": "happy"}, "emotion_summary": {"happy": 1}}
+
+    monkeypatch.setattr(main, "analyze_video_segmented", analyze)
+    upload = {"file": ("clip.mp4", b"x" * 10, "video/mp4")}
+    assert client.post("/video/analyze", files=upload).status_code == 200
+    # El 429 del planificador llega al cliente, no como un 500
+    response = client.post("/video/analyze", files=upload)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert list((tmp_path / "temp").iterdir()) == []
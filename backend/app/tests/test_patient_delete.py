@@ -0,0 +1,98 @@
+import json
+import threading
+from app.core.config import settings
+from app.models.chat_message import ChatMessage
+from app.models.patient import Patient
+from app.models.search_index import SearchDocument, SearchPosting
+from app.services import patient_purge
+
+RESULTS = json.dumps({"emotion_summary": {"happy": 2}, "timeline": {"0": "happy", "1": "happy"}})
+
+def _create_patient(client, headers, sessions: int, word: str) -> int:
+    patient_id = client.post("/patients/", json={"name": "Borrar Paciente", "age": 40}, headers=headers).json()["id"]
+    for i in range(sessions):
+        body = {"date": f"2025-03-0{i + 1}T10:00:00", "results": RESULTS}
+        assert client.post(f"/patients/{patient_id}/therapy-sessions/", json=body, headers=headers).status_code == 200
+    assert client.post(f"/patients/{patient_id}/notes", json={"text": f"Nota {word}"}, headers=headers).status_code == 201
+    return patient_id
+
+def _child_rows(session_factory, patient_id: int) -> int:
+    db = session_factory()
+    try:
+        return patient_purge.count_rows(db, patient_id) + db.query(Patient).filter(Patient.id == patient_id).count()
+    finally:
+        db.close()
+
+def _wait_for_startup_purge():
+    # El purge que arranca con la app corre contra otra base; que no tenga el lock durante el test
+    for thread in threading.enumerate():
+        if thread.name == "patient-purge":
+            thread.join()
+
+def test_small_patient_is_deleted_at_once_with_cascade(client, clinic, session_factory, monkeypatch):
+    headers, _ = clinic
+    patient_id = _create_patient(client, headers, sessions=2, word="cascada")
+    db = session_factory()
+    db.add(ChatMessage(user_id=1, patient_id=patient_id, role="user", content="Hola"))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(patient_purge, "run_purge", lambda: (_ for _ in ()).throw(AssertionError("no purge expected")))
+
+    assert client.delete(f"/patients/{patient_id}", headers=headers).status_code == 204
+    # ON DELETE CASCADE borro sesiones, notas, mensajes y documentos del indice en la misma transaccion
+    assert _child_rows(session_factory, patient_id) == 0
+    db = session_factory()
+    try:
+        assert db.query(SearchPosting).join(SearchDocument).filter(SearchDocument.patient_id == patient_id).count() == 0
+    finally:
+        db.close()
+    assert client.get(f"/patients/{patient_id}", headers=headers).status_code == 404
+
+def test_large_patient_is_hidden_then_purged_in_batches(client, clinic, session_factory, monkeypatch):
+    headers, _ = clinic
+    _wait_for_startup_purge()
+    patient_id = _create_patient(client, headers, sessions=5, word="purgatorio")
+    session_ids = [s["id"] for s in client.get(f"/patients/{patient_id}/therapy-sessions/", headers=headers).json()]
+    monkeypatch.setattr(settings, "PATIENT_PURGE_BATCH_SIZE", 2)
+    purges = []
+    monkeypatch.setattr(patient_purge, "run_purge", lambda: purges.append(1))
+
+    assert client.delete(f"/patients/{patient_id}", headers=headers).status_code == 204
+    assert purges == [1]
+    # Marcado, todavia con sus filas, pero invisible en todas las rutas
+    assert _child_rows(session_factory, patient_id) == 5 + 1 + 1 + 1
+    assert patient_id not in [p["id"] for p in client.get("/patients/", headers=headers).json()]
+    assert client.get(f"/patients/{patient_id}", headers=headers).status_code == 404
+    assert client.delete(f"/patients/{patient_id}", headers=headers).status_code == 404
+    assert client.get(f"/patients/{patient_id}/therapy-sessions/", headers=headers).status_code == 404
+    assert client.get(f"/patients/{patient_id}/therapy-sessions/{session_ids[0]}", headers=headers).status_code == 404
+    assert client.get(f"/patients/{patient_id}/notes", headers=headers).status_code == 404
+    for route in ("summary", "by-session", "last-dominant"):
+        assert client.get(f"/analytics/patient/{patient_id}/emotions/{route}", headers=headers).status_code == 404
+    assert client.get("/search/?q=purgatorio", headers=headers).json()["results"] == []
+    assert client.get(f"/chat/{patient_id}", headers=headers).status_code == 403
+    bulk = client.post("/therapy-sessions/bulk", json={"sessions": [
+        {"patient_id": patient_id, "date": "2025-04-01T10:00:00", "results": RESULTS}
+    ]}, headers=headers).json()
+    assert bulk["results"][0]["status"] == "not_found"
+
+    monkeypatch.undo()
+    monkeypatch.setattr(patient_purge, "SessionLocal", session_factory)
+    assert patient_purge.run_purge(batch_size=2, delay_seconds=0) >= 1
+    assert _child_rows(session_factory, patient_id) == 0
+
+def test_purge_picks_up_patients_deleted_while_it_runs(session_factory, monkeypatch):
+    monkeypatch.setattr(patient_purge, "SessionLocal", session_factory)
+    _wait_for_startup_purge()
+    calls = []
+
+    def fake_purge_all(batch_size, delay_seconds):
+        calls.append(1)
+        if len(calls) == 1:
+            # Otro pedido borra un paciente mientras este purge tiene el lock
+            assert patient_purge.run_purge() == 0
+        return 1
+
+    monkeypatch.setattr(patient_purge, "_purge_all", fake_purge_all)
+    assert patient_purge.run_purge() == 2
+    assert len(calls) == 2
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+from cryptography.fernet import Fernet, MultiFernet
+from app.core import plaintext_cache, security
+from app.core.plaintext_cache import PlaintextCache
+from app.models.patient import Patient
+
+def _entry_size(value: str) -> int:
+    cache = PlaintextCache(max_bytes=10_000, ttl_seconds=60)
+    cache.put("x", value)
+    return cache.stats()["bytes"]
+
+def test_least_recently_used_entry_is_evicted_first():
+    size = _entry_size("valor-a")
+    cache = PlaintextCache(max_bytes=size * 3, ttl_seconds=60)
+    for name in ("a", "b", "c"):
+        cache.put(f"token-{name}", f"valor-{name}")
+    assert cache.get("token-a") == "valor-a"
+    cache.put("token-d", "valor-d")
+    # b es el menos usado: a se leyo despues de escribir c
+    assert cache.get("token-b") is None
+    assert [cache.get(f"token-{name}") for name in ("a", "c", "d")] == ["valor-a", "valor-c", "valor-d"]
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(plaintext_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache = PlaintextCache(max_bytes=10_000, ttl_seconds=30)
+    cache.put("token", "valor")
+    now[0] += 29
+    assert cache.get("token") == "valor"
+    now[0] += 2
+    assert cache.get("token") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["expirations"]) == (0, 0, 1)
+
+def test_total_bytes_stay_under_the_limit():
+    size = _entry_size("v" * 100)
+    cache = PlaintextCache(max_bytes=size * 5, ttl_seconds=60)
+    for i in range(50):
+        cache.put(f"token-{i}", "v" * 100)
+        assert cache.stats()["bytes"] <= cache.max_bytes
+    assert cache.stats()["entries"] == 5
+    # Reemplazar una clave no cuenta dos veces
+    cache.put("token-49", "v" * 100)
+    assert cache.stats()["bytes"] == size * 5
+    # Un valor mas grande que todo el cache no se guarda ni desaloja a nadie
+    cache.put("huge", "v" * (size * 10))
+    assert cache.get("huge") is None
+    assert cache.stats()["entries"] == 5
+
+def test_writes_and_key_rotation_never_serve_stale_values(scratch_db, monkeypatch):
+    _, factory, clinics = scratch_db
+    cache = PlaintextCache(max_bytes=1024 * 1024, ttl_seconds=300)
+    monkeypatch.setattr(security, "decrypt_cache", cache)
+    patient_id = clinics[0][1][0]
+
+    db = factory()
+    try:
+        patient = db.get(Patient, patient_id)
+        patient.observations = "Primera version"
+        db.commit()
+        db.expire_all()
+        assert db.get(Patient, patient_id).observations == "Primera version"
+        assert cache.stats()["hits"] >= 1
+
+        # Escribir cambia el texto cifrado: el valor viejo ya no se puede encontrar
+        db.get(Patient, patient_id).observations = "Segunda version"
+        db.commit()
+        db.expire_all()
+        assert db.get(Patient, patient_id).observations == "Segunda version"
+
+        # Rotar la clave tambien: el token nuevo se desencripta con la clave nueva
+        old_key = Fernet.generate_key()
+        monkeypatch.setattr(security, "fernet", MultiFernet([Fernet(old_key), security.primary_fernet]))
+        old_token = security.encrypt_data("Valor con la clave vieja")
+        monkeypatch.setattr(security, "fernet", MultiFernet([security.primary_fernet, Fernet(old_key)]))
+        new_token = security.rotate_token(old_token)
+        assert new_token != old_token
+        assert cache.get(new_token) is None
+        assert security.decrypt_data(new_token) == "Valor con la clave vieja"
+    finally:
+        db.close()
@@ -0,0 +1,57 @@
+import re
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+
+# "SCAN patients" = recorrido completo de la tabla; "SCAN ... USING INDEX" o "SEARCH ..." estan bien
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+ROUTES = [
+    "/patients/",
+    "/patients/?age=40",
+    "/patients/?name=perez",
+    "/patients/{patient_id}",
+    "/patients/{patient_id}/therapy-sessions",
+    "/patients/{patient_id}/therapy-sessions/",
+    "/patients/{patient_id}/therapy-sessions/{session_id}",
+    "/patients/{patient_id}/notes",
+    "/analytics/patient/{patient_id}/emotions/summary",
+    "/analytics/patient/{patient_id}/emotions/by-session",
+    "/analytics/patient/{patient_id}/emotions/last-dominant",
+    "/search/?q=ataque panico",
+    "/chat/{patient_id}?since_id=0",
+]
+
+@contextmanager
+def capture_selects(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def explain(engine, statement, parameters):
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_route_queries_use_indexes(route, client, clinic, engine):
+    headers, patient_ids = clinic
+    sessions = client.get(f"/patients/{patient_ids[0]}/therapy-sessions/", headers=headers).json()
+    path = route.format(patient_id=patient_ids[0], session_id=sessions[0]["id"])
+
+    with capture_selects(engine) as statements:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    assert statements
+
+    for statement, parameters in statements:
+        plan = explain(engine, statement, parameters)
+        scans = [line for line in plan if FULL_SCAN.match(line)]
+        assert not scans, f"{path} runs a full table scan:\n{statement}\nplan: {plan}"
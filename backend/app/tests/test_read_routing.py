@@ -0,0 +1,120 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, insert, select, text, update
+from sqlalchemy.pool import StaticPool
+from app import database
+from app.core.config import settings
+from app.database import ReplicaPool, RoutingSession
+
+metadata = MetaData()
+items = Table("items", metadata, Column("id", Integer, primary_key=True), Column("name", String))
+
+def _engine(name: str):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(items).values(id=1, name=name))
+    return engine
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Primary and one replica that tell apart where a statement ran by the row they hold"""
+    primary, replica = _engine("primary"), _engine("replica")
+    pool = ReplicaPool([], check_interval=60, max_lag=10, lag_fallback="primary")
+    pool.engines = [replica]
+    pool.status = {id(replica): "unknown"}
+    pool.lag = {id(replica): None}
+    # Sin el thread de monitoreo: el test decide el lag con check()
+    monkeypatch.setattr(pool, "start", lambda: None)
+    monkeypatch.setattr(pool, "_measure_lag", lambda engine: 0.0)
+    pool.check()
+    monkeypatch.setattr(database, "engine", primary)
+    monkeypatch.setattr(database, "replicas", pool)
+    return pool
+
+def _read(db) -> str:
+    return db.execute(select(items.c.name).where(items.c.id == 1)).scalar()
+
+def test_selects_go_to_the_replica(pool):
+    db = RoutingSession()
+    try:
+        assert _read(db) == "replica"
+        assert db.execute(text("SELECT name FROM items WHERE id = 1")).scalar() == "replica"
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("statement", [
+    text("INSERT INTO items (name) VALUES ('x')"),
+    text("UPDATE items SET name = name WHERE id = 2"),
+    text("SELECT name FROM items WHERE id = 1 FOR UPDATE"),
+    insert(items).values(name="x"),
+    update(items).where(items.c.id == 2).values(name="y"),
+    select(items.c.name).where(items.c.id == 1).with_for_update(),
+], ids=["text-insert", "text-update", "text-for-update", "core-insert", "core-update", "select-for-update"])
+def test_writes_go_to_the_primary_and_pin_the_session(pool, statement):
+    db = RoutingSession()
+    try:
+        assert db.get_bind(clause=statement) is database.engine
+        # Despues de escribir, las lecturas siguen en el primario
+        assert _read(db) == "primary"
+    finally:
+        db.close()
+
+def test_text_insert_is_written_to_the_primary(pool):
+    db = RoutingSession()
+    try:
+        db.execute(text("INSERT INTO items (id, name) VALUES (2, 'nuevo')"))
+        db.commit()
+    finally:
+        db.close()
+    replica = pool.engines[0]
+    with database.engine.connect() as conn:
+        assert conn.execute(select(items.c.name).where(items.c.id == 2)).scalar() == "nuevo"
+    with replica.connect() as conn:
+        assert conn.execute(select(items.c.name).where(items.c.id == 2)).scalar() is None
+
+def test_client_reads_its_own_writes_from_the_primary(pool, monkeypatch):
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_SECONDS", 60)
+    writer, other = "Bearer writer-token", "Bearer other-token"
+    database.note_write(writer)
+
+    db = database.read_session(writer)
+    try:
+        assert not isinstance(db, RoutingSession)
+    finally:
+        db.close()
+    db = database.read_session(other)
+    try:
+        assert isinstance(db, RoutingSession)
+    finally:
+        db.close()
+
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_SECONDS", 0)
+    db = database.read_session(writer)
+    try:
+        assert isinstance(db, RoutingSession)
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("fallback,expected", [("primary", "primary"), ("replica", "replica")])
+def test_lagging_replica_uses_the_configured_fallback(pool, monkeypatch, fallback, expected):
+    monkeypatch.setattr(pool, "_measure_lag", lambda engine: 30.0)
+    pool.lag_fallback = fallback
+    pool.check()
+    assert pool.health()[0]["status"] == "lagging"
+    db = RoutingSession()
+    try:
+        assert _read(db) == expected
+    finally:
+        db.close()
+
+def test_replica_that_is_down_is_skipped(pool, monkeypatch):
+    def down(engine):
+        raise ConnectionError("unreachable")
+    monkeypatch.setattr(pool, "_measure_lag", down)
+    pool.check()
+    assert pool.health()[0]["status"] == "down"
+    db = RoutingSession()
+    try:
+        assert _read(db) == "primary"
+    finally:
+        db.close()
@@ -0,0 +1,93 @@
+import io
+import re
+import pytest
+import pyarrow.ipc
+import pyarrow.parquet as pq
+from app.core.auth import create_access_token
+from app.models.patient import Patient
+from app.models.therapy_session import TherapySession
+from app.models.user import User
+from app.services import research_export
+
+@pytest.fixture(scope="module")
+def admin_headers(session_factory, seeded_clinics):
+    db = session_factory()
+    try:
+        admin = User(name="Research Admin", email="research-admin@example.com", hashed_password="x", role="admin")
+        db.add(admin)
+        db.commit()
+        return {"Authorization": f"Bearer {create_access_token({'sub': str(admin.id)})}"}
+    finally:
+        db.close()
+
+def _batches(session_factory, table, rows):
+    db = session_factory()
+    try:
+        return list(research_export.iter_column_batches(db, table, row_group_rows=rows))
+    finally:
+        db.close()
+
+def test_sessions_are_aggregated_and_pseudonymized(session_factory, seeded_clinics):
+    db = session_factory()
+    try:
+        total = db.query(TherapySession).join(Patient).filter(Patient.deleted_at.is_(None)).count()
+        names = {name for (name,) in db.query(Patient.name)}
+    finally:
+        db.close()
+    batches = _batches(session_factory, "sessions", 50)
+    assert all(len(batch["session"]) <= 50 for batch in batches)
+    sessions = [value for batch in batches for value in batch["session"]]
+    assert len(sessions) == len(set(sessions)) == total
+
+    batch = batches[0]
+    for column in ("clinic", "patient", "session"):
+        assert all(re.fullmatch(r"[0-9a-f]{16}", value) for value in batch[column])
+    assert not names & set(batch["patient"])
+    for i, seconds in enumerate(batch["seconds"]):
+        assert seconds == sum(batch[f"seconds_{e}"][i] for e in research_export.EMOTIONS) + batch["seconds_other"][i]
+    # Los datos de prueba usan emociones de la lista: todas tienen codigo
+    assert set(batch["seconds_other"]) == {0}
+
+def test_timeline_rows_match_session_seconds(session_factory, seeded_clinics):
+    sessions = _batches(session_factory, "sessions", 10_000)[0]
+    seconds = dict(zip(sessions["session"], sessions["seconds"]))
+    batches = _batches(session_factory, "timeline", 5000)
+    assert len(batches) > 1
+    rows = {}
+    for batch in batches:
+        assert len(batch["session"]) == len(batch["offset"]) == len(batch["emotion"])
+        for session in batch["session"]:
+            rows[session] = rows.get(session, 0) + 1
+        assert set(batch["emotion"]) <= set(range(len(research_export.EMOTIONS)))
+    assert rows == {session: count for session, count in seconds.items() if count}
+
+def test_export_requires_admin_and_pyarrow(client, clinic, admin_headers, monkeypatch):
+    headers, _ = clinic
+    assert client.get("/admin/export/sessions", headers=headers).status_code == 403
+    assert client.get("/admin/export/patients", headers=admin_headers).status_code == 404
+    monkeypatch.setattr(research_export, "pa", None)
+    assert client.get("/admin/export/sessions", headers=admin_headers).status_code == 501
+
+@pytest.mark.parametrize("table", research_export.TABLES)
+def test_parquet_export_round_trip(client, admin_headers, table, monkeypatch):
+    monkeypatch.setattr(research_export.settings, "EXPORT_ROW_GROUP_ROWS", 2000)
+    response = client.get(f"/admin/export/{table}", headers=admin_headers)
+    assert response.status_code == 200
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    assert parquet.metadata.num_rows > 0
+    assert parquet.schema_arrow.names == (research_export.SESSION_COLUMNS if table == "sessions" else research_export.TIMELINE_COLUMNS)
+
+@pytest.mark.parametrize("table", research_export.TABLES)
+def test_arrow_export_round_trip(client, admin_headers, table, monkeypatch):
+    monkeypatch.setattr(research_export.settings, "EXPORT_ROW_GROUP_ROWS", 2000)
+    response = client.get(f"/admin/export/{table}", params={"format": "arrow"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    assert response.headers["content-disposition"].endswith('.arrows"')
+    reader = pyarrow.ipc.open_stream(io.BytesIO(response.content))
+    exported = reader.read_all()
+    assert exported.num_rows > 0
+    assert exported.schema.names == (research_export.SESSION_COLUMNS if table == "sessions" else research_export.TIMELINE_COLUMNS)
+    # Mismas filas que el Parquet
+    parquet = pq.ParquetFile(io.BytesIO(client.get(f"/admin/export/{table}", headers=admin_headers).content))
+    assert exported.num_rows == parquet.metadata.num_rows
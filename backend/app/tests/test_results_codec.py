@@ -0,0 +1,102 @@
+import json
+import random
+import sys
+import threading
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core import results_codec
+from app.core.security import decrypt_data, encrypt_data, fernet
+from app.database import Base
+from app.models.therapy_session import TherapySession
+from app.services.results_storage import convert_results
+from app.services.synthetic_data import generate_session_results
+
+def _model_result(seconds=600):
+    return json.dumps(generate_session_results(random.Random(1), seconds))
+
+@pytest.mark.parametrize("text", [
+    _model_result(),
+    # Lo que manda un cliente en create_session no siempre es el JSON canonico
+    '{ "timeline": {"0": "happy"} }',
+    json.dumps({"timeline": {"0.5": "sad", "1.5": "sad", "3": "happy"}, "emotion_summary": {"sad": 2, "happy": 1}}),
+    json.dumps({"emotion_summary": {}, "timeline": {}}),
+    json.dumps({"timeline": {"0": "happy"}, "segments": [{"offset": 0.25, "ok": True}], "model": "v2"}),
+    "{}",
+    "not json",
+])
+def test_round_trip_is_exact(text):
+    assert results_codec.decode(results_codec.encode(text)) == text
+
+def test_model_results_are_packed_and_much_smaller():
+    text = _model_result()
+    packed = results_codec.encode(text)
+    assert packed[len(results_codec.MAGIC)] == results_codec.VERSION_PACKED
+    old_token = encrypt_data(text, cache=False)
+    new_token = encrypt_data(text, cache=False, encode=results_codec.encode)
+    assert len(new_token) * 10 < len(old_token)
+    assert decrypt_data(new_token, decode=results_codec.decode) == text
+
+def test_existing_rows_are_read_and_converted_in_batches():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    texts = [_model_result(60 + i) for i in range(5)] + ["{ }"]
+    with engine.begin() as conn:
+        # Filas como las guardaba EncryptedText: texto JSON encriptado, sin codec
+        for i, text in enumerate(texts):
+            conn.exec_driver_sql("INSERT INTO therapy_sessions (id, results) VALUES (?, ?)", (i + 1, fernet.encrypt(text.encode()).decode()))
+
+    Session = sessionmaker(bind=engine)
+    def read_all():
+        db = Session()
+        try:
+            return [s.results for s in db.query(TherapySession).order_by(TherapySession.id)]
+        finally:
+            db.close()
+
+    assert read_all() == texts
+    with engine.begin() as conn:
+        assert convert_results(conn, batch_size=2) == len(texts)
+        tokens = conn.exec_driver_sql("SELECT results FROM therapy_sessions ORDER BY id").scalars().all()
+        # Volver a correr no cambia nada
+        assert convert_results(conn, batch_size=2) == 0
+    assert all(results_codec.is_encoded(fernet.decrypt(token.encode())) for token in tokens)
+    assert read_all() == texts
+
+    with engine.begin() as conn:
+        assert convert_results(conn, batch_size=4, compress=False) == len(texts)
+    assert read_all() == texts
+
+def test_concurrent_decodes_agree(monkeypatch):
+    texts = [_model_result(seconds) for seconds in (5000, 12000, 20000)]
+    encoded = [results_codec.encode(text) for text in texts]
+    expected = [f'"{i}": ' for i in range(20000)]
+    # Cambios de thread frecuentes para que el crecimiento del cache se intercale
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for trial in range(20):
+            # Cache vacio: todos los threads lo agrandan a la vez
+            monkeypatch.setattr(results_codec, "_prefixes", [])
+            barrier = threading.Barrier(16)
+            wrong = []
+
+            def read(i):
+                barrier.wait()
+                if i % 2:
+                    ok = results_codec.decode(encoded[i % 3]) == texts[i % 3]
+                else:
+                    ok = results_codec._second_prefixes(0, 20000) == expected
+                if not ok:
+                    wrong.append(i)
+
+            threads = [threading.Thread(target=read, args=(i,)) for i in range(16)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert wrong == [], f"trial {trial}"
+            assert results_codec._prefixes == expected[:len(results_codec._prefixes)]
+    finally:
+        sys.setswitchinterval(interval)
+
@@ -0,0 +1,75 @@
+from datetime import datetime
+from app.core.auth import create_access_token
+from app.models.patient import Patient
+from app.models.search_index import SearchPosting
+from app.services import search_index
+
+def _note(client, headers, patient_id: int, text: str) -> int:
+    response = client.post(f"/patients/{patient_id}/notes", json={"text": text}, headers=headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+def _search(client, headers, q: str, **params) -> dict:
+    response = client.get("/search/", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_results_are_ranked_and_paged(client, scratch_clinic):
+    headers, patient_ids = scratch_clinic
+    strong = _note(client, headers, patient_ids[0], "zarzamora insomnio")
+    weak = _note(client, headers, patient_ids[1], "zarzamora insomnio y muchas otras palabras que alargan la nota bastante")
+    middle = _note(client, headers, patient_ids[2], "zarzamora insomnio nocturno persistente")
+    _note(client, headers, patient_ids[0], "zarzamora sin el otro termino")
+
+    found = _search(client, headers, "Zarzamora INSOMNIO")
+    # Solo los documentos con todos los terminos; con la misma frecuencia, el mas corto primero
+    assert found["total"] == 3
+    assert [hit["id"] for hit in found["results"]] == [strong, middle, weak]
+    scores = [hit["score"] for hit in found["results"]]
+    assert scores == sorted(scores, reverse=True)
+
+    pages = [_search(client, headers, "zarzamora insomnio", limit=1, offset=offset) for offset in range(4)]
+    assert all(page["total"] == 3 for page in pages)
+    assert [hit["id"] for page in pages for hit in page["results"]] == [strong, middle, weak]
+    assert pages[3]["results"] == []
+
+def test_total_excludes_deleted_patients(client, scratch_db, scratch_clinic):
+    _, factory, _ = scratch_db
+    headers, patient_ids = scratch_clinic
+    _note(client, headers, patient_ids[0], "frambuesa")
+    _note(client, headers, patient_ids[1], "frambuesa")
+    db = factory()
+    try:
+        db.get(Patient, patient_ids[1]).deleted_at = datetime.utcnow()
+        db.commit()
+        found = search_index.search(db, db.get(Patient, patient_ids[0]).user_id, "frambuesa")
+    finally:
+        db.close()
+    assert found["total"] == 1
+    assert [document.patient_id for document, _ in found["hits"]] == [patient_ids[0]]
+    assert _search(client, headers, "frambuesa")["total"] == 1
+
+def test_clinics_only_see_their_own_documents(client, scratch_db, scratch_clinic):
+    _, _, clinics = scratch_db
+    headers, patient_ids = scratch_clinic
+    other_user, other_patients = clinics[1]
+    other_headers = {"Authorization": f"Bearer {create_access_token({'sub': str(other_user)})}"}
+    mine = _note(client, headers, patient_ids[0], "arandano")
+    theirs = _note(client, other_headers, other_patients[0], "arandano")
+
+    assert [hit["id"] for hit in _search(client, headers, "arandano")["results"]] == [mine]
+    assert [hit["id"] for hit in _search(client, other_headers, "arandano")["results"]] == [theirs]
+
+def test_index_stores_no_plaintext_terms(client, scratch_db, scratch_clinic):
+    _, factory, _ = scratch_db
+    headers, patient_ids = scratch_clinic
+    _note(client, headers, patient_ids[0], "Pesadillas recurrentes con tormentas")
+    db = factory()
+    try:
+        tokens = [token for (token,) in db.query(SearchPosting.token)]
+    finally:
+        db.close()
+    assert search_index.hash_token("pesadillas") in tokens
+    for word in ("pesadillas", "recurrentes", "tormentas"):
+        assert not any(word in token for token in tokens)
+    assert all(len(token) == 32 and int(token, 16) >= 0 for token in tokens)
@@ -0,0 +1,65 @@
+import os
+from fastapi import HTTPException
+from app.core.config import settings
+from app.services import segmented_analysis
+from app.services.segmented_analysis import merge_results
+
+def _result(seconds: int, emotion: str = "happy", **extra) -> dict:
+    return {**extra, "emotion_summary": {emotion: seconds}, "timeline": {str(s): emotion for s in range(seconds)}}
+
+def test_merge_shifts_timelines_and_adds_summaries():
+    merged = merge_results([(60.0, _result(2, "sad")), (0.0, _result(3, "happy", model="v2")), (120.0, _result(1, "sad", model="v3"))])
+    assert merged["timeline"] == {"0": "happy", "1": "happy", "2": "happy", "60": "sad", "61": "sad", "120": "sad"}
+    assert list(merged["timeline"]) == sorted(merged["timeline"], key=float)
+    assert merged["emotion_summary"] == {"happy": 3, "sad": 3}
+    # Los otros campos salen del primer segmento
+    assert merged["model"] == "v2"
+
+def test_keyframe_offsets_do_not_collide():
+    # El segundo corte cae en un keyframe antes de 60s y el primer segmento llega hasta 60
+    merged = merge_results([(0.0, _result(61, "happy")), (59.96, _result(3, "sad")), (120.04, _result(2, "fear"))])
+    assert len(merged["timeline"]) == 61 + 3 + 2
+    assert merged["timeline"]["60"] == "happy"
+    assert merged["timeline"]["59.96"] == merged["timeline"]["60.96"] == "sad"
+    assert merged["timeline"]["120.04"] == "fear"
+    assert sum(merged["emotion_summary"].values()) == len(merged["timeline"])
+
+def test_shift_keeps_the_model_format():
+    assert segmented_analysis._shift_timestamp("5", 10.0) == "15"
+    assert segmented_analysis._shift_timestamp("0.5", 1.25) == "1.75"
+    assert segmented_analysis._shift_timestamp("2", 0.0004) == "2"
+    assert segmented_analysis._shift_timestamp("summary", 30.0) == "summary"
+
+def test_segments_are_analyzed_and_merged_at_their_offsets(monkeypatch, tmp_path):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"video")
+    segments = [(str(tmp_path / f"segment_{i}.mp4"), offset) for i, offset in enumerate([0.0, 59.96, 120.04])]
+    monkeypatch.setattr(settings, "VIDEO_SEGMENT_SECONDS", 60)
+    monkeypatch.setattr(settings, "VIDEO_SEGMENT_RETRIES", 1)
+    monkeypatch.setattr(segmented_analysis, "ffmpeg_available", lambda: True)
+    monkeypatch.setattr(segmented_analysis, "probe_duration", lambda path: 150.0)
+    monkeypatch.setattr(segmented_analysis, "split_video", lambda path, seconds, output_dir: segments)
+    monkeypatch.setattr(segmented_analysis.time, "sleep", lambda seconds: None)
+    calls = []
+
+    def analyze(path, tenant=None):
+        calls.append((os.path.basename(path), tenant))
+        if len(calls) == 1:
+            # Un error del modelo se reintenta
+            raise HTTPException(status_code=503, detail="busy")
+        index = int(os.path.basename(path)[8])
+        return _result(61 if index == 0 else 30, ["happy", "sad", "fear"][index])
+
+    monkeypatch.setattr(segmented_analysis, "analyze_video", analyze)
+    progress = []
+    result = segmented_analysis.analyze_video_segmented(str(video), on_progress=lambda done, total: progress.append((done, total)), tenant=7)
+
+    assert len(calls) == 4 and {tenant for _, tenant in calls} == {7}
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    assert len(result["timeline"]) == 61 + 30 + 30
+    assert result["timeline"]["60"] == "happy"
+    assert result["timeline"]["59.96"] == "sad"
+    assert result["timeline"]["120.04"] == "fear"
+    assert result["emotion_summary"] == {"happy": 61, "sad": 30, "fear": 30}
+    # El directorio temporal de los segmentos se borra
+    assert [path.name for path in tmp_path.iterdir()] == ["video.mp4"]
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+import pytest
+from app import database
+from app.core.config import settings
+from app.core.single_flight import SingleFlight
+from app.models.user import User
+from app.routes import analytics
+from app.services.agent_service import agent_service
+
+def test_concurrent_async_calls_share_one_execution():
+    flight = SingleFlight("test-async")
+    executions = []
+
+    async def fetch():
+        executions.append(1)
+        await asyncio.sleep(0.05)
+        return {"value": len(executions)}
+
+    async def main():
+        results = await asyncio.gather(*[flight.run("patient:1", fetch) for _ in range(5)])
+        # Terminada la llamada la clave se libera: el proximo pedido vuelve a llamar
+        results.append(await flight.run("patient:1", fetch))
+        return results
+
+    results = asyncio.run(main())
+    assert results[:5] == [{"value": 1}] * 5
+    assert results[5] == {"value": 2}
+    assert flight.stats() == {"calls": 6, "executions": 2, "coalesced": 4, "errors": 0, "cancelled": 0, "in_flight": 0}
+
+def test_errors_reach_every_waiter_and_are_not_remembered():
+    flight = SingleFlight("test-errors")
+    attempts = []
+
+    async def fetch():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise ConnectionError("agent down")
+        return "ok"
+
+    async def main():
+        first = await asyncio.gather(*[flight.run("k", fetch) for _ in range(3)], return_exceptions=True)
+        return first, await flight.run("k", fetch)
+
+    first, retry = asyncio.run(main())
+    assert all(isinstance(e, ConnectionError) for e in first)
+    assert retry == "ok"
+    assert flight.stats()["errors"] == 1
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    flight = SingleFlight("test-cancel")
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.run("k", fetch))
+        follower = asyncio.ensure_future(flight.run("k", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+        # Si se van todos, la llamada compartida se cancela
+        only = asyncio.ensure_future(flight.run("k2", fetch))
+        await asyncio.sleep(0.01)
+        only.cancel()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == "done"
+    stats = flight.stats()
+    assert stats["cancelled"] == 1
+    assert stats["in_flight"] == 0
+
+def test_sync_calls_from_threads_share_one_execution():
+    flight = SingleFlight("test-sync")
+    executions = []
+    results = []
+
+    def parse():
+        executions.append(1)
+        time.sleep(0.1)
+        return [{"emotion": "happy", "count": 3}]
+
+    threads = [threading.Thread(target=lambda: results.append(flight.run_sync(("summary", 1), parse))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(executions) == 1
+    assert results == [[{"emotion": "happy", "count": 3}]] * 4
+    assert flight.stats()["coalesced"] == 3
+
+def test_agent_service_coalesces_identical_history_requests(monkeypatch):
+    calls = []
+
+    async def fake_fetch(patient_id, session_ids):
+        calls.append(patient_id)
+        await asyncio.sleep(0.02)
+        return {"messages": []}
+
+    monkeypatch.setattr(agent_service, "_get_chat_history", fake_fetch)
+
+    async def main():
+        return await asyncio.gather(
+            agent_service.get_chat_history(4),
+            agent_service.get_chat_history(4),
+            agent_service.get_chat_history(5),
+        )
+
+    assert asyncio.run(main()) == [{"messages": []}] * 3
+    assert sorted(calls) == [4, 5]
+
+def test_client_that_just_wrote_does_not_join_an_older_call(session_factory, seeded_clinics, monkeypatch):
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_SECONDS", 60)
+    user_id, patient_ids = seeded_clinics[0]
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    release = threading.Event()
+    leader = threading.Thread(
+        target=analytics.flight.run_sync,
+        args=(("summary", user_id, patient_ids[0]), lambda: release.wait(5) and "result from before the write"),
+    )
+    leader.start()
+    time.sleep(0.05)
+    try:
+        database.note_write("Bearer writer")
+        db = database.read_session("Bearer writer")
+        try:
+            assert db.info["read_your_writes"]
+            user = db.get(User, user_id)
+            # No espera a la llamada en curso: lee por su cuenta
+            summary = analytics.get_patient_emotion_summary(patient_ids[0], db, user)
+            assert isinstance(summary, list) and summary
+        finally:
+            db.close()
+        db = database.read_session("Bearer reader")
+        assert not db.info.get("read_your_writes")
+        db.close()
+    finally:
+        release.set()
+        leader.join()
+
@@ -0,0 +1,99 @@
+import uuid
+from datetime import datetime, timedelta
+from app.core import revocation
+from app.core.auth import decode_access_token
+from app.core.revocation import BloomFilter, RevocationList, revocations
+from app.models.revoked_token import RevokedToken
+from app.models.user import User
+
+def _register(client) -> tuple:
+    email = f"revoke-{uuid.uuid4().hex[:8]}@example.com"
+    token = client.post("/auth/register", json={"name": "Clinic", "email": email, "password": "secret-1"}).json()["access_token"]
+    return email, {"Authorization": f"Bearer {token}"}
+
+def _login(client, email: str, password: str) -> dict:
+    token = client.post("/auth/login", json={"email": email, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def test_logout_revokes_only_that_token(client):
+    email, headers = _register(client)
+    other = _login(client, email, "secret-1")
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+    assert client.get("/auth/me", headers=headers).status_code == 401
+    assert client.get("/auth/me", headers=other).status_code == 200
+
+def test_password_change_invalidates_earlier_tokens(client):
+    email, headers = _register(client)
+    body = {"password": "secret-2", "current_password": "secret-1"}
+    assert client.patch("/auth/me", json=body, headers=headers).status_code == 200
+    assert client.get("/auth/me", headers=headers).status_code == 401
+    assert client.get("/auth/me", headers=_login(client, email, "secret-2")).status_code == 200
+
+def test_logout_in_another_worker_is_seen_at_once(client, session_factory):
+    _, headers = _register(client)
+    payload = decode_access_token(headers["Authorization"][7:])
+    # Lo que haria otro worker: la fila y la marca en el usuario, sin tocar la memoria de este
+    db = session_factory()
+    try:
+        now = datetime.utcnow()
+        db.add(RevokedToken(jti=payload["jti"], user_id=int(payload["sub"]), revoked_at=now, expires_at=now + timedelta(hours=1)))
+        db.query(User).filter(User.id == int(payload["sub"])).update({User.tokens_revoked_at: now})
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+def test_sync_between_stamp_and_commit_is_not_trusted(client, session_factory):
+    _, headers = _register(client)
+    payload = decode_access_token(headers["Authorization"][7:])
+    db = session_factory()
+    try:
+        # Otro worker hace logout: toma la hora y marca al usuario, pero antes de su commit
+        # este worker sincroniza y no ve la fila
+        stamped = datetime.utcnow()
+        revocations.sync(db)
+        assert revocations.synced_at >= stamped
+        db.add(RevokedToken(jti=payload["jti"], user_id=int(payload["sub"]), revoked_at=stamped, expires_at=stamped + timedelta(hours=1)))
+        db.query(User).filter(User.id == int(payload["sub"])).update({User.tokens_revoked_at: stamped})
+        db.commit()
+    finally:
+        db.close()
+    assert not revocations.is_revoked(payload["jti"])
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+def test_unrevoked_tokens_are_answered_by_the_bloom_filter(client, clinic):
+    headers, _ = clinic
+    before = revocations.stats()
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    after = revocations.stats()
+    assert after["checks"] == before["checks"] + 1
+    assert after["bloom_negatives"] == before["bloom_negatives"] + 1
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(bits=4096, hashes=4)
+    values = [uuid.uuid4().hex for _ in range(200)]
+    for value in values:
+        bloom.add(value)
+    assert all(value in bloom for value in values)
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(2000))
+    assert false_positives < 200
+
+def test_expired_entries_are_pruned_from_memory_and_table(session_factory):
+    revocation_list = RevocationList(bloom_bits=4096, bloom_hashes=4)
+    db = session_factory()
+    try:
+        now = datetime.utcnow()
+        user_id = db.query(User.id).first()[0]
+        revocation_list.revoke(db, "expired-token", user_id, now - timedelta(seconds=1))
+        revocation_list.revoke(db, "live-token", user_id, now + timedelta(hours=1))
+        assert not revocation_list.is_revoked("expired-token")
+        assert revocation_list.is_revoked("live-token")
+
+        assert revocation_list.prune() == 1
+        assert revocation_list.stats()["revoked"] == 1
+        assert revocation.purge_expired(db) >= 1
+        assert db.query(RevokedToken).filter(RevokedToken.jti == "expired-token").count() == 0
+    finally:
+        db.close()
@@ -0,0 +1,40 @@
+from app.core import tracing
+
+class CollectingExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace)
+
+def test_request_trace_continues_caller_and_covers_db_and_crypto(client, clinic, monkeypatch):
+    exporter = CollectingExporter()
+    monkeypatch.setattr(tracing, "exporter", exporter)
+    tracing.instrument_sqlalchemy()
+    headers, patient_ids = clinic
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    traceparent = f"00-{trace_id}-00f067aa0ba902b7-01"
+
+    response = client.get(f"/patients/{patient_ids[0]}", headers={**headers, "traceparent": traceparent})
+    assert response.status_code == 200
+    assert response.headers["X-Trace-Id"] == trace_id
+
+    trace = exporter.traces[-1]
+    root = trace.spans[0]
+    assert root.name == "GET /patients/{patient_id}"
+    assert root.parent_id == "00f067aa0ba902b7"
+    names = {span.name for span in trace.spans}
+    assert {"auth.get_current_user", "db.query", "crypto.decrypt"} <= names
+    span_ids = {span.span_id for span in trace.spans}
+    assert all(span.parent_id in span_ids for span in trace.spans[1:])
+
+def test_unsampled_caller_and_disabled_tracing_export_nothing(client, clinic, monkeypatch):
+    exporter = CollectingExporter()
+    monkeypatch.setattr(tracing, "exporter", exporter)
+    headers, patient_ids = clinic
+    client.get(f"/patients/{patient_ids[0]}", headers={**headers, "traceparent": f"00-{'a' * 32}-{'b' * 16}-00"})
+    assert exporter.traces == []
+    monkeypatch.setattr(tracing, "exporter", None)
+    response = client.get(f"/patients/{patient_ids[0]}", headers=headers)
+    assert "X-Trace-Id" not in response.headers
+    assert tracing.inject() == {}
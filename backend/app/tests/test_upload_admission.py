@@ -0,0 +1,74 @@
+import pytest
+from fastapi import HTTPException
+from app import main
+from app.core.config import settings
+from app.services import upload_admission
+from app.services.upload_admission import UploadBudget
+
+@pytest.fixture
+def analyzed(monkeypatch, tmp_path):
+    """Replace the model call; records the size of every file sent to it"""
+    monkeypatch.chdir(tmp_path)
+    sizes = []
+
+    def analyze(path, tenant=None):
+        assert tenant == "anonymous:testclient"
+        with open(path, "rb") as f:
+            sizes.append(len(f.read()))
+        return {"timeline": {"0": "happy"}, "emotion_summary": {"happy": 1}}
+
+    monkeypatch.setattr(main, "analyze_video_segmented", analyze)
+    return sizes
+
+def test_upload_is_copied_in_chunks_and_released(client, analyzed, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_COPY_CHUNK_BYTES", 1000)
+    response = client.post("/video/analyze", files={"file": ("../../clip.mp4", b"x" * 4500, "video/mp4")})
+    assert response.status_code == 200
+    assert analyzed == [4500]
+    # Nombre temporal propio (no el del cliente) y borrado al terminar
+    assert list((tmp_path / "temp").iterdir()) == []
+    assert upload_admission.budget.stats()["uploads_in_flight"] == 0
+
+@pytest.mark.parametrize("path", ["/video/analyze", "/patients/1/therapy-sessions/analyze"])
+def test_declared_size_above_limit_is_rejected_before_reading(client, analyzed, monkeypatch, path):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", 1000)
+    response = client.post(path, files={"file": ("clip.mp4", b"x" * 5000, "video/mp4")})
+    assert response.status_code == 413
+    assert analyzed == []
+
+def test_streamed_body_is_cut_at_the_limit(client, analyzed, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", 1000)
+
+    def body():
+        # Sin Content-Length: el limite se aplica mientras llegan las partes
+        yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="clip.mp4"\r\nContent-Type: video/mp4\r\n\r\n'
+        for _ in range(20):
+            yield b"x" * 500
+
+    response = client.post("/video/analyze", content=body(), headers={"Content-Type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413
+    assert analyzed == []
+    assert upload_admission.budget.stats()["uploads_in_flight"] == 0
+
+def test_budget_rejects_with_retry_after_and_admits_after_release():
+    budget = UploadBudget(memory_budget=10 * 1024 * 1024, disk_budget=30 * 1024 * 1024, min_free_disk=0, temp_dir=".")
+    first = budget.acquire(10 * 1024 * 1024)
+    with pytest.raises(HTTPException) as exc:
+        budget.acquire(10 * 1024 * 1024)
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == str(settings.UPLOAD_RETRY_AFTER_SECONDS)
+    budget.release(first)
+    budget.release(budget.acquire(10 * 1024 * 1024))
+    assert budget.stats()["memory_in_flight"] == budget.stats()["disk_in_flight"] == 0
+
+def test_single_upload_over_budget_is_still_admitted():
+    budget = UploadBudget(memory_budget=1, disk_budget=1, min_free_disk=0, temp_dir=".")
+    budget.release(budget.acquire(5 * 1024 * 1024))
+    assert budget.stats()["admitted"] == 1
+
+def test_low_disk_is_rejected_with_503(client, analyzed, monkeypatch):
+    monkeypatch.setattr(upload_admission.budget, "min_free_disk", 1 << 62)
+    response = client.post("/video/analyze", files={"file": ("clip.mp4", b"x" * 10, "video/mp4")})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert analyzed == []
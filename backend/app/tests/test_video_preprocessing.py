@@ -0,0 +1,60 @@
+import os
+import sys
+import pytest
+from app.core.config import settings
+from app.services import video_preprocessing
+
+# Un ffmpeg falso en el PATH: el ultimo argumento es el archivo de salida
+SCRIPTS = {
+    "success": "open(sys.argv[-1], 'wb').write(b'small')",
+    "failure": "open(sys.argv[-1], 'wb').write(b'partial'); sys.stderr.write('bad input'); sys.exit(1)",
+    "timeout": "open(sys.argv[-1], 'wb').write(b'partial'); time.sleep(5)",
+    "empty": "open(sys.argv[-1], 'wb').close()",
+}
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+    monkeypatch.setattr(settings, "FFMPEG_BINARY", "ffmpeg")
+
+    def install(behavior: str):
+        script = bin_dir / "ffmpeg"
+        if behavior == "not_executable":
+            # Tiene permiso de ejecucion pero no es un programa: subprocess lanza OSError
+            script.write_bytes(b"\x00\x01not a program")
+        else:
+            script.write_text(f"#!{sys.executable}\nimport sys, time\n{SCRIPTS[behavior]}\n")
+        script.chmod(0o755)
+
+    return install
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"original")
+    return str(path)
+
+def _outputs(video):
+    return sorted(name for name in os.listdir(os.path.dirname(video)) if name.endswith(".small.mp4"))
+
+def test_success_returns_the_new_file(fake_ffmpeg, video):
+    fake_ffmpeg("success")
+    output = video_preprocessing.preprocess_video(video)
+    assert output != video and output.endswith(".small.mp4")
+    with open(output, "rb") as f:
+        assert f.read() == b"small"
+    assert _outputs(video) == [os.path.basename(output)]
+
+@pytest.mark.parametrize("behavior", ["failure", "timeout", "empty", "not_executable"])
+def test_problems_fall_back_to_the_original_and_leave_nothing(fake_ffmpeg, video, behavior, monkeypatch):
+    monkeypatch.setattr(settings, "VIDEO_PREPROCESS_TIMEOUT", 0.5)
+    fake_ffmpeg(behavior)
+    assert video_preprocessing.preprocess_video(video) == video
+    assert _outputs(video) == []
+
+def test_missing_ffmpeg_sends_the_original(video, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "FFMPEG_BINARY", str(tmp_path / "no-ffmpeg"))
+    assert video_preprocessing.preprocess_video(video) == video
+    assert _outputs(video) == []
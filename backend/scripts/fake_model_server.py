@@ -0,0 +1,53 @@
+"""
+Stand-in for the emotion model API, for local load tests.
+
+    FAKE_MODEL_LATENCY_MS=800 uvicorn scripts.fake_model_server:app --port 8002
+
+Then point the backend at it with API_MODEL_URL=http://localhost:8002.
+
+Environment variables:
+    FAKE_MODEL_LATENCY_MS      base latency per request (default 500)
+    FAKE_MODEL_JITTER_MS       random extra latency, 0..jitter (default 100)
+    FAKE_MODEL_MS_PER_MB       extra latency per MB uploaded (default 0)
+    FAKE_MODEL_TIMELINE_SECONDS  timeline entries per response, i.e. payload size (default 60)
+    FAKE_MODEL_ERROR_RATE      fraction of requests answered with a 500 (default 0)
+"""
+import asyncio
+import os
+import random
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from app.schemas.video import VideoAnalysisResponse
+
+LATENCY_MS = float(os.getenv("FAKE_MODEL_LATENCY_MS", "500"))
+JITTER_MS = float(os.getenv("FAKE_MODEL_JITTER_MS", "100"))
+MS_PER_MB = float(os.getenv("FAKE_MODEL_MS_PER_MB", "0"))
+TIMELINE_SECONDS = int(os.getenv("FAKE_MODEL_TIMELINE_SECONDS", "60"))
+ERROR_RATE = float(os.getenv("FAKE_MODEL_ERROR_RATE", "0"))
+
+EMOTIONS = list(VideoAnalysisResponse.model_fields["emotion_summary"].annotation.model_fields)
+
+app = FastAPI(title="Fake EmotionAI model")
+
+def build_response(seconds: int) -> dict:
+    timeline = {}
+    emotion = random.choice(EMOTIONS)
+    for second in range(seconds):
+        # Las emociones cambian de a tramos, como en un video real
+        if random.random() < 0.15:
+            emotion = random.choice(EMOTIONS)
+        timeline[str(second)] = emotion
+    summary = {name: 0 for name in EMOTIONS}
+    for name in timeline.values():
+        summary[name] += 1
+    return VideoAnalysisResponse(emotion_summary=summary, timeline=timeline).model_dump()
+
+@app.post("/video/analyze")
+async def analyze(file: UploadFile = File(...)):
+    size = 0
+    while chunk := await file.read(1024 * 1024):
+        size += len(chunk)
+    delay_ms = LATENCY_MS + random.uniform(0, JITTER_MS) + MS_PER_MB * size / (1024 * 1024)
+    await asyncio.sleep(delay_ms / 1000)
+    if random.random() < ERROR_RATE:
+        raise HTTPException(status_code=500, detail="Simulated model failure")
+    return build_response(TIMELINE_SECONDS)
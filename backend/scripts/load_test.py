@@ -0,0 +1,202 @@
+"""
+Load test for the video analysis pipeline.
+
+Drives concurrent uploads through the backend and reports throughput,
+p50/p95/p99 latency, error rates and the backend's memory high-water mark.
+Start the backend against scripts/fake_model_server.py to test without the real model.
+
+    python -m scripts.load_test --video sample.mp4 --requests 200 --concurrency 16
+    python -m scripts.load_test --mode session --email a@b.com --password secret \\
+        --video sample.mp4 --pid $(pgrep -f "uvicorn app.main") --output release.json
+    python -m scripts.load_test --video sample.mp4 --baseline release.json --max-regression 0.2
+
+Modes:
+    video    POST /video/analyze (no auth)
+    session  POST /patients/{id}/therapy-sessions/analyze (creates a patient if --patient-id is not given)
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+import httpx
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def read_rss_kb(pid: int) -> Dict[str, int]:
+    """Current and peak resident memory of a process, from /proc (Linux only)."""
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, value = line.split(":", 1)
+                values[key] = int(value.split()[0])
+    return values
+
+async def sample_memory(pid: int, stop: asyncio.Event, peak: Dict[str, int]):
+    while not stop.is_set():
+        try:
+            values = read_rss_kb(pid)
+        except (FileNotFoundError, ProcessLookupError):
+            return
+        peak["rss_kb"] = max(peak.get("rss_kb", 0), values.get("VmRSS", 0))
+        peak["hwm_kb"] = max(peak.get("hwm_kb", 0), values.get("VmHWM", 0))
+        await asyncio.sleep(0.2)
+
+def setup_json(response: httpx.Response, field: str, what: str):
+    """Read one field from a setup response; exits with the response if it is not the expected JSON"""
+    try:
+        value = response.json()[field]
+    except (ValueError, TypeError, KeyError):
+        sys.exit(f"{what} returned {response.status_code} without {field!r}: {response.text[:200]!r}")
+    return value
+
+async def get_token(client: httpx.AsyncClient, args) -> Optional[str]:
+    if args.token:
+        return args.token
+    if not args.email:
+        return None
+    response = await client.post("/auth/login", json={"email": args.email, "password": args.password})
+    response.raise_for_status()
+    return setup_json(response, "access_token", "Login")
+
+async def run(args) -> dict:
+    with open(args.video, "rb") as f:
+        video = f.read()
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        headers = {}
+        if args.mode == "session":
+            token = await get_token(client, args)
+            if token is None:
+                sys.exit("--mode session needs --token or --email/--password")
+            headers["Authorization"] = f"Bearer {token}"
+            patient_id = args.patient_id
+            if patient_id is None:
+                response = await client.post("/patients/", json={"name": "Load Test", "age": 30}, headers=headers)
+                response.raise_for_status()
+                patient_id = setup_json(response, "id", "Patient creation")
+            url = f"/patients/{patient_id}/therapy-sessions/analyze"
+        else:
+            url = "/video/analyze"
+
+        latencies: List[float] = []
+        errors: Dict[str, int] = {}
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one_request(i: int):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(
+                        url, headers=headers, files={"file": (f"load_{i}.mp4", video, "video/mp4")}
+                    )
+                    status = response.status_code
+                    if status < 400:
+                        body = response.json()
+                        # /video/analyze devuelve 500 con {"error": ...} en vez de lanzar
+                        if not isinstance(body, dict) or "error" in body:
+                            status = 500
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                except ValueError:
+                    # Respuesta exitosa que no es JSON (proxy, pagina de error): cuenta como error
+                    status = "invalid_json"
+                elapsed = time.perf_counter() - started
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+
+        stop = asyncio.Event()
+        peak: Dict[str, int] = {}
+        sampler = asyncio.create_task(sample_memory(args.pid, stop, peak)) if args.pid else None
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request(i) for i in range(args.requests)))
+        wall = time.perf_counter() - started
+
+        stop.set()
+        if sampler:
+            await sampler
+
+    latencies.sort()
+    failed = sum(errors.values())
+    return {
+        "mode": args.mode,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "video_bytes": len(video),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        },
+        "error_rate": round(failed / args.requests, 4) if args.requests else 0.0,
+        "errors": errors,
+        "memory_peak_kb": peak or None,
+    }
+
+def compare(report: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Return the metrics that got worse than the baseline by more than max_regression."""
+    regressions = []
+    for key in ("p50", "p95", "p99"):
+        old, new = baseline["latency_ms"][key], report["latency_ms"][key]
+        if old and new > old * (1 + max_regression):
+            regressions.append(f"latency {key}: {old} -> {new} ms")
+    old, new = baseline["throughput_rps"], report["throughput_rps"]
+    if old and new < old * (1 - max_regression):
+        regressions.append(f"throughput: {old} -> {new} req/s")
+    if report["error_rate"] > baseline["error_rate"] + 0.01:
+        regressions.append(f"error rate: {baseline['error_rate']} -> {report['error_rate']}")
+    old_mem = (baseline.get("memory_peak_kb") or {}).get("rss_kb")
+    new_mem = (report.get("memory_peak_kb") or {}).get("rss_kb")
+    if old_mem and new_mem and new_mem > old_mem * (1 + max_regression):
+        regressions.append(f"peak RSS: {old_mem} -> {new_mem} kB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=os.getenv("LOADTEST_BASE_URL", "http://localhost:8001"))
+    parser.add_argument("--mode", choices=["video", "session"], default="video")
+    parser.add_argument("--video", required=True, help="video file to upload on every request")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--token")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--patient-id", type=int)
+    parser.add_argument("--pid", type=int, help="backend process id, to sample its memory")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Re-encrypt every encrypted column with the current ENCRYPTION_KEY.
+
+1. Generate a new key:  python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
+2. Deploy with ENCRYPTION_KEY=<new key> and ENCRYPTION_KEYS_PREVIOUS=<old key>
+3. Run:  python -m scripts.rotate_encryption_key   (or POST /admin/key-rotation)
+4. Once every table is finished, remove the old key from ENCRYPTION_KEYS_PREVIOUS
+
+The job is resumable: if it stops, running it again continues from the last committed batch.
+"""
+import argparse
+from app.database import Base, SessionLocal, engine
+from app.services import key_rotation
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--delay", type=float, default=None, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    engine.echo = False
+    Base.metadata.create_all(bind=engine)
+    key_rotation.run_key_rotation(batch_size=args.batch_size, delay_seconds=args.delay)
+    db = SessionLocal()
+    try:
+        for table in key_rotation.get_progress(db):
+            print(table)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
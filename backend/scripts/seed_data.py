@@ -0,0 +1,44 @@
+"""
+Seed the configured database (DATABASE_URL) with synthetic clinics, patients and sessions.
+
+    python -m scripts.seed_data --clinics 10 --patients 100 --sessions 30 --seconds 1800
+
+Every clinic gets the email clinic<seed>-<n>@example.com and the password given with --password.
+"""
+import argparse
+import time
+from app.database import Base, SessionLocal, engine
+from app.services.synthetic_data import generate_synthetic_data
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clinics", type=int, default=5)
+    parser.add_argument("--patients", type=int, default=50, help="patients per clinic")
+    parser.add_argument("--sessions", type=int, default=20, help="sessions per patient")
+    parser.add_argument("--seconds", type=int, default=600, help="timeline length of each session")
+    parser.add_argument("--seed", type=int, default=0, help="use a different seed for each run against the same database")
+    parser.add_argument("--password", default="testpassword123")
+    args = parser.parse_args()
+
+    engine.echo = False
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        generate_synthetic_data(
+            db,
+            clinics=args.clinics,
+            patients_per_clinic=args.patients,
+            sessions_per_patient=args.sessions,
+            session_seconds=args.seconds,
+            seed=args.seed,
+            password=args.password,
+        )
+    finally:
+        db.close()
+    total = args.clinics * args.patients * args.sessions
+    print(f"Created {args.clinics} clinics, {args.clinics * args.patients} patients and {total} sessions "
+          f"in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -111,11 +111,9 @@ const ChatInterface = forwardRef(function ChatInterface({ patientId, patientName
   const [inputMessage, setInputMessage] = useState('');
   const [loading, setLoading] = useState(false);
   const [sessions, setSessions] = useState<any[]>([]);
-  const [parsedSessionResults, setParsedSessionResults] = useState<{[key: string]: any}>({});
   const [showSessionModal, setShowSessionModal] = useState(false);
   const [selectedSessions, setSelectedSessions] = useState<number[]>([]);
   const [chatContext, setChatContext] = useState<'historical' | 'session' | null>(null);
-  const [sessionEmotions, setSessionEmotions] = useState<{ [sessionId: string]: any }>({});
   const [shouldScrollToEnd, setShouldScrollToEnd] = useState(false); // Nuevo estado
 
   useEffect(() => {
@@ -138,19 +136,6 @@ const ChatInterface = forwardRef(function ChatInterface({ patientId, patientName
     try {
       const response = await getPatientSessions(patientId);
       setSessions(response.data);
-      
-      const parsedResults: {[key: string]: any} = {};
-      response.data.forEach((session: any) => {
-        try {
-          parsedResults[session.id] = JSON.parse(session.results);
-        } catch (error) {
-          console.error(`Error parsing session results for session ${session.id}:`, error);
-          parsedResults[session.id] = {}; // Default to empty object if parsing fails
-        }
-      });
-      setParsedSessionResults(parsedResults);
-      console.log("Parsed Session Results after loading:", parsedResults);
-
     } catch (error) {
       console.error('Error loading sessions:', error);
     }
@@ -190,25 +175,11 @@ const ChatInterface = forwardRef(function ChatInterface({ patientId, patientName
   };
 
   const handleSessionSelect = (sessionId: number) => {
-    setSelectedSessions(prev => {
-      const newSelected = prev.includes(sessionId)
+    setSelectedSessions(prev =>
+      prev.includes(sessionId)
         ? prev.filter(id => id !== sessionId)
-        : [...prev, sessionId];
-      
-      // Update sessionEmotions based on newly selected sessions
-      const newSessionEmotions: {[key: string]: any} = {};
-      newSelected.forEach(id => {
-        if (parsedSessionResults[id]) {
-          newSessionEmotions[id.toString()] = parsedSessionResults[id];
-        } else {
-          console.warn(`No parsed session results found for session ID: ${id}`);
-        }
-      });
-      setSessionEmotions(newSessionEmotions);
-      console.log("New Session Emotions after selection:", newSessionEmotions);
-
-      return newSelected;
-    });
+        : [...prev, sessionId]
+    );
   };
 
   const handleSessionModalClose = () => {
@@ -237,39 +208,11 @@ const ChatInterface = forwardRef(function ChatInterface({ patientId, patientName
     setShouldScrollToEnd(true); // Activar scroll solo cuando el usuario envía
 
     try {
-      let sessionIds = chatContext === 'session' && selectedSessions.length > 0 
+      // Sin sesiones seleccionadas el backend usa el historial del paciente
+      const sessionIds = chatContext === 'session' && selectedSessions.length > 0
         ? selectedSessions.map(id => id.toString())
         : undefined;
-      let emotionsToSend = sessionEmotions;
-      if (chatContext === 'historical') {
-        let combinedTimeline: { [key: string]: string } = {};
-        let combinedSummary: { [key: string]: number } = {};
-        Object.values(parsedSessionResults).forEach((result: any) => {
-          if (result && result.timeline) {
-            Object.entries(result.timeline).forEach(([second, emotion]) => {
-              combinedTimeline[second as string] = emotion as string;
-            });
-          }
-          if (result && result.emotion_summary) {
-            Object.entries(result.emotion_summary).forEach(([emotion, count]) => {
-              combinedSummary[emotion as string] = (combinedSummary[emotion as string] || 0) + Number(count);
-            });
-          }
-        });
-        emotionsToSend = {
-          historical: {
-            timeline: combinedTimeline,
-            emotion_summary: combinedSummary
-          }
-        };
-        sessionIds = undefined;
-      }
-      const response = await sendMessageToAgent(
-        inputMessage,
-        sessionIds,
-        emotionsToSend,
-        chatContext === 'historical' ? patientId : undefined
-      );
+      const response = await sendMessageToAgent(inputMessage, sessionIds, patientId);
       // Reemplazar el mensaje loader por la respuesta real
       setMessages((prev: ChatMessage[]) => {
         const lastIndex = prev.findIndex(m => m.isLoading);
@@ -176,11 +176,11 @@ export const getAgentChat = async (patientId: number, sessionIds?: number[]) =>
   return api.get(`/chat/${patientId}${params.toString() ? `?${params.toString()}` : ''}`);
 };
 
-export const sendMessageToAgent = async (message: string, sessionIds?: string[], sessionEmotions?: any, patientId?: number) => {
+// El backend arma el contexto emocional con las sesiones guardadas
+export const sendMessageToAgent = async (message: string, sessionIds?: string[], patientId?: number) => {
   const body: any = {
     message,
-    session_ids: sessionIds,
-    session_emotions: sessionEmotions
+    session_ids: sessionIds
   };
   if (patientId) body.patient_id = patientId;
   return api.post('/chat', body);